@@ -1,4 +1,14 @@
-from .workflows import trigger_workflow as trigger_workflow
-from .commands import execute_command as execute_command, CommandError as CommandError
+from __future__ import annotations
+
+from ._lazy import lazy_getattr
+
+# Loaded on first access so that ``import milo_core`` stays cheap.
+_LAZY = {
+    "trigger_workflow": ".workflows",
+    "execute_command": ".commands",
+    "CommandError": ".commands",
+}
 
 __all__ = ["trigger_workflow", "execute_command", "CommandError"]
+
+__getattr__ = lazy_getattr(__name__, _LAZY)
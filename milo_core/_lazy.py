@@ -0,0 +1,24 @@
+"""Module-level ``__getattr__`` for lazily imported package attributes."""
+
+from __future__ import annotations
+
+import sys
+from importlib import import_module
+from typing import Any, Callable
+
+
+def lazy_getattr(package: str, attributes: dict[str, str]) -> Callable[[str], Any]:
+    """Return a ``__getattr__`` importing ``attributes`` from submodules.
+
+    ``attributes`` maps an attribute name to the relative module that
+    defines it. The value is cached on the package after the first lookup.
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in attributes:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(import_module(attributes[name], package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
@@ -0,0 +1 @@
+"""Offline benchmarks for MILO's turn loop and hot paths."""
@@ -0,0 +1,460 @@
+"""Micro-benchmarks for MILO's hot paths.
+
+Each benchmark times one operation in isolation and reports the time per
+operation. Results are written as JSON and can be checked against a
+baseline::
+
+    python -m milo_core.bench.micro --out baseline.json
+    python -m milo_core.bench.micro --baseline baseline.json --threshold 0.25
+
+Benchmarks that need hardware or libraries missing on the machine, such as
+PortAudio or a display for Tk, are reported as skipped instead of failing.
+Memory benchmarks use a deterministic hashing embedder by default so that
+only Chroma is measured; pass ``--embedder sentence-transformers`` to include
+the real encoder.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+from unittest import mock
+
+import numpy as np
+
+
+@dataclass
+class Case:
+    """One timed operation.
+
+    ``run`` performs ``ops`` operations per call; setup happens before the
+    case is created and ``teardown`` runs once after timing.
+    """
+
+    name: str
+    run: Callable[[], Any]
+    ops: int = 1
+    teardown: Callable[[], None] | None = None
+
+
+@dataclass
+class Options:
+    memory_sizes: list[int] = field(default_factory=lambda: [1_000, 10_000])
+    embedder: str = "hash"
+
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run on this machine."""
+
+
+BENCHMARKS: dict[str, Callable[[Options], Iterator[Case]]] = {}
+
+
+def benchmark(group: str) -> Callable:
+    """Register a generator of :class:`Case` objects under ``group``."""
+
+    def register(func: Callable[[Options], Iterator[Case]]) -> Callable:
+        BENCHMARKS[group] = func
+        return func
+
+    return register
+
+
+def measure(case: Case, repeat: int = 5, min_time: float = 0.05) -> dict[str, Any]:
+    """Time ``case`` like :mod:`timeit` and return per-operation statistics."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        if elapsed == 0:
+            loops *= 10
+        else:
+            loops = max(loops * 2, int(loops * min_time / elapsed) + 1)
+    samples = [elapsed]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.run()
+        samples.append(time.perf_counter() - start)
+    per_op = [s / (loops * case.ops) * 1e6 for s in samples]
+    return {
+        "loops": loops,
+        "ops": case.ops,
+        "mean_us": statistics.fmean(per_op),
+        "p50_us": statistics.median(per_op),
+        "min_us": min(per_op),
+        "stdev_us": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "ops_per_sec": 1e6 / statistics.median(per_op) if min(per_op) else 0.0,
+    }
+
+
+# -- conversation memory ----------------------------------------------------
+
+
+@benchmark("short_term_memory")
+def _short_term_memory(options: Options) -> Iterator[Case]:
+    from milo_core.memory import ShortTermMemory
+
+    memory = ShortTermMemory(max_messages=50)
+
+    def append() -> None:
+        for _ in range(1_000):
+            memory.add_message("user", "hello")
+
+    yield Case("short_term_memory.append", append, ops=1_000)
+
+    full = ShortTermMemory(max_messages=10_000)
+    for i in range(10_000):
+        full.add_message("user", f"message {i}")
+    yield Case("short_term_memory.read_10k", full.get_messages)
+
+
+# -- commands and plugins ---------------------------------------------------
+
+
+class _NoopSkill:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def execute(self, *args: object, **kwargs: object) -> str:
+        return "ok"
+
+
+@benchmark("commands")
+def _commands(options: Options) -> Iterator[Case]:
+    from milo_core.commands import execute_command
+    from milo_core.plugin_manager import PluginManager
+
+    pm = PluginManager()
+    pm.skills = [_NoopSkill(f"skill{i}") for i in range(20)]
+    command = json.dumps({"type": "skill", "name": "skill19", "args": ["x"]})
+    yield Case("execute_command.json", lambda: execute_command(command, pm))
+    parsed = json.loads(command)
+    yield Case("execute_command.dict", lambda: execute_command(parsed, pm))
+
+    from milo_core.commands import command_schema
+    from milo_core.llm.constrained import prefix_status
+
+    # One check per candidate token while a constrained command decodes.
+    schema = command_schema(pm)
+    partial = command[:-4]
+    yield Case("constrained.prefix_status", lambda: prefix_status(schema, partial))
+
+
+@benchmark("plugins")
+def _plugins(options: Options) -> Iterator[Case]:
+    from milo_core.plugin_manager import PluginManager
+
+    def discover() -> None:
+        PluginManager().discover_plugins(include_tests=True)
+
+    yield Case("plugin_manager.discover", discover)
+
+    # Discovery with a warm manifest should not grow with unused plugins.
+    directory = Path(tempfile.mkdtemp(prefix="milo-bench-plugins-"))
+    for i in range(500):
+        (directory / f"skill{i}.py").write_text(
+            "from plugins.base import BaseSkill\n\n"
+            f"class Skill{i}(BaseSkill):\n"
+            f"    name = 'skill{i}'\n\n"
+            "    def execute(self):\n"
+            "        return 'ok'\n"
+        )
+    PluginManager(directory).discover_plugins()
+    yield Case(
+        "plugin_manager.discover_500",
+        lambda: PluginManager(directory).discover_plugins(),
+        teardown=lambda: shutil.rmtree(directory, ignore_errors=True),
+    )
+
+    pm = PluginManager()
+    pm.skills = [_NoopSkill(f"skill{i}") for i in range(1_000)]
+    yield Case("plugin_manager.lookup_1k", lambda: pm.get_skill_by_name("skill999"))
+
+
+# -- long-term memory -------------------------------------------------------
+
+
+class HashEmbedder:
+    """Deterministic 384-dimensional embeddings without a neural network."""
+
+    dimensions = 384
+
+    def encode(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def _embedder(options: Options) -> Any:
+    if options.embedder == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer("all-MiniLM-L6-v2")
+    return HashEmbedder()
+
+
+@benchmark("memory_manager")
+def _memory_manager(options: Options) -> Iterator[Case]:
+    from milo_core.memory_manager import MemoryManager
+
+    embedder = _embedder(options)
+    yield Case(
+        f"memory_manager.encode[{options.embedder}]",
+        lambda: embedder.encode("What did I say about the garden last week?"),
+    )
+
+    rng = np.random.default_rng(0)
+    for size in options.memory_sizes:
+        directory = tempfile.mkdtemp(prefix="milo-bench-")
+        manager = MemoryManager(None, db_path=directory, embedding_model=embedder)
+        batch = 5_000
+        for start in range(0, size, batch):
+            count = min(batch, size - start)
+            vectors = rng.standard_normal((count, HashEmbedder.dimensions))
+            if options.embedder != "hash":
+                vectors = np.stack(
+                    [embedder.encode(f"memory {start + i}") for i in range(count)]
+                )
+            manager.collection.add(
+                ids=[str(start + i) for i in range(count)],
+                embeddings=vectors.astype(np.float32),
+                documents=[f"memory {start + i}" for i in range(count)],
+                metadatas=[{"timestamp": "2024-01-01T00:00:00+00:00"}] * count,
+            )
+        yield Case(
+            f"memory_manager.query[{size}]",
+            lambda m=manager: m.retrieve_relevant_memories("the garden"),
+        )
+        notes = itertools.count()
+        yield Case(
+            f"memory_manager.store[{size}]",
+            lambda m=manager, n=notes: m._store_memory(f"note {next(n)}"),
+            teardown=lambda d=directory: shutil.rmtree(d, ignore_errors=True),
+        )
+
+
+# -- voice ------------------------------------------------------------------
+
+
+def _speech(seconds: float, sample_rate: int = 16_000) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    rng = np.random.default_rng(0)
+    voiced = np.sin(2 * np.pi * 180 * t) * (1 + np.sin(2 * np.pi * 3 * t))
+    audio = 6_000 * voiced + 300 * rng.standard_normal(len(t))
+    return audio.astype(np.int16)
+
+
+class _ReplayStream:
+    """Stand-in for ``sounddevice.RawInputStream`` reading a fixed buffer."""
+
+    def __init__(self, audio: np.ndarray, block_size: int) -> None:
+        self.data = audio.tobytes()
+        self.block_bytes = block_size * 2
+        self.offset = 0
+
+    def read(self, frames: int) -> tuple[bytes, bool]:
+        chunk = self.data[self.offset : self.offset + self.block_bytes]
+        self.offset += self.block_bytes
+        return chunk or bytes(self.block_bytes), False
+
+    def start(self) -> None:
+        return None
+
+    def stop(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+class _SilentModel:
+    def transcribe(self, audio: np.ndarray) -> tuple[list, None]:
+        return [], None
+
+
+def _engines() -> Any:
+    try:
+        from milo_core.voice import engines
+    except OSError as exc:  # sounddevice raises when PortAudio is missing
+        raise Skip(str(exc)) from exc
+    return engines
+
+
+@benchmark("whisper_vad")
+def _whisper_vad(options: Options) -> Iterator[Case]:
+    engines = _engines()
+    block_size = 480
+    audio = np.concatenate([_speech(3.0), np.zeros(block_size * 4, np.int16)])
+    frames = len(audio) // block_size
+    with mock.patch("faster_whisper.WhisperModel", return_value=_SilentModel()):
+        stt = engines.WhisperSTT(block_size=block_size, vad_silence_duration=0.0)
+
+    def listen() -> None:
+        stream = _ReplayStream(audio, block_size)
+        with mock.patch.object(engines.sd, "RawInputStream", return_value=stream):
+            stt.listen()
+
+    yield Case("whisper_stt.vad_loop_per_frame", listen, ops=frames)
+
+
+class _NullPlayer:
+    def play(self, audio: np.ndarray) -> None:
+        return None
+
+
+@benchmark("piper_buffers")
+def _piper_buffers(options: Options) -> Iterator[Case]:
+    engines = _engines()
+    # Stands in for ``piper.AudioChunk``, one second of speech each.
+    chunk = type("AudioChunk", (), {"audio_int16_array": _speech(1.0, 22_050)})()
+
+    class Voice:
+        config = type("Config", (), {"sample_rate": 22_050})()
+
+        def synthesize(self, text: str) -> Iterable[Any]:
+            return [chunk, chunk, chunk]
+
+    with mock.patch.object(engines, "_load_voice", return_value=Voice()):
+        tts = engines.PiperTTS("bench-voice.onnx", cache_entries=0)
+    tts.player = _NullPlayer()
+    counter = itertools.count()
+    # A new text every call, so the phrase cache never short-circuits.
+    yield Case(
+        "piper_tts.synthesize_3s",
+        lambda: tts._synthesize(f"sentence {next(counter)}", tts._generation),
+    )
+
+
+# -- GUI --------------------------------------------------------------------
+
+
+@benchmark("gui")
+def _gui(options: Options) -> Iterator[Case]:
+    try:
+        from tkinter import TclError
+
+        from milo_core.gui.app import MiloGUI
+
+        gui = MiloGUI(lambda: None)
+    except (ImportError, TclError) as exc:
+        raise Skip(str(exc)) from exc
+    gui.root.withdraw()
+    gui.start_stream_message("M.I.L.O")
+
+    def insert() -> None:
+        for _ in range(100):
+            gui.append_stream_token("token ")
+
+    yield Case("gui.append_stream_token", insert, ops=100, teardown=gui.root.destroy)
+
+
+# -- running and comparing --------------------------------------------------
+
+
+def run(
+    groups: Iterable[str] | None = None,
+    options: Options | None = None,
+    repeat: int = 5,
+    min_time: float = 0.05,
+) -> dict[str, Any]:
+    """Run the selected benchmark groups and return the results."""
+    options = options or Options()
+    results: dict[str, Any] = {}
+    skipped: dict[str, str] = {}
+    for group in groups or BENCHMARKS:
+        try:
+            for case in BENCHMARKS[group](options):
+                try:
+                    results[case.name] = measure(case, repeat, min_time)
+                finally:
+                    if case.teardown is not None:
+                        case.teardown()
+        except Skip as exc:
+            skipped[group] = str(exc)
+    return {
+        "benchmarks": results,
+        "skipped": skipped,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+    }
+
+
+def compare(
+    result: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.25
+) -> list[str]:
+    """Describe benchmarks whose median got slower than ``threshold`` allows."""
+    regressions = []
+    for name, stats in result["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            continue
+        if stats["p50_us"] > base["p50_us"] * (1 + threshold):
+            regressions.append(
+                f"{name}: {stats['p50_us']:.2f} us/op vs baseline"
+                f" {base['p50_us']:.2f} us/op"
+                f" (+{stats['p50_us'] / base['p50_us'] - 1:.0%})"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run MILO micro-benchmarks and optionally check them against a baseline."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("groups", nargs="*", help=", ".join(BENCHMARKS))
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05)
+    parser.add_argument("--memory-sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument(
+        "--embedder", choices=["hash", "sentence-transformers"], default="hash"
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.groups) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark groups: {', '.join(sorted(unknown))}")
+
+    options = Options(memory_sizes=args.memory_sizes, embedder=args.embedder)
+    result = run(args.groups or None, options, args.repeat, args.min_time)
+
+    for name, stats in result["benchmarks"].items():
+        print(f"{name:<42}{stats['p50_us']:>14.2f} us/op", file=sys.stderr)
+    for group, reason in result["skipped"].items():
+        print(f"{group:<42}{'skipped':>14}  {reason}", file=sys.stderr)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(result, baseline, args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual benchmark
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""Replay recorded conversations through the real turn pipeline.
+
+A session file is JSON::
+
+    {
+      "name": "skills",
+      "turns": [
+        {"text": "run the test skill",
+         "reply": "{\\"type\\": \\"skill\\", \\"name\\": \\"test\\"}",
+         "expect_command": {"type": "skill", "name": "test"}},
+        {"audio": "hello.wav", "transcript": "hello there",
+         "reply": "Hi! How can I help?"}
+      ]
+    }
+
+Each turn is either typed ``text`` or a 16 kHz mono ``audio`` recording,
+relative to the session file. ``transcript`` is what the stub recognizer
+returns for a recording, and ``reply`` is what the stub model answers.
+``expect_command`` is compared with the command parsed from the reply.
+
+Every engine can be a deterministic stub or the real implementation, so the
+harness runs on CPU-only machines without a microphone, speaker, network or
+GPU. Stage timings come from :mod:`milo_core.tracing`. Results are written
+as JSON and can be compared against a baseline run::
+
+    python -m milo_core.bench.replay sessions/ --out result.json \\
+        --baseline baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+import numpy as np
+
+from milo_core import tracing
+from milo_core.memory import Message, NoLongTermMemory, ShortTermMemory
+from milo_core.pipeline import TurnOutput, TurnPipeline
+from milo_core.plugin_manager import PluginManager
+from milo_core.voice.segmenter import SentenceSegmenter
+from milo_core.voice.wakeword import read_wav
+
+DEFAULT_SESSIONS = Path(__file__).resolve().parent / "sessions"
+
+
+class ScriptedModel:
+    """Model that streams each turn's recorded ``reply`` word by word.
+
+    Parameters
+    ----------
+    token_delay:
+        Seconds to wait before each token, to mimic a real decoder.
+    """
+
+    def __init__(self, token_delay: float = 0.0) -> None:
+        self.token_delay = token_delay
+        self.reply = ""
+
+    def load_model(self) -> None:
+        return None
+
+    def unload(self) -> None:
+        return None
+
+    def generate_response(self, prompt: str, *args: Any, **kwargs: Any) -> str:
+        return "NO"
+
+    def stream_response(
+        self, history: list[Message], *args: Any, **kwargs: Any
+    ) -> Iterator[str]:
+        for token in re.findall(r"\S+\s*", self.reply):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+
+class ScriptedTranscriber:
+    """Return each recording's ``transcript`` instead of running Whisper."""
+
+    def transcribe(self, audio: np.ndarray, turn: dict[str, Any]) -> str:
+        return turn.get("transcript", "")
+
+
+class WhisperTranscriber:
+    """Transcribe recordings with `faster-whisper` on the CPU."""
+
+    def __init__(self, model: str = "tiny.en") -> None:
+        from faster_whisper import WhisperModel  # lazy import
+
+        self.model = WhisperModel(model, device="cpu", compute_type="int8")
+
+    def transcribe(self, audio: np.ndarray, turn: dict[str, Any]) -> str:
+        segments, _ = self.model.transcribe(audio.astype(np.float32) / 32768.0)
+        return "".join(segment.text for segment in segments).strip()
+
+
+class PiperSynthesizer:
+    """Run Piper synthesis without playing the audio."""
+
+    def __init__(self, model_path: str, onnx_threads: int | None = None) -> None:
+        from milo_core.voice.engines import _load_voice
+
+        self.voice = _load_voice(model_path, onnx_threads)
+
+    def synthesize(self, text: str) -> None:
+        with tracing.span("tts_synthesis"):
+            for _ in self.voice.synthesize(text):
+                pass
+
+
+class ReplayOutput(TurnOutput):
+    """Consume replies like the voice front-end, minus the speaker."""
+
+    def __init__(self, synthesizer: PiperSynthesizer | None = None) -> None:
+        self.synthesizer = synthesizer
+
+    def _speak(self, text: str) -> None:
+        if self.synthesizer is not None:
+            self.synthesizer.synthesize(text)
+        tracing.mark("first_audio")
+
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        segmenter = SentenceSegmenter()
+        async for token in tokens:
+            for segment in segmenter.feed(token):
+                await asyncio.to_thread(self._speak, segment)
+        rest = segmenter.flush()
+        if rest:
+            await asyncio.to_thread(self._speak, rest)
+
+    async def command_result(self, result: str) -> None:
+        await asyncio.to_thread(self._speak, result)
+
+
+def load_sessions(path: str | Path) -> list[dict[str, Any]]:
+    """Load a session file or every ``*.json`` session in a directory."""
+    path = Path(path)
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+    sessions = []
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            session = json.load(f)
+        session.setdefault("name", file.stem)
+        session["base_dir"] = str(file.parent)
+        sessions.append(session)
+    return sessions
+
+
+def summarize_stages(turns: list[dict[str, Any]]) -> dict[str, dict[str, float]]:
+    """Per-stage count, mean and percentiles in milliseconds."""
+    values: dict[str, list[float]] = {}
+    for entry in turns:
+        for stage, seconds in entry.get("spans", {}).items():
+            values.setdefault(stage, []).append(sum(seconds))
+    return {
+        stage: {
+            "count": len(samples),
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": tracing.percentile(samples, 50) * 1000,
+            "p90_ms": tracing.percentile(samples, 90) * 1000,
+            "p99_ms": tracing.percentile(samples, 99) * 1000,
+        }
+        for stage, samples in sorted(values.items())
+    }
+
+
+class ReplayHarness:
+    """Drive recorded sessions through :class:`TurnPipeline`.
+
+    Parameters
+    ----------
+    model:
+        Model used for replies. :class:`ScriptedModel` replays ``reply``.
+    transcriber:
+        Recognizer used for ``audio`` turns.
+    memory_manager:
+        Long-term memory. Defaults to one that stores nothing.
+    plugin_manager:
+        Skills for commands. Defaults to the discovered plugins, including
+        the offline ``test`` skill.
+    synthesizer:
+        Optional speech synthesizer. ``None`` skips synthesis.
+    """
+
+    def __init__(
+        self,
+        model: Any = None,
+        transcriber: Any = None,
+        memory_manager: Any = None,
+        plugin_manager: PluginManager | None = None,
+        synthesizer: PiperSynthesizer | None = None,
+    ) -> None:
+        self.model = model or ScriptedModel()
+        self.transcriber = transcriber or ScriptedTranscriber()
+        self.memory_manager = memory_manager or NoLongTermMemory()
+        if plugin_manager is None:
+            plugin_manager = PluginManager()
+            plugin_manager.discover_plugins(include_tests=True)
+        self.plugin_manager = plugin_manager
+        self.synthesizer = synthesizer
+
+    def _user_input(self, turn: dict[str, Any], base_dir: str) -> str:
+        if "audio" not in turn:
+            return turn["text"]
+        audio = read_wav(Path(base_dir) / turn["audio"])
+        with tracing.span("stt"):
+            return self.transcriber.transcribe(audio, turn)
+
+    async def _replay(self, session: dict[str, Any]) -> list[dict[str, Any]]:
+        pipeline = TurnPipeline(
+            self.model,
+            self.memory_manager,
+            self.plugin_manager,
+            session_memory=ShortTermMemory(),
+            source="replay",
+        )
+        output = ReplayOutput(self.synthesizer)
+        mismatches = []
+        try:
+            for index, turn in enumerate(session["turns"]):
+                user_input = self._user_input(turn, session["base_dir"])
+                if isinstance(self.model, ScriptedModel):
+                    self.model.reply = turn.get("reply", "")
+                result = await pipeline.run_turn(user_input, output)
+                expected = turn.get("expect_command")
+                if expected is not None and result.command != expected:
+                    mismatches.append(
+                        {
+                            "session": session["name"],
+                            "turn": index,
+                            "expected": expected,
+                            "actual": result.command,
+                        }
+                    )
+        finally:
+            pipeline.close()
+        return mismatches
+
+    def run(self, sessions: list[dict[str, Any]], repeat: int = 1) -> dict[str, Any]:
+        """Replay ``sessions`` ``repeat`` times and return the results."""
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = Path(tmp) / "replay.jsonl"
+            tracer = tracing.Tracer(trace_path, max_bytes=0)
+            previous = tracing.install(tracer)
+            mismatches: list[dict[str, Any]] = []
+            start = time.perf_counter()
+            try:
+                for _ in range(repeat):
+                    for session in sessions:
+                        mismatches += asyncio.run(self._replay(session))
+            finally:
+                wall_seconds = time.perf_counter() - start
+                tracer.close()
+                tracing.install(previous)
+            turns = tracing.load_turns([trace_path])
+
+        return {
+            "sessions": [s["name"] for s in sessions],
+            "repeat": repeat,
+            "turns": len(turns),
+            "wall_seconds": wall_seconds,
+            "turns_per_sec": len(turns) / wall_seconds if wall_seconds else 0.0,
+            "stages": summarize_stages(turns),
+            "command_mismatches": mismatches,
+            "engines": {
+                "model": type(self.model).__name__,
+                "transcriber": type(self.transcriber).__name__,
+                "memory": type(self.memory_manager).__name__,
+                "synthesizer": type(self.synthesizer).__name__
+                if self.synthesizer
+                else None,
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+            },
+        }
+
+
+def compare(
+    result: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float = 0.2,
+    min_delta_ms: float = 1.0,
+) -> list[str]:
+    """Describe regressions of ``result`` against ``baseline``.
+
+    A stage regresses when its median grows by more than ``threshold`` (a
+    fraction) and by at least ``min_delta_ms``; throughput regresses when
+    turns per second drop by more than ``threshold``.
+    """
+    regressions = []
+    base_rate = baseline.get("turns_per_sec", 0.0)
+    if base_rate and result["turns_per_sec"] < base_rate * (1 - threshold):
+        regressions.append(
+            f"turns_per_sec {result['turns_per_sec']:.2f} < baseline {base_rate:.2f}"
+        )
+    for stage, stats in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            continue
+        delta = stats["p50_ms"] - base["p50_ms"]
+        if delta >= min_delta_ms and stats["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append(
+                f"{stage} p50 {stats['p50_ms']:.1f} ms > baseline"
+                f" {base['p50_ms']:.1f} ms"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Replay recorded sessions and write timing results as JSON."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("sessions", nargs="?", default=str(DEFAULT_SESSIONS))
+    parser.add_argument("--out", type=Path, help="write results to this file")
+    parser.add_argument("--baseline", type=Path, help="results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--stt", choices=["stub", "whisper"], default="stub")
+    parser.add_argument("--whisper-model", default="tiny.en")
+    parser.add_argument("--model", choices=["stub", "hf"], default="stub")
+    parser.add_argument("--hf-model", help="Hugging Face model for --model hf")
+    parser.add_argument("--memory", choices=["stub", "chroma"], default="stub")
+    parser.add_argument("--tts-voice", help="Piper voice to synthesize replies")
+    args = parser.parse_args(argv)
+
+    if args.model == "hf":
+        from milo_core.llm import HuggingFaceModel
+
+        model: Any = HuggingFaceModel(args.hf_model)
+    else:
+        model = ScriptedModel(args.token_delay)
+    transcriber: Any = (
+        WhisperTranscriber(args.whisper_model)
+        if args.stt == "whisper"
+        else ScriptedTranscriber()
+    )
+    memory_manager: Any = None
+    memory_dir = None
+    if args.memory == "chroma":
+        from milo_core.memory_manager import MemoryManager
+
+        memory_dir = tempfile.TemporaryDirectory()
+        memory_manager = MemoryManager(model, db_path=memory_dir.name)
+    synthesizer = PiperSynthesizer(args.tts_voice) if args.tts_voice else None
+
+    harness = ReplayHarness(model, transcriber, memory_manager, None, synthesizer)
+    result = harness.run(load_sessions(args.sessions), repeat=args.repeat)
+    if memory_dir is not None:
+        memory_dir.cleanup()
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    failed = False
+    for mismatch in result["command_mismatches"]:
+        print(f"Command mismatch: {mismatch}", file=sys.stderr)
+        failed = True
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        for regression in compare(result, baseline, args.threshold):
+            print(f"Regression: {regression}", file=sys.stderr)
+            failed = True
+    print(
+        f"{result['turns']} turns in {result['wall_seconds']:.2f}s"
+        f" ({result['turns_per_sec']:.1f} turns/sec)",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual benchmark
+    sys.exit(main())
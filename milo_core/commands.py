@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import inspect
 import json
-from typing import Any, Dict
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Set, Tuple
 
+import requests
+
+from . import skill_cache, tracing
 from .plugin_manager import PluginManager
 from .workflows import trigger_workflow
 
@@ -12,36 +19,50 @@ class CommandError(Exception):
 
 
 def execute_command(
-    command: str | Dict[str, Any], plugin_manager: PluginManager
+    command: str | Dict[str, Any] | List[Dict[str, Any]],
+    plugin_manager: PluginManager,
+    step_timeout: Callable[[Dict[str, Any]], float | None] | None = None,
 ) -> Any:
-    """Parse and execute a skill or workflow command.
+    """Parse and execute a skill, workflow or plan command.
 
     Parameters
     ----------
     command:
         JSON string or dictionary describing the action to perform. Expected
         keys:
-        ``type`` (``"skill"`` or ``"workflow"``), along with ``name`` for skills
-        or ``id`` for workflows. ``args`` and ``kwargs`` are optional for skills,
-        ``payload`` is optional for workflows.
+        ``type`` (``"skill"``, ``"workflow"`` or ``"plan"``), along with
+        ``name`` for skills, ``id`` for workflows or ``steps`` for plans.
+        ``args`` and ``kwargs`` are optional for skills, ``payload`` is
+        optional for workflows. A list of commands is run as a plan of
+        independent steps; see :func:`execute_plan`.
     plugin_manager:
         Manager used to look up loaded skills.
+    step_timeout:
+        Returns the seconds each step of a plan may run. Ignored for single
+        commands.
 
     Returns
     -------
     Any
-        The result of ``skill.execute`` or the ``requests.Response`` from
-        ``trigger_workflow``.
+        The result of ``skill.execute``, the ``requests.Response`` from
+        ``trigger_workflow`` or the :class:`PlanResult` of a plan.
     """
 
     if isinstance(command, str):
         try:
-            data: Dict[str, Any] = json.loads(command)
+            data: Any = json.loads(command)
         except json.JSONDecodeError as exc:  # pragma: no cover - defensive
             raise CommandError("Invalid command JSON") from exc
     else:
         data = command
 
+    if isinstance(data, list) or (
+        isinstance(data, dict) and data.get("type") == "plan"
+    ):
+        return execute_plan(data, plugin_manager, step_timeout=step_timeout)
+    if not isinstance(data, dict):
+        raise CommandError("Commands must be JSON objects")
+
     cmd_type = data.get("type")
     if cmd_type == "skill":
         skill_name = data.get("name")
@@ -52,14 +73,25 @@ def execute_command(
             raise CommandError(f"Unknown skill: {skill_name}")
         args = data.get("args", [])
         kwargs = data.get("kwargs", {})
-        return skill.execute(*args, **kwargs)
+        cache = skill_cache.get_cache()
+        key = cache.key(skill, args, kwargs)
+        if key is None:
+            return _run_skill(skill, args, kwargs)
+        value = cache.get(key)
+        if value is skill_cache.MISSING:
+            value = _run_skill(skill, args, kwargs)
+            cache.put(key, value, cache.ttl(skill))
+        return value
 
     if cmd_type == "workflow":
         workflow_id = data.get("id")
         if not workflow_id:
             raise CommandError("Missing workflow id")
         payload = data.get("payload")
-        response = trigger_workflow(str(workflow_id), payload)
+        try:
+            response = trigger_workflow(str(workflow_id), payload)
+        except requests.RequestException as exc:
+            raise CommandError(f"Workflow {workflow_id} failed: {exc}") from exc
         if not getattr(response, "ok", False):
             raise CommandError(
                 f"Workflow {workflow_id} failed with status {getattr(response, 'status_code', 'unknown')}"
@@ -67,3 +99,424 @@ def execute_command(
         return response
 
     raise CommandError("Unsupported command type")
+
+
+def _run_skill(skill: Any, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+    if getattr(skill, "isolated", False) is True:
+        from .sandbox import get_sandbox
+
+        return get_sandbox().run(skill, args, kwargs)
+    return skill.execute(*args, **kwargs)
+
+
+@dataclass
+class StepResult:
+    """Outcome of one step of a plan."""
+
+    step: str
+    value: Any = None
+    error: str | None = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class PlanResult:
+    """Results of every step of a plan, in the order the steps were given."""
+
+    steps: Dict[str, StepResult] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return all(step.ok for step in self.steps.values())
+
+    def __str__(self) -> str:
+        lines = []
+        for step in self.steps.values():
+            outcome = step.value if step.ok else f"failed: {step.error}"
+            lines.append(f"{step.step}: {outcome}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly form, with values converted by :func:`step_value`."""
+        return {
+            step.step: {
+                "ok": step.ok,
+                "result": step_value(step.value) if step.ok else None,
+                "error": step.error,
+                "seconds": step.seconds,
+            }
+            for step in self.steps.values()
+        }
+
+
+def step_value(value: Any) -> Any:
+    """Value a step passes on: a workflow's JSON body or text, else ``value``."""
+    if isinstance(value, requests.Response):
+        try:
+            return value.json()
+        except ValueError:
+            return value.text
+    return value
+
+
+def _references(value: Any) -> Set[str]:
+    if isinstance(value, str) and value.startswith("$") and len(value) > 1:
+        return {value[1:]}
+    if isinstance(value, dict):
+        return set().union(*(_references(v) for v in value.values()))
+    if isinstance(value, list):
+        return set().union(*(_references(v) for v in value))
+    return set()
+
+
+def _dependencies(step: Dict[str, Any]) -> Set[str]:
+    after = step.get("after", [])
+    if isinstance(after, (str, int)):
+        after = [after]
+    deps = {str(dep) for dep in after}
+    for key in ("args", "kwargs", "payload"):
+        deps |= _references(step.get(key))
+    return deps
+
+
+def _substitute(value: Any, results: Dict[str, StepResult]) -> Any:
+    if isinstance(value, str) and value.startswith("$") and value[1:] in results:
+        return step_value(results[value[1:]].value)
+    if isinstance(value, dict):
+        return {k: _substitute(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, results) for v in value]
+    return value
+
+
+def _plan_steps(plan: Dict[str, Any] | List[Any]) -> Dict[str, Dict[str, Any]]:
+    raw = plan if isinstance(plan, list) else plan.get("steps")
+    if not isinstance(raw, list) or not raw:
+        raise CommandError("A plan needs a non-empty list of steps")
+    steps: Dict[str, Dict[str, Any]] = {}
+    for index, step in enumerate(raw, 1):
+        if not isinstance(step, dict) or step.get("type") not in ("skill", "workflow"):
+            raise CommandError(f"Plan step {index} must be a skill or workflow")
+        step_id = str(step.get("step", index))
+        if step_id in steps:
+            raise CommandError(f"Duplicate plan step: {step_id}")
+        steps[step_id] = step
+
+    # Check dependencies up front so the scheduler always makes progress.
+    done: Set[str] = set()
+    remaining = {step_id: _dependencies(step) for step_id, step in steps.items()}
+    for step_id, deps in remaining.items():
+        unknown = sorted(deps - steps.keys())
+        if unknown:
+            raise CommandError(
+                f"Plan step {step_id} depends on unknown step {unknown[0]}"
+            )
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if deps <= done]
+        if not ready:
+            raise CommandError("Plan steps depend on each other in a cycle")
+        for step_id in ready:
+            done.add(step_id)
+            del remaining[step_id]
+    return steps
+
+
+def execute_plan(
+    plan: Dict[str, Any] | List[Dict[str, Any]],
+    plugin_manager: PluginManager,
+    step_timeout: Callable[[Dict[str, Any]], float | None] | None = None,
+    max_workers: int = 4,
+) -> PlanResult:
+    """Run the skill and workflow steps of a plan, concurrently where possible.
+
+    A plan looks like::
+
+        {"type": "plan", "steps": [
+            {"step": "search", "type": "skill", "name": "googlesearch",
+             "args": ["weather in Paris"]},
+            {"type": "workflow", "id": "send_mail",
+             "payload": {"body": "$search"}}]}
+
+    Each step is a skill or workflow command with an optional ``step`` name
+    (its 1-based position by default) and ``after``, the steps it must wait
+    for. A string argument ``"$<step>"`` is replaced by the result of that
+    step and implies the dependency. Steps whose dependencies are done run
+    in parallel on a thread pool.
+
+    A step that fails or times out does not stop the others; only the steps
+    that depend on it are skipped.
+
+    Parameters
+    ----------
+    plan:
+        The plan dictionary, or a bare list of steps.
+    plugin_manager:
+        Manager used to look up loaded skills.
+    step_timeout:
+        Returns the seconds a step may run before it is abandoned, or
+        ``None`` to wait for it.
+    max_workers:
+        Maximum number of steps running at once.
+
+    Raises
+    ------
+    CommandError
+        If the plan is malformed: no steps, duplicate or unknown step names,
+        or a dependency cycle.
+    """
+    steps = _plan_steps(plan)
+    results: Dict[str, StepResult] = {}
+    running: Dict[Future[Any], Tuple[str, float, float | None]] = {}
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(steps)), thread_name_prefix="milo-plan"
+    )
+    try:
+        while len(results) < len(steps):
+            started = {step_id for step_id, _, _ in running.values()}
+            for step_id, step in steps.items():
+                if step_id in results or step_id in started:
+                    continue
+                deps = _dependencies(step)
+                failed = sorted(d for d in deps if d in results and not results[d].ok)
+                if failed:
+                    results[step_id] = StepResult(
+                        step_id, error=f"skipped because {failed[0]} failed"
+                    )
+                elif deps <= results.keys():
+                    command = {
+                        key: _substitute(value, results)
+                        for key, value in step.items()
+                        if key not in ("step", "after")
+                    }
+                    timeout = step_timeout(command) if step_timeout else None
+                    future = executor.submit(execute_command, command, plugin_manager)
+                    running[future] = (step_id, time.perf_counter(), timeout)
+            if not running:
+                # Only skipped steps were left this round.
+                continue
+
+            deadlines = [
+                start + timeout
+                for _, start, timeout in running.values()
+                if timeout is not None
+            ]
+            wait_for = (
+                max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            )
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future, (step_id, start, timeout) in list(running.items()):
+                result = StepResult(step_id, seconds=now - start)
+                if future in done:
+                    try:
+                        result.value = future.result()
+                    except CommandError as exc:
+                        result.error = str(exc)
+                    except Exception as exc:
+                        result.error = f"{type(exc).__name__}: {exc}"
+                elif timeout is not None and now - start >= timeout:
+                    # The worker is abandoned and its result ignored.
+                    result.error = f"did not finish within {timeout:g} seconds"
+                else:
+                    continue
+                del running[future]
+                results[step_id] = result
+                tracing.record("plan_step", result.seconds)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return PlanResult({step_id: results[step_id] for step_id in steps})
+
+
+# JSON types for parameter annotations, which are strings in plugins using
+# ``from __future__ import annotations``.
+_ANNOTATION_TYPES = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "dict": "object",
+}
+
+
+def _parameter_schema(parameter: inspect.Parameter) -> Dict[str, Any]:
+    annotation = parameter.annotation
+    if annotation is inspect.Parameter.empty:
+        return {}
+    name = annotation if isinstance(annotation, str) else annotation.__name__
+    json_type = _ANNOTATION_TYPES.get(name.split("[")[0].strip().lower())
+    return {"type": json_type} if json_type else {}
+
+
+def skill_schema(skill: Any) -> Dict[str, Any]:
+    """JSON schema of the commands that run ``skill``.
+
+    Positional ``args`` and keyword ``kwargs`` follow the signature of
+    ``skill.execute``.
+    """
+    parameters = inspect.signature(skill.execute).parameters.values()
+    return _skill_schema(skill.name, list(parameters))
+
+
+def _skill_schema(name: str, parameters: List[inspect.Parameter]) -> Dict[str, Any]:
+    kinds = inspect.Parameter
+    positional = [
+        p
+        for p in parameters
+        if p.kind in (kinds.POSITIONAL_ONLY, kinds.POSITIONAL_OR_KEYWORD)
+    ]
+    keyword = [
+        p
+        for p in parameters
+        if p.kind in (kinds.POSITIONAL_OR_KEYWORD, kinds.KEYWORD_ONLY)
+    ]
+    var_args = any(p.kind == kinds.VAR_POSITIONAL for p in parameters)
+    var_kwargs = any(p.kind == kinds.VAR_KEYWORD for p in parameters)
+    return {
+        "type": "object",
+        "properties": {
+            "type": {"const": "skill"},
+            "name": {"const": name},
+            "args": {
+                "type": "array",
+                "prefixItems": [_parameter_schema(p) for p in positional],
+                "items": {} if var_args else False,
+            },
+            "kwargs": {
+                "type": "object",
+                "properties": {p.name: _parameter_schema(p) for p in keyword},
+                "additionalProperties": var_kwargs,
+            },
+        },
+        "required": ["type", "name"],
+        "additionalProperties": False,
+    }
+
+
+WORKFLOW_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "type": {"const": "workflow"},
+        "id": {"type": "string"},
+        "payload": {"type": "object"},
+    },
+    "required": ["type", "id"],
+    "additionalProperties": False,
+}
+
+
+def _step_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    properties = dict(schema["properties"])
+    properties["step"] = {"type": "string"}
+    properties["after"] = {"type": "array", "items": {"type": "string"}}
+    return {**schema, "properties": properties}
+
+
+def command_schema(plugin_manager: PluginManager) -> Dict[str, Any]:
+    """JSON schema matching every command :func:`execute_command` accepts.
+
+    Skill arguments are read from the plugin manifest where possible, so
+    plugins are not imported to build the schema.
+    """
+    commands: List[Dict[str, Any]] = []
+    for name in plugin_manager.skill_names():
+        parameters = plugin_manager.skill_parameters(name)
+        if parameters is not None:
+            commands.append(_skill_schema(name, parameters))
+    commands.append(WORKFLOW_SCHEMA)
+    plan = {
+        "type": "object",
+        "properties": {
+            "type": {"const": "plan"},
+            "steps": {
+                "type": "array",
+                "items": {"anyOf": [_step_schema(c) for c in commands]},
+                "minItems": 1,
+            },
+        },
+        "required": ["type", "steps"],
+        "additionalProperties": False,
+    }
+    return {"anyOf": commands + [plan]}
+
+
+class CommandDetector:
+    """Recognize a JSON command at the start of a streamed reply.
+
+    Tokens are fed in as the model produces them. If the first
+    non-whitespace character of the reply is ``{`` or ``[``, the text is held
+    back instead of being shown or spoken, and :attr:`command` is set as soon
+    as the value is syntactically complete. A list of objects is a plan, as
+    in :func:`execute_command`, and is returned as a ``"plan"`` command. Any
+    other reply, or a value that turns out not to be a command, is passed
+    through unchanged.
+    """
+
+    def __init__(self) -> None:
+        self.command: Dict[str, Any] | None = None
+        self._state = "start"  # start, text, command or done
+        self._held: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, token: str) -> str:
+        """Consume ``token`` and return the part of it to present."""
+        if self._state == "text":
+            return token
+        if self._state == "done":
+            return ""
+        for i, char in enumerate(token):
+            self._held.append(char)
+            if self._state == "start":
+                if char.isspace():
+                    continue
+                if char not in "{[":
+                    return self._pass_through(token[i + 1 :])
+                self._state = "command"
+                self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    return self._complete(token[i + 1 :])
+        return ""
+
+    def close(self) -> str:
+        """Return text still held back when the reply ends without a command."""
+        if self._state in ("start", "command"):
+            return self._pass_through("")
+        return ""
+
+    def _complete(self, rest: str) -> str:
+        try:
+            data = json.loads("".join(self._held))
+        except json.JSONDecodeError:
+            return self._pass_through(rest)
+        if isinstance(data, list):
+            # Bracketed prose such as "[1, 2]" is not a plan.
+            if not data or not all(isinstance(step, dict) for step in data):
+                return self._pass_through(rest)
+            data = {"type": "plan", "steps": data}
+        self.command = data
+        self._state = "done"
+        return ""
+
+    def _pass_through(self, rest: str) -> str:
+        self._state = "text"
+        held, self._held = "".join(self._held), []
+        return held + rest
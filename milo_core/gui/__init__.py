@@ -1,5 +1,14 @@
-"""Simple GUI for MILO."""
+"""Simple GUI for MILO.
 
-from .app import MiloGUI, run_gui
+Tkinter is imported on first access to :class:`MiloGUI` or :func:`run_gui`.
+"""
+
+from __future__ import annotations
+
+from milo_core._lazy import lazy_getattr
+
+_LAZY = {"MiloGUI": ".app", "run_gui": ".app"}
 
 __all__ = ["MiloGUI", "run_gui"]
+
+__getattr__ = lazy_getattr(__name__, _LAZY)
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from typing import Callable
-
-import json
-
+import asyncio
 import queue
-import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Deque, List
 
 
 from tkinter import (
@@ -19,13 +19,24 @@ from tkinter import (
     END,
 )
 
+from milo_core import tracing
 from milo_core.llm import LocalModelInterface
 from milo_core.memory import ShortTermMemory
-from milo_core.memory_manager import MemoryManager
 from milo_core.voice.interface import SpeechToText, TextToSpeech
-from milo_core.commands import execute_command, CommandError
+from milo_core.pipeline import LoopThread, TurnOutput, TurnPipeline, TurnResult
 from milo_core.plugin_manager import PluginManager
 
+if TYPE_CHECKING:  # pragma: no cover - imported for annotations only
+    from milo_core.memory_manager import MemoryManager
+
+
+PUMP_INTERVAL_MS = 50
+# Main-loop blocking longer than one 60 Hz frame counts as a UI stall.
+STALL_THRESHOLD = 0.016
+
+# Components a typed turn needs; the rest only matter for voice.
+TEXT_COMPONENTS = {"model", "memory", "plugins"}
+
 
 class MiloGUI:
     """Basic Tkinter-based chat window."""
@@ -69,6 +80,7 @@ class MiloGUI:
 
         self._send_callback: Callable[[str], None] | None = None
         self._stream_tag: str | None = None
+        self._warming = ""
 
     def set_loading(self, loading: bool) -> None:
         """Enable or disable user input and show loading status."""
@@ -76,7 +88,19 @@ class MiloGUI:
         state = "disabled" if loading else "normal"
         self.entry.configure(state=state)
         self.send_btn.configure(state=state)
-        self.status.configure(text="Thinking..." if loading else "")
+        self.status.configure(text="Thinking..." if loading else self._warming)
+
+    def set_warming_up(self, pending: List[str], ready: bool) -> None:
+        """Show which components are still loading.
+
+        Input stays disabled until ``ready`` is true.
+        """
+
+        state = "normal" if ready else "disabled"
+        self.entry.configure(state=state)
+        self.send_btn.configure(state=state)
+        self._warming = f"Warming up: {', '.join(pending)}..." if pending else ""
+        self.status.configure(text=self._warming)
 
     def schedule(self, callback: Callable[[], None], delay: int = 50) -> None:
         """Schedule ``callback`` to run after ``delay`` milliseconds."""
@@ -146,80 +170,156 @@ class MiloGUI:
         self.root.mainloop()
 
 
+class GUIOutput(TurnOutput):
+    """Render replies in a :class:`MiloGUI` window.
+
+    Tk may only be touched from its own thread, so every update is queued
+    and applied by :meth:`pump`, which runs on the Tk main loop. ``pump``
+    also records how long the main loop was blocked: whenever it runs more
+    than :data:`STALL_THRESHOLD` seconds late, or its own updates take that
+    long, the stall is traced as ``ui_stall`` and kept in :attr:`stalls`.
+    """
+
+    def __init__(self, gui: MiloGUI, author: str = "M.I.L.O") -> None:
+        self.gui = gui
+        self.author = author
+        self._updates: queue.Queue[Callable[[], None]] = queue.Queue()
+        self.stalls: Deque[float] = deque(maxlen=1_000)
+        self._next_pump: float | None = None
+
+    def post(self, update: Callable[[], None]) -> None:
+        """Queue ``update`` to run on the Tk thread."""
+        self._updates.put(update)
+
+    def pump(self) -> None:
+        """Apply queued updates and reschedule itself."""
+        start = time.perf_counter()
+        if self._next_pump is not None:
+            self._stall(start - self._next_pump)
+        try:
+            while True:
+                self._updates.get_nowait()()
+        except queue.Empty:
+            pass
+        end = time.perf_counter()
+        self._stall(end - start)
+        self._next_pump = end + PUMP_INTERVAL_MS / 1000
+        self.gui.schedule(self.pump, PUMP_INTERVAL_MS)
+
+    def _stall(self, seconds: float) -> None:
+        if seconds > STALL_THRESHOLD:
+            self.stalls.append(seconds)
+            tracing.record("ui_stall", seconds)
+
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        self.post(lambda: self.gui.start_stream_message(self.author))
+        try:
+            async for token in tokens:
+                self.post(lambda token=token: self._append(token))
+        finally:
+            self.post(self.gui.end_stream_message)
+
+    def _append(self, token: str) -> None:
+        tracing.mark("first_render")
+        self.gui.append_stream_token(token)
+
+    async def command_result(self, result: str) -> None:
+        self.post(lambda: self.gui.add_message(self.author, result))
+
+    async def finish(self, result: TurnResult) -> None:
+        self.post(lambda: self.gui.set_loading(False))
+
+
 def run_gui(
-    model: LocalModelInterface,
-    stt: SpeechToText,
-    tts: TextToSpeech,
-    memory_manager: MemoryManager,
-    plugin_manager: PluginManager | None = None,
+    model: LocalModelInterface | Future[LocalModelInterface],
+    stt: SpeechToText | Future[SpeechToText] | None,
+    tts: TextToSpeech | Future[TextToSpeech] | None,
+    memory_manager: MemoryManager | Future[MemoryManager],
+    plugin_manager: PluginManager | Future[PluginManager] | None = None,
 ) -> None:
-    """Run MILO conversation loop with a text-based GUI."""
-
-    session_memory = ShortTermMemory()
-    memory_manager.consolidate_memories()
+    """Run MILO conversation loop with a text-based GUI.
+
+    Components that are still initializing may be passed as futures. The
+    window opens immediately, lists them as warming up and enables input
+    once the model, memory and plugins are ready.
+    """
+
+    runner = LoopThread()
+    gui = MiloGUI(runner.stop)
+    output = GUIOutput(gui)
+
+    components = {
+        "model": model,
+        "speech recognition": stt,
+        "speech synthesis": tts,
+        "memory": memory_manager,
+        "plugins": plugin_manager,
+    }
+    loading = {
+        name: value
+        for name, value in components.items()
+        if isinstance(value, Future) and not value.done()
+    }
+
+    def show_warming_up(_: Future[Any] | None = None) -> None:
+        pending = [name for name, value in loading.items() if not value.done()]
+        ready = not any(name in TEXT_COMPONENTS for name in pending)
+        output.post(lambda: gui.set_warming_up(pending, ready))
+
+    background: List[asyncio.Task[None]] = []
+
+    async def prepare() -> TurnPipeline:
+        model_, memory_, plugins_ = [
+            await asyncio.wrap_future(value) if isinstance(value, Future) else value
+            for value in (model, memory_manager, plugin_manager)
+        ]
+        pipeline = TurnPipeline(
+            model_,
+            memory_,
+            plugins_,
+            session_memory=ShortTermMemory(),
+            source="gui",
+        )
+        await pipeline.run_blocking(memory_.consolidate_memories)
+        # Workflows queued by earlier turns are reported as they finish.
+        background.append(asyncio.create_task(pipeline.announce_jobs(output)))
+        return pipeline
 
-    gui = MiloGUI(lambda: None)
+    async def turn(user_input: str) -> TurnResult:
+        pipeline = await asyncio.wrap_future(ready)
+        return await pipeline.run_turn(user_input, output)
 
     def process_input(user_input: str) -> None:
         gui.add_message("You", user_input)
         gui.set_loading(True)
+        future = runner.submit(turn(user_input))
 
-        relevant_memories = memory_manager.retrieve_relevant_memories(user_input)
-        if relevant_memories:
-            context_str = " ".join(relevant_memories)
-            session_memory.add_message(
-                "system", f"Here is some relevant context: {context_str}"
-            )
-        session_memory.add_message("user", user_input)
-        history = session_memory.get_messages()
-
-        token_queue: queue.Queue[str | None] = queue.Queue()
-        tokens: list[str] = []
-
-        def worker() -> None:
-            for token in model.stream_response(history):
-                tokens.append(token)
-                token_queue.put(token)
-            token_queue.put(None)
-
-        threading.Thread(target=worker, daemon=True).start()
-
-        gui.start_stream_message("M.I.L.O")
-
-        def poll_queue() -> None:
-            try:
-                while True:
-                    token = token_queue.get_nowait()
-                    if token is None:
-                        gui.end_stream_message()
-                        full_msg = "".join(tokens)
-                        session_memory.add_message("assistant", full_msg)
-                        if plugin_manager:
-                            try:
-                                command = json.loads(full_msg)
-                            except json.JSONDecodeError:
-                                pass
-                            else:
-                                try:
-                                    result = execute_command(command, plugin_manager)
-                                except (
-                                    CommandError
-                                ) as exc:  # pragma: no cover - defensive
-                                    result = str(exc)
-                                gui.add_message("M.I.L.O", str(result))
-                                session_memory.add_message("assistant", str(result))
-                        if user_input.lower() == "goodbye":
-                            memory_manager.summarize_and_store_session(
-                                session_memory.get_messages()
-                            )
-                            session_memory.clear()
-                        gui.set_loading(False)
-                        return
-                    gui.append_stream_token(token)
-            except queue.Empty:
-                gui.schedule(poll_queue, 50)
-
-        poll_queue()
+        def report_error(done: Future[Any]) -> None:
+            if done.cancelled() or done.exception() is None:
+                return
+            error = done.exception()
+            output.post(lambda: gui.add_message("M.I.L.O", f"Error: {error}"))
+            output.post(lambda: gui.set_loading(False))
 
+        future.add_done_callback(report_error)
+
+    def report_startup_error(done: Future[Any]) -> None:
+        if done.cancelled() or done.exception() is None:
+            return
+        error = done.exception()
+        output.post(lambda: gui.add_message("M.I.L.O", f"Startup failed: {error}"))
+
+    runner.start()
+    ready = runner.submit(prepare())
+    ready.add_done_callback(report_startup_error)
+    if loading:
+        show_warming_up()
+        for value in loading.values():
+            value.add_done_callback(show_warming_up)
     gui.set_send_callback(process_input)
-    gui.mainloop()
+    output.pump()
+    try:
+        gui.mainloop()
+    finally:
+        if ready.done() and ready.exception() is None:
+            ready.result().close()
@@ -0,0 +1,379 @@
+"""Durable background queue for workflow commands.
+
+Triggering a workflow can take as long as the workflow itself: n8n answers
+the webhook once the workflow has run. :class:`JobQueue` takes workflow
+commands off the conversation's critical path. :meth:`JobQueue.submit`
+records the command in SQLite and returns right away. A few worker threads
+then trigger the workflows, retrying failures with exponential backoff.
+
+Finished jobs wait in the database until the session that submitted them
+collects them with :meth:`JobQueue.take_finished`, so a result is not lost
+when nobody is listening, or when MILO restarts before reporting it. Jobs
+that were running when MILO stopped are run again on the next start.
+Listeners registered with :meth:`JobQueue.add_listener` are called as soon
+as a job finishes, so front-ends do not need to poll in a tight loop.
+
+One queue is shared by the whole process; :func:`install` sets it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import requests
+
+from milo_core import tracing
+from milo_core.commands import CommandError, step_value
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_COLUMNS = "id, owner, workflow, payload, status, attempts, result, error"
+
+
+@dataclass
+class Job:
+    """A workflow command submitted to the queue."""
+
+    id: int
+    owner: str
+    workflow: str
+    payload: dict[str, Any]
+    status: str = QUEUED
+    attempts: int = 0
+    result: Any = None
+    error: str | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def describe(self) -> str:
+        """One line reporting the outcome, for speaking or rendering."""
+        if self.status == DONE:
+            result = self.result
+            if not isinstance(result, str):
+                result = json.dumps(result)
+            return f"Workflow {self.workflow} finished: {result}"
+        if self.status == FAILED:
+            return f"Workflow {self.workflow} failed: {self.error}"
+        return f"Workflow {self.workflow} is {self.status}."
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def _from_row(cls, row: Any) -> Job:
+        id_, owner, workflow, payload, status, attempts, result, error = row
+        return cls(
+            id_,
+            owner,
+            workflow,
+            json.loads(payload),
+            status,
+            attempts,
+            None if result is None else json.loads(result),
+            error,
+        )
+
+
+def _trigger(
+    workflow_id: str, payload: dict[str, Any], timeout: float | None
+) -> requests.Response:
+    from milo_core.workflows import get_client
+
+    # The queue is the only retry layer, so a failing job is posted at most
+    # ``max_attempts`` times.
+    return get_client(retries=0).trigger(workflow_id, payload, timeout=timeout)
+
+
+class JobQueue:
+    """SQLite-backed queue of workflow jobs run by background threads.
+
+    Parameters
+    ----------
+    path:
+        SQLite database holding the jobs. ``None`` keeps them in memory,
+        so they do not survive a restart.
+    workers:
+        Number of jobs that run at once.
+    max_attempts:
+        Attempts per job, including the first. Connection errors and 5xx
+        responses are retried; other failures are final.
+    retry_delay:
+        Seconds before the first retry; the delay doubles with every attempt.
+    timeout:
+        Seconds to wait for a webhook to respond. Queued jobs do not hold up
+        a conversation, so this may be much longer than
+        ``workflows.read_timeout``.
+    retention:
+        Seconds reported jobs are kept before they are deleted on startup.
+    trigger:
+        Called as ``trigger(workflow_id, payload, timeout)`` to run a job.
+        Defaults to the shared :class:`~milo_core.workflows.WorkflowClient`
+        with its own retries turned off.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        workers: int = 2,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+        timeout: float | None = 300.0,
+        retention: float = 86_400.0,
+        trigger: Callable[..., requests.Response] | None = None,
+    ) -> None:
+        self.path = Path(path) if path is not None else None
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.trigger = trigger or _trigger
+        self._listeners: list[Callable[[Job], None]] = []
+        self._changed = threading.Condition()
+        self._closed = False
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db: sqlite3.Connection | None = sqlite3.connect(
+            str(self.path) if self.path is not None else ":memory:",
+            check_same_thread=False,
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, owner TEXT NOT NULL, "
+            "workflow TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_run REAL NOT NULL, "
+            "created REAL NOT NULL, finished REAL, result TEXT, error TEXT, "
+            "reported INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Jobs interrupted by a crash or shutdown run again.
+        self._db.execute(
+            "UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)
+        )
+        self._db.execute(
+            "DELETE FROM jobs WHERE reported = 1 AND finished < ?",
+            (time.time() - retention,),
+        )
+        self._db.commit()
+        self._workers = [
+            threading.Thread(target=self._work, name="milo-job-worker", daemon=True)
+            for _ in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, command: dict[str, Any], owner: str) -> Job:
+        """Queue a workflow ``command`` on behalf of session ``owner``.
+
+        Raises
+        ------
+        CommandError
+            If ``command`` is not a workflow command with an id.
+        """
+        if command.get("type") != "workflow":
+            raise CommandError("Only workflow commands can be queued")
+        workflow_id = command.get("id")
+        if not workflow_id:
+            raise CommandError("Missing workflow id")
+        return self.enqueue(str(workflow_id), command.get("payload"), owner)
+
+    def enqueue(
+        self, workflow_id: str, payload: dict[str, Any] | None, owner: str
+    ) -> Job:
+        """Queue ``workflow_id`` with ``payload`` and return the new job."""
+        payload = payload or {}
+        now = time.time()
+        with self._changed:
+            db = self._connection()
+            cursor = db.execute(
+                "INSERT INTO jobs (owner, workflow, payload, status, next_run, "
+                "created) VALUES (?, ?, ?, ?, ?, ?)",
+                (owner, workflow_id, json.dumps(payload), QUEUED, now, now),
+            )
+            db.commit()
+            self._changed.notify()
+        return Job(int(cursor.lastrowid or 0), owner, workflow_id, payload)
+
+    def get(self, job_id: int) -> Job | None:
+        """Current state of job ``job_id``, or ``None`` if it is unknown."""
+        with self._changed:
+            row = (
+                self._connection()
+                .execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+                .fetchone()
+            )
+        return None if row is None else Job._from_row(row)
+
+    def take_finished(self, owner: str) -> list[Job]:
+        """Finished jobs of ``owner`` not reported yet, oldest first.
+
+        The jobs are marked as reported and are not returned again.
+        """
+        with self._changed:
+            db = self._connection()
+            rows = db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE owner = ? AND reported = 0 "
+                "AND status IN (?, ?) ORDER BY finished, id",
+                (owner, DONE, FAILED),
+            ).fetchall()
+            db.executemany(
+                "UPDATE jobs SET reported = 1 WHERE id = ?", [(row[0],) for row in rows]
+            )
+            db.commit()
+        return [Job._from_row(row) for row in rows]
+
+    def add_listener(self, listener: Callable[[Job], None]) -> None:
+        """Call ``listener`` from a worker thread whenever a job finishes."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Job], None]) -> None:
+        self._listeners.remove(listener)
+
+    def close(self, timeout: float = 1.0) -> None:
+        """Stop the workers and close the database.
+
+        Workers get ``timeout`` seconds to finish the job they are running.
+        Jobs still running after that are run again on the next start.
+        """
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        with self._changed:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            raise CommandError("The job queue is closed")
+        return self._db
+
+    def _work(self) -> None:
+        while True:
+            job = self._claim()
+            if job is None:
+                return
+            self._run(job)
+
+    def _claim(self) -> Job | None:
+        with self._changed:
+            while not self._closed:
+                db = self._connection()
+                row = db.execute(
+                    f"SELECT {_COLUMNS}, next_run FROM jobs WHERE status = ? "
+                    "ORDER BY next_run, id LIMIT 1",
+                    (QUEUED,),
+                ).fetchone()
+                now = time.time()
+                if row is not None and row[-1] <= now:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1 "
+                        "WHERE id = ?",
+                        (RUNNING, row[0]),
+                    )
+                    db.commit()
+                    job = Job._from_row(row[:-1])
+                    job.status = RUNNING
+                    job.attempts += 1
+                    return job
+                self._changed.wait(None if row is None else row[-1] - now)
+        return None
+
+    def _run(self, job: Job) -> None:
+        retry = True
+        error: str | None = None
+        start = time.perf_counter()
+        try:
+            response = self.trigger(job.workflow, job.payload, self.timeout)
+        except requests.ReadTimeout as exc:
+            # The workflow may be running already; do not start it twice.
+            retry = False
+            error = str(exc)
+        except requests.RequestException as exc:
+            error = str(exc)
+        except Exception as exc:
+            logger.exception("Workflow job %d failed", job.id)
+            retry = False
+            error = f"{type(exc).__name__}: {exc}"
+        else:
+            if response.ok:
+                job.result = step_value(response)
+            else:
+                retry = response.status_code >= 500
+                error = f"status {response.status_code}"
+        tracing.record("workflow_job", time.perf_counter() - start)
+
+        if error is None:
+            job.status = DONE
+        elif retry and job.attempts < self.max_attempts:
+            logger.debug("Workflow job %d: %s, retrying", job.id, error)
+            job.status = QUEUED
+        else:
+            job.status = FAILED
+            job.error = error
+        now = time.time()
+        next_run = now + self.retry_delay * 2 ** (job.attempts - 1)
+        with self._changed:
+            if self._db is None:
+                # Closed while the job ran; it runs again on the next start.
+                return
+            self._db.execute(
+                "UPDATE jobs SET status = ?, next_run = ?, finished = ?, "
+                "result = ?, error = ? WHERE id = ?",
+                (
+                    job.status,
+                    next_run,
+                    now if job.finished else None,
+                    None if job.result is None else json.dumps(job.result),
+                    job.error,
+                    job.id,
+                ),
+            )
+            self._db.commit()
+            self._changed.notify()
+        if job.finished:
+            for listener in list(self._listeners):
+                try:
+                    listener(job)
+                except Exception:
+                    logger.exception("Job listener failed")
+
+
+_lock = threading.Lock()
+_queue: JobQueue | None = None
+
+
+def get_queue() -> JobQueue | None:
+    """Return the process-wide queue, or ``None`` if workflows run inline."""
+    return _queue
+
+
+def install(queue: JobQueue | None) -> JobQueue | None:
+    """Make ``queue`` the process-wide queue and return the previous one."""
+    global _queue
+    with _lock:
+        previous, _queue = _queue, queue
+    return previous
+
+
+@atexit.register
+def shutdown() -> None:
+    """Close the process-wide queue, if there is one."""
+    queue = install(None)
+    if queue is not None:
+        queue.close()
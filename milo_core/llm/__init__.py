@@ -1,10 +1,21 @@
-"""Local model implementations."""
+"""Local model implementations.
+
+:class:`HuggingFaceModel` imports torch and transformers, so it is loaded
+on first access.
+"""
+
+from __future__ import annotations
+
+from milo_core._lazy import lazy_getattr
 
 from .interface import LocalModelInterface, StubLocalModel
-from .huggingface import HuggingFaceModel
+
+_LAZY = {"HuggingFaceModel": ".huggingface"}
 
 __all__ = [
     "LocalModelInterface",
     "StubLocalModel",
     "HuggingFaceModel",
 ]
+
+__getattr__ = lazy_getattr(__name__, _LAZY)
@@ -0,0 +1,421 @@
+"""Continuous batching of concurrent generations onto one model.
+
+:class:`BatchScheduler` decodes every active request one token at a time in
+a shared batch. Requests join and leave at token boundaries instead of
+waiting for the whole batch to finish, so a short answer never queues
+behind a long one. The model side is a :class:`BatchBackend`;
+:class:`HuggingFaceBatchBackend` drives a loaded :class:`HuggingFaceModel`
+and :class:`StubBatchBackend` produces canned text for load tests.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from milo_core.memory import Message
+
+logger = logging.getLogger(__name__)
+
+
+class Sequence:
+    """One generation request inside the batch."""
+
+    def __init__(
+        self, request_id: int, prompt_ids: list[int], max_new_tokens: int
+    ) -> None:
+        self.request_id = request_id
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.generated: list[int] = []
+        self.text = ""
+        # Window of ``generated`` decoded to find the text of a new token:
+        # tokens from ``prefix_offset`` were decoded, up to ``read_offset``
+        # already emitted.
+        self.prefix_offset = 0
+        self.read_offset = 0
+        self.output: queue.Queue[str | None] = queue.Queue()
+        self.cancelled = False
+        self.finished = False
+
+    @property
+    def ids(self) -> list[int]:
+        return self.prompt_ids + self.generated
+
+
+class BatchBackend(ABC):
+    """Model operations needed by :class:`BatchScheduler`.
+
+    ``rebuild`` processes the full token ids of a new batch, ``join`` adds
+    sequences to the running batch and ``step`` extends the current batch
+    by the last generated token of each sequence. They return the next token
+    id for every sequence they were given, in order.
+    """
+
+    @abstractmethod
+    def encode(self, history: list[Message]) -> list[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def decode(self, ids: list[int]) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_eos(self, token_id: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def rebuild(self, sequences: list[Sequence]) -> list[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def step(self, sequences: list[Sequence]) -> list[int]:
+        raise NotImplementedError
+
+    def join(self, sequences: list[Sequence]) -> list[int] | None:
+        """Add new ``sequences`` to the end of the running batch.
+
+        Only their prompts are processed. Return ``None`` if the backend
+        cannot add rows in place, in which case the scheduler rebuilds the
+        batch instead.
+        """
+        return None
+
+    def drop(self, keep: list[int]) -> bool:
+        """Keep only the batch rows in ``keep``.
+
+        Return ``False`` if the backend cannot remove rows in place, in which
+        case the scheduler rebuilds the batch instead.
+        """
+        return False
+
+
+class HuggingFaceBatchBackend(BatchBackend):
+    """Greedy batched decoding with a Hugging Face causal LM.
+
+    Sequences are left-padded into one batch that shares a KV cache. When a
+    sequence finishes, its row is dropped from the cache. New requests are
+    prefilled on their own and their cache rows padded and appended to the
+    running batch.
+    """
+
+    def __init__(self, model: Any) -> None:
+        import torch
+
+        self._torch = torch
+        self.hf = model
+        self.tokenizer = model.tokenizer
+        self.model = model.model
+        eos = getattr(self.model.generation_config, "eos_token_id", None)
+        if eos is None:
+            eos = self.tokenizer.eos_token_id
+        self.eos_ids = set(eos if isinstance(eos, list) else [eos])
+        pad = self.tokenizer.pad_token_id
+        self.pad_id = pad if pad is not None else next(iter(self.eos_ids), 0)
+        self._cache: Any = None
+        self._mask: Any = None
+
+    def encode(self, history: list[Message]) -> list[int]:
+        return self.hf._encode(history)["input_ids"][0].tolist()
+
+    def decode(self, ids: list[int]) -> str:
+        return self.tokenizer.decode(ids, skip_special_tokens=True)
+
+    def is_eos(self, token_id: int) -> bool:
+        return token_id in self.eos_ids
+
+    def _forward(self, input_ids: Any, position_ids: Any) -> list[int]:
+        torch = self._torch
+        with torch.no_grad():
+            output = self.model(
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=self._mask.to(self.model.device),
+                position_ids=position_ids.to(self.model.device),
+                past_key_values=self._cache,
+                use_cache=True,
+            )
+        self._cache = output.past_key_values
+        return output.logits[:, -1].argmax(-1).tolist()
+
+    def rebuild(self, sequences: list[Sequence]) -> list[int]:
+        return self._prefill([seq.ids for seq in sequences])
+
+    def _prefill(self, rows: list[list[int]]) -> list[int]:
+        torch = self._torch
+        width = max(len(row) for row in rows)
+        input_ids = torch.tensor(
+            [[self.pad_id] * (width - len(row)) + row for row in rows]
+        )
+        self._mask = torch.tensor(
+            [[0] * (width - len(row)) + [1] * len(row) for row in rows]
+        )
+        self._cache = None
+        position_ids = (self._mask.cumsum(-1) - 1).clamp(min=0)
+        return self._forward(input_ids, position_ids)
+
+    def step(self, sequences: list[Sequence]) -> list[int]:
+        torch = self._torch
+        input_ids = torch.tensor([[seq.generated[-1]] for seq in sequences])
+        self._mask = torch.cat(
+            [self._mask, torch.ones(len(sequences), 1, dtype=self._mask.dtype)], dim=1
+        )
+        position_ids = self._mask.sum(-1, keepdim=True) - 1
+        return self._forward(input_ids, position_ids)
+
+    def join(self, sequences: list[Sequence]) -> list[int] | None:
+        layers = getattr(self._cache, "layers", None)
+        if not layers or not all(
+            hasattr(layer, "keys") and not layer.is_sliding for layer in layers
+        ):
+            return None
+        cache, mask = self._cache, self._mask
+        self._cache = None
+        next_ids = self._prefill([seq.ids for seq in sequences])
+        # Left-pad the narrower cache, then stack the new rows under the old.
+        width = max(mask.shape[1], self._mask.shape[1])
+        for old, new in zip(cache.layers, self._cache.layers):
+            old.keys = self._stack(old.keys, new.keys, width)
+            old.values = self._stack(old.values, new.values, width)
+        self._mask = self._stack(mask, self._mask, width)
+        self._cache = cache
+        return next_ids
+
+    def _stack(self, top: Any, bottom: Any, width: int) -> Any:
+        """Concatenate batches ``top`` and ``bottom``, left-padded to ``width``.
+
+        The sequence dimension is the last one of an attention mask and the
+        second to last one of cached keys and values.
+        """
+        dim = -1 if top.dim() == 2 else -2
+        padded = []
+        for rows in (top, bottom):
+            shape = list(rows.shape)
+            shape[dim] = width - rows.shape[dim]
+            padded.append(self._torch.cat([rows.new_zeros(shape), rows], dim=dim))
+        return self._torch.cat(padded, dim=0)
+
+    def drop(self, keep: list[int]) -> bool:
+        if self._cache is None or not hasattr(self._cache, "batch_select_indices"):
+            return False
+        indices = self._torch.tensor(keep)
+        self._cache.batch_select_indices(indices)
+        self._mask = self._mask[indices]
+        return True
+
+
+class StubBatchBackend(BatchBackend):
+    """Deterministic stand-in model for load tests without a GPU.
+
+    Replies with ``reply`` one word per step and sleeps ``step_seconds`` per
+    forward pass regardless of batch size, like a memory-bound decoder.
+    """
+
+    def __init__(
+        self,
+        reply: str = "This is a stub reply from MILO.",
+        step_seconds: float = 0.01,
+    ) -> None:
+        self.words = reply.split(" ")
+        self.step_seconds = step_seconds
+        self.batch_sizes: deque[int] = deque(maxlen=10_000)
+
+    def encode(self, history: list[Message]) -> list[int]:
+        return [len(m.content) for m in history] or [0]
+
+    def decode(self, ids: list[int]) -> str:
+        return " ".join(self.words[i] for i in ids if i < len(self.words))
+
+    def is_eos(self, token_id: int) -> bool:
+        return token_id >= len(self.words)
+
+    def rebuild(self, sequences: list[Sequence]) -> list[int]:
+        return self.step(sequences)
+
+    def join(self, sequences: list[Sequence]) -> list[int] | None:
+        return self.step(sequences)
+
+    def step(self, sequences: list[Sequence]) -> list[int]:
+        self.batch_sizes.append(len(sequences))
+        time.sleep(self.step_seconds)
+        return [len(seq.generated) for seq in sequences]
+
+    def drop(self, keep: list[int]) -> bool:
+        return True
+
+
+@dataclass
+class BatchStats:
+    """Counters describing how well requests were batched."""
+
+    requests: int = 0
+    steps: int = 0
+    rebuilds: int = 0
+    joins: int = 0
+    tokens: int = 0
+    max_batch_size: int = 0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.tokens / self.steps if self.steps else 0.0
+
+
+class BatchScheduler:
+    """Share one model between concurrent conversations.
+
+    The scheduler implements the :class:`LocalModelInterface` methods, so it
+    can stand in for the model of any :class:`~milo_core.pipeline.TurnPipeline`.
+
+    Parameters
+    ----------
+    backend:
+        Model operations used for decoding.
+    max_batch_size:
+        Maximum number of sequences decoded together. Further requests wait
+        until a slot frees up.
+    max_new_tokens:
+        Default generation limit per request.
+    """
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        max_batch_size: int = 8,
+        max_new_tokens: int = 256,
+    ) -> None:
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_new_tokens = max_new_tokens
+        self.stats = BatchStats()
+        self._ids = itertools.count()
+        self._waiting: deque[Sequence] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def load_model(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    def unload(self) -> None:
+        self.close()
+
+    def stream_response(
+        self, history: list[Message], max_new_tokens: int | None = None
+    ) -> Iterator[str]:
+        """Queue a generation for ``history`` and yield its text as it decodes."""
+        seq = Sequence(
+            next(self._ids),
+            self.backend.encode(history),
+            max_new_tokens or self.max_new_tokens,
+        )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Batch scheduler is closed")
+            self._waiting.append(seq)
+            self.stats.requests += 1
+            self._condition.notify()
+        try:
+            while (text := seq.output.get()) is not None:
+                yield text
+        finally:
+            # Closing the iterator early frees the batch slot.
+            seq.cancelled = True
+
+    def generate_response(self, prompt: str, max_new_tokens: int | None = None) -> str:
+        history = [Message(role="user", content=prompt)]
+        return "".join(self.stream_response(history, max_new_tokens))
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+
+    def _admit(self, active: list[Sequence]) -> list[Sequence]:
+        """Move waiting requests into ``active`` and return the ones added."""
+        with self._condition:
+            while not active and not self._waiting and not self._closed:
+                self._condition.wait()
+            added: list[Sequence] = []
+            while self._waiting and len(active) + len(added) < self.max_batch_size:
+                added.append(self._waiting.popleft())
+            active.extend(added)
+            return added
+
+    def _decode(
+        self, active: list[Sequence], added: list[Sequence], rebuild: bool
+    ) -> tuple[list[Sequence], list[int]]:
+        """Run one forward pass; return the sequences it extended and their ids.
+
+        New sequences join the running batch in a pass of their own, so the
+        others are not reprocessed; they skip one step instead.
+        """
+        if added and not rebuild and len(added) < len(active):
+            next_ids = self.backend.join(added)
+            if next_ids is not None:
+                self.stats.joins += 1
+                return added, next_ids
+            rebuild = True
+        if rebuild or added:
+            self.stats.rebuilds += 1
+            return active, self.backend.rebuild(active)
+        return active, self.backend.step(active)
+
+    def _run(self) -> None:
+        active: list[Sequence] = []
+        rebuild = False
+        while True:
+            added = self._admit(active)
+            if self._closed:
+                for seq in active + list(self._waiting):
+                    seq.output.put(None)
+                return
+            try:
+                extended, next_ids = self._decode(active, added, rebuild)
+            except Exception:
+                logger.exception("Batched decoding step failed")
+                for seq in active:
+                    seq.output.put(None)
+                active = []
+                continue
+            rebuild = False
+            self.stats.steps += 1
+            self.stats.tokens += len(extended)
+            self.stats.max_batch_size = max(self.stats.max_batch_size, len(active))
+
+            for seq, token_id in zip(extended, next_ids):
+                self._advance(seq, token_id)
+            keep = [i for i, seq in enumerate(active) if not seq.finished]
+            if len(keep) != len(active):
+                active = [active[i] for i in keep]
+                if active and not self.backend.drop(keep):
+                    rebuild = True
+
+    def _advance(self, seq: Sequence, token_id: int) -> None:
+        if seq.cancelled or self.backend.is_eos(token_id):
+            seq.finished = True
+        else:
+            seq.generated.append(token_id)
+            # Decode a short window instead of the whole reply; the preceding
+            # token tells the tokenizer whether the new one starts a word.
+            window = seq.generated[seq.prefix_offset :]
+            emitted = self.backend.decode(window[: seq.read_offset - seq.prefix_offset])
+            text = self.backend.decode(window)
+            # Emit only complete characters; a multi-byte character may
+            # still be split across tokens.
+            if not text.endswith("�") and len(text) > len(emitted):
+                seq.output.put(text[len(emitted) :])
+                seq.text += text[len(emitted) :]
+                seq.prefix_offset = seq.read_offset
+                seq.read_offset = len(seq.generated)
+            if len(seq.generated) >= seq.max_new_tokens:
+                seq.finished = True
+        if seq.finished:
+            seq.output.put(None)
@@ -0,0 +1,496 @@
+"""Constrain generated JSON commands to a schema.
+
+:func:`prefix_status` checks whether text can still be completed to a JSON
+value matching a schema. It supports the subset of JSON Schema produced by
+:func:`milo_core.commands.command_schema`: ``type``, ``const``, ``enum``,
+``anyOf``, object ``properties``/``required``/``additionalProperties`` and
+array ``prefixItems``/``items``/``minItems``/``maxItems``.
+
+:class:`CommandLogitsProcessor` applies the same check during generation.
+It keeps the parser state of the text generated so far and only matches
+each candidate token's text against it. Once a reply starts with ``{``, any
+token that would make the command invalid is masked, and the
+end-of-sequence token is forced once the object is complete.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+from milo_core import tracing
+
+logger = logging.getLogger(__name__)
+
+INVALID = "invalid"
+PARTIAL = "partial"
+COMPLETE = "complete"
+
+_WS = " \t\n\r"
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_NUMBER_PREFIX = re.compile(r"-?(?:0|[1-9]\d*)?(?:\.\d*)?(?:[eE][+-]?\d*)?")
+_INTEGER = re.compile(r"-?(?:0|[1-9]\d*)")
+_INTEGER_PREFIX = re.compile(r"-?(?:0|[1-9]\d*)?")
+_ANY_TYPE = ["object", "array", "string", "number", "boolean", "null"]
+
+
+def prefix_status(schema: dict[str, Any], text: str) -> str:
+    """Return whether ``text`` is a complete, partial or invalid instance.
+
+    ``"partial"`` means some continuation of ``text`` matches ``schema``.
+    """
+    matcher = _Matcher(schema)
+    return matcher.status(matcher.feed(matcher.initial, text))
+
+
+# A parser configuration is a stack of frames, linked as ``(frame, parent)``
+# tuples so configurations share their tails and can be kept in sets.
+_Config = tuple[tuple[Any, ...], Any]
+_DONE: _Config = (("done",), None)
+_EMPTY: dict[str, Any] = {}
+
+
+class _Matcher:
+    """Incremental, character-level matcher of JSON text against a schema.
+
+    :meth:`feed` advances a set of parser configurations over new text, so a
+    caller that keeps the configurations of an accepted prefix only pays for
+    the characters it adds. Alternatives (``anyOf``) are followed side by
+    side; an empty set means the text cannot match.
+    """
+
+    def __init__(self, schema: dict[str, Any]) -> None:
+        self._nodes: list[dict[str, Any]] = []
+        self._compiled: dict[int, int] = {}
+        root = self._compile(schema)
+        self.initial: frozenset[_Config] = frozenset(self._start(root, None))
+
+    def feed(self, configs: frozenset[_Config], text: str) -> frozenset[_Config]:
+        """Configurations after reading ``text`` from ``configs``."""
+        for char in text:
+            if not configs:
+                break
+            configs = frozenset(
+                after for config in configs for after in self._step(config, char)
+            )
+        return configs
+
+    @staticmethod
+    def status(configs: frozenset[_Config]) -> str:
+        if _DONE in configs:
+            return COMPLETE
+        return PARTIAL if configs else INVALID
+
+    def _compile(self, schema: dict[str, Any]) -> int:
+        """Index of ``schema`` in the node table, compiling it on first use."""
+        key = id(schema)
+        if key in self._compiled:
+            return self._compiled[key]
+        index = self._compiled[key] = len(self._nodes)
+        self._nodes.append({})
+        node: dict[str, Any] = {}
+        alternatives = schema.get("anyOf") or schema.get("oneOf")
+        if alternatives:
+            node["alternatives"] = [self._compile(a) for a in alternatives]
+        elif "const" in schema or "enum" in schema:
+            values = [schema["const"]] if "const" in schema else schema["enum"]
+            node["literals"] = [json.dumps(value) for value in values]
+        else:
+            types = schema.get("type", _ANY_TYPE)
+            node["types"] = frozenset([types] if isinstance(types, str) else types)
+            node["properties"] = {
+                name: self._compile(value)
+                for name, value in schema.get("properties", {}).items()
+            }
+            extra = schema.get("additionalProperties", True)
+            node["extra"] = (
+                None
+                if extra is False
+                else self._compile(extra if isinstance(extra, dict) else _EMPTY)
+            )
+            node["required"] = frozenset(schema.get("required", []))
+            node["prefix_items"] = [
+                self._compile(item) for item in schema.get("prefixItems", [])
+            ]
+            items = schema.get("items", _EMPTY)
+            node["items"] = None if items is False else self._compile(items)
+            node["min_items"] = schema.get("minItems", 0)
+            node["max_items"] = schema.get("maxItems")
+        self._nodes[index] = node
+        return index
+
+    def _start(self, node: int, parent: _Config | None) -> Iterator[_Config]:
+        """Configurations expecting a value for ``node``."""
+        alternatives = self._nodes[node].get("alternatives")
+        if alternatives:
+            for alternative in alternatives:
+                yield from self._start(alternative, parent)
+        else:
+            yield (("value", node), parent)
+
+    def _resume(self, parent: _Config | None, value: Any) -> Iterator[_Config]:
+        """Configurations after a value, ``value`` if it was a key, ended."""
+        if parent is None:
+            yield _DONE
+            return
+        frame, grandparent = parent
+        if frame[0] == "object":
+            _, node, used, state, key = frame
+            if state == "value":
+                yield (("object", node, used | {key}, "after", None), grandparent)
+                return
+            n = self._nodes[node]
+            if value in used or (value not in n["properties"] and n["extra"] is None):
+                return
+            yield (("object", node, used, "colon", value), grandparent)
+        else:
+            _, node, index, _ = frame
+            yield (("array", node, index, "after"), grandparent)
+
+    def _step(self, config: _Config, char: str) -> Iterator[_Config]:
+        frame, parent = config
+        kind = frame[0]
+        if kind == "done":
+            if char in _WS:
+                yield config
+        elif kind == "value":
+            yield from self._value(frame[1], parent, char)
+        elif kind == "literal":
+            _, literal, position = frame
+            if literal[position] != char:
+                return
+            if position + 1 == len(literal):
+                yield from self._resume(parent, None)
+            else:
+                yield (("literal", literal, position + 1), parent)
+        elif kind == "string":
+            yield from self._string(frame, parent, char)
+        elif kind == "number":
+            yield from self._number(frame, parent, char)
+        elif kind == "object":
+            yield from self._object(config, char)
+        else:
+            yield from self._array(config, char)
+
+    def _value(self, node: int, parent: _Config | None, char: str) -> Iterator[_Config]:
+        if char in _WS:
+            yield (("value", node), parent)
+            return
+        n = self._nodes[node]
+        literals = n.get("literals")
+        if literals is None:
+            types = n["types"]
+            literals = []
+            if char == "{" and "object" in types:
+                yield (("object", node, frozenset(), "open", None), parent)
+            elif char == "[" and "array" in types:
+                yield (("array", node, 0, "open"), parent)
+            elif char == '"' and "string" in types:
+                yield (("string", False, "", 0, None), parent)
+            elif char in "-0123456789" and ("number" in types or "integer" in types):
+                number = ("number", "", "number" not in types)
+                yield from self._number(number, parent, char)
+            elif char in "tf" and "boolean" in types:
+                literals = ["true", "false"]
+            elif char == "n" and "null" in types:
+                literals = ["null"]
+        for literal in literals:
+            yield from self._step((("literal", literal, 0), parent), char)
+
+    def _string(
+        self, frame: tuple[Any, ...], parent: _Config | None, char: str
+    ) -> Iterator[_Config]:
+        # ``escape`` is 0 outside escapes, -1 after a backslash and the
+        # number of hex digits still expected after ``\u``.
+        _, is_key, text, escape, names = frame
+        if escape == -1:
+            if char == "u":
+                escape = 4
+            elif char in '"\\/bfnrt':
+                escape = 0
+            else:
+                return
+        elif escape > 0:
+            if char not in "0123456789abcdefABCDEF":
+                return
+            escape -= 1
+        elif char == '"':
+            yield from self._resume(parent, json.loads(f'"{text}"') if is_key else None)
+            return
+        elif char == "\\":
+            escape = -1
+        elif ord(char) < 0x20:
+            return
+        if is_key:
+            text += char
+            if names is not None and not any(name.startswith(text) for name in names):
+                return
+        yield (("string", is_key, text, escape, names), parent)
+
+    def _number(
+        self, frame: tuple[Any, ...], parent: _Config | None, char: str
+    ) -> Iterator[_Config]:
+        _, text, integer = frame
+        complete, prefix = (
+            (_INTEGER, _INTEGER_PREFIX) if integer else (_NUMBER, _NUMBER_PREFIX)
+        )
+        if prefix.fullmatch(text + char):
+            yield (("number", text + char, integer), parent)
+        elif text and complete.fullmatch(text):
+            # The number ended before ``char``, which belongs to the parent.
+            for config in self._resume(parent, None):
+                yield from self._step(config, char)
+
+    def _object(self, config: _Config, char: str) -> Iterator[_Config]:
+        (_, node, used, state, key), parent = config
+        if char in _WS:
+            yield config
+            return
+        n = self._nodes[node]
+        if state in ("open", "next"):
+            if char == "}" and state == "open":
+                if not n["required"]:
+                    yield from self._resume(parent, None)
+            elif char == '"':
+                names = None
+                if n["extra"] is None:
+                    names = frozenset(p for p in n["properties"] if p not in used)
+                    if not names:
+                        return
+                waiting = (("object", node, used, "key", None), parent)
+                yield (("string", True, "", 0, names), waiting)
+        elif state == "colon":
+            if char == ":":
+                value = n["properties"].get(key, n["extra"])
+                waiting = (("object", node, used, "value", key), parent)
+                yield from self._start(value, waiting)
+        elif state == "after":
+            if char == "," and (
+                n["extra"] is not None or used < n["properties"].keys()
+            ):
+                yield (("object", node, used, "next", None), parent)
+            elif char == "}" and n["required"] <= used:
+                yield from self._resume(parent, None)
+
+    def _array(self, config: _Config, char: str) -> Iterator[_Config]:
+        (_, node, index, state), parent = config
+        if char in _WS:
+            yield config
+            return
+        n = self._nodes[node]
+        if state == "open" and char == "]":
+            if n["min_items"] == 0:
+                yield from self._resume(parent, None)
+        elif state in ("open", "next"):
+            item = self._item(n, index)
+            if item is None:
+                return
+            waiting = (("array", node, index, "item"), parent)
+            for start in self._start(item, waiting):
+                yield from self._step(start, char)
+        elif state == "after":
+            if char == ",":
+                yield (("array", node, index + 1, "next"), parent)
+            elif char == "]" and index + 1 >= n["min_items"]:
+                yield from self._resume(parent, None)
+
+    @staticmethod
+    def _item(n: dict[str, Any], index: int) -> int | None:
+        if n["max_items"] is not None and index >= n["max_items"]:
+            return None
+        if index < len(n["prefix_items"]):
+            return n["prefix_items"][index]
+        return n["items"]
+
+
+@dataclass
+class ConstraintStats:
+    """What constrained decoding changed in generated commands.
+
+    ``saved_tokens`` counts the tokens of commands in which the model's top
+    choice was rejected at least once. Without the constraint those
+    commands would have failed to parse or dispatch, wasting the
+    generation.
+    """
+
+    commands: int = 0
+    tokens: int = 0
+    corrected: int = 0
+    corrections: int = 0
+    saved_tokens: int = 0
+
+
+class CommandLogitsProcessor:
+    """Logits processor that keeps a JSON command valid for ``schema``.
+
+    Follows the ``transformers`` logits processor protocol for a single
+    sequence. Replies that do not start with ``{`` are left alone.
+
+    Parameters
+    ----------
+    tokenizer:
+        Tokenizer used to decode candidate tokens.
+    schema:
+        JSON schema every command must match.
+    prompt_length:
+        Number of prompt tokens at the start of ``input_ids``.
+    eos_token_ids:
+        Tokens that end the reply; forced once the command is complete.
+    stats:
+        Counters updated as commands are generated.
+    top_k:
+        Number of valid candidates kept at each step of a command.
+    max_candidates:
+        Candidates examined per step, by decreasing score, before giving up
+        on the constraint for the rest of the reply.
+    token_pieces:
+        Cache of the text each token id decodes to, shared by processors
+        using the same tokenizer so every token is decoded only once.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        schema: dict[str, Any],
+        prompt_length: int,
+        eos_token_ids: Iterable[int],
+        stats: ConstraintStats | None = None,
+        top_k: int = 8,
+        max_candidates: int = 1024,
+        token_pieces: dict[int, str] | None = None,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.schema = schema
+        self.prompt_length = prompt_length
+        self.eos_token_ids = set(eos_token_ids)
+        self.stats = stats or ConstraintStats()
+        self.top_k = top_k
+        self.max_candidates = max_candidates
+        self.token_pieces = token_pieces if token_pieces is not None else {}
+        self._matcher = _Matcher(schema)
+        self._anchor, self._anchor_text = self._find_anchor()
+        self._in_command = False
+        self._finished = False
+        self._corrected = False
+        self._tokens = 0
+        # Generated text read so far, and the matcher state after it.
+        self._seen = 0
+        self._text = ""
+        self._configs = self._matcher.initial
+
+    def __call__(self, input_ids: Any, scores: Any) -> Any:
+        if self._finished:
+            return scores
+        generated: list[int] = input_ids[0, self.prompt_length :].tolist()
+        for token_id in generated[self._seen :]:
+            piece = self._piece(token_id)
+            self._text += piece
+            self._configs = self._matcher.feed(self._configs, piece)
+        self._seen = len(generated)
+        body = self._text.lstrip()
+        if body and not body.startswith("{"):
+            # Plain text reply; nothing to constrain.
+            self._finished = True
+            return scores
+        if body and not self._in_command:
+            self._in_command = True
+            self.stats.commands += 1
+        if self._in_command:
+            self._tokens += 1
+            self.stats.tokens += 1
+            status = self._matcher.status(self._configs)
+            if status == COMPLETE:
+                return self._finish_command(scores)
+            if status == INVALID:
+                # The command went wrong before it was constrained.
+                self._finished = True
+                return scores
+
+        allowed: list[int] = []
+        rejected: list[int] = []
+        order = scores[0].argsort(descending=True)[: self.max_candidates].tolist()
+        for token_id in order:
+            if self._allowed(token_id):
+                allowed.append(token_id)
+                if len(allowed) == self.top_k:
+                    break
+            else:
+                rejected.append(token_id)
+
+        if not self._in_command:
+            # Still deciding between text and a command: only forbid tokens
+            # that would start an invalid command.
+            if rejected:
+                scores[0, rejected] = float("-inf")
+            return scores
+        if not allowed:
+            logger.warning("No valid command token among the top candidates")
+            self._finished = True
+            return scores
+        if allowed[0] != order[0]:
+            self._corrected = True
+            self.stats.corrections += 1
+        return self._only(scores, allowed)
+
+    def _allowed(self, token_id: int) -> bool:
+        if token_id in self.eos_token_ids:
+            return not self._in_command
+        piece = self._piece(token_id)
+        if not piece:
+            # Special tokens render as nothing and cannot extend a command.
+            return not self._in_command
+        if not (self._text + piece).lstrip().startswith("{"):
+            return True
+        if piece.isspace() and self._text[-1:].isspace():
+            # Keep the model from padding a command with endless whitespace.
+            return False
+        return bool(self._matcher.feed(self._configs, piece))
+
+    def _find_anchor(self) -> tuple[int, str]:
+        """A token that renders as text, to decode other tokens after."""
+        for token_id in reversed(self.tokenizer.encode("a")):
+            text = self.tokenizer.decode([token_id], skip_special_tokens=True)
+            if text:
+                return token_id, text
+        raise ValueError("The tokenizer cannot encode plain text")
+
+    def _piece(self, token_id: int) -> str:
+        """Text ``token_id`` adds when it follows other text.
+
+        Decoded after an anchor token so word-start markers turn into the
+        space they stand for, and cached in :attr:`token_pieces`.
+        """
+        piece = self.token_pieces.get(token_id)
+        if piece is None:
+            text = self.tokenizer.decode(
+                [self._anchor, token_id], skip_special_tokens=True
+            )
+            anchor = self._anchor_text
+            piece = text[len(anchor) :] if text.startswith(anchor) else ""
+            self.token_pieces[token_id] = piece
+        return piece
+
+    def _finish_command(self, scores: Any) -> Any:
+        self._finished = True
+        if self._corrected:
+            self.stats.corrected += 1
+            self.stats.saved_tokens += self._tokens
+            tracing.metric("constrained_saved_tokens", self._tokens)
+            logger.info(
+                "Constrained decoding fixed %d of %d commands, %d tokens saved",
+                self.stats.corrected,
+                self.stats.commands,
+                self.stats.saved_tokens,
+            )
+        if not self.eos_token_ids:
+            return scores
+        return self._only(scores, list(self.eos_token_ids))
+
+    @staticmethod
+    def _only(scores: Any, token_ids: list[int]) -> Any:
+        masked = scores.new_full(scores.shape, float("-inf"))
+        masked[0, token_ids] = scores[0, token_ids]
+        return masked
@@ -1,30 +1,72 @@
 from __future__ import annotations
 
-from threading import Thread
-from typing import Iterator, List
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Iterator, List, Set, Tuple
 
 import torch
 from transformers import (
     AutoModelForCausalLM,
     AutoTokenizer,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
     TextIteratorStreamer,
 )
 
+from milo_core import tracing
 from milo_core.memory import Message
+from milo_core.speculation import SpeculationStats
+from .constrained import CommandLogitsProcessor, ConstraintStats
 from .interface import LocalModelInterface
 
 
+class _StopWhenSet(StoppingCriteria):
+    """End generation once ``event`` is set."""
+
+    def __init__(self, event: Event) -> None:
+        self.event = event
+
+    def __call__(self, input_ids: Any, scores: Any, **kwargs: Any) -> Any:
+        return torch.full(
+            (input_ids.shape[0],),
+            self.event.is_set(),
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
 class HuggingFaceModel(LocalModelInterface):
-    """Load and interact with a Hugging Face transformer model."""
+    """Load and interact with a Hugging Face transformer model.
+
+    Parameters
+    ----------
+    model_name:
+        Hugging Face model id or local path.
+    command_schema:
+        Optional JSON schema for commands. When set, a reply that starts
+        with ``{`` is decoded under the schema, see
+        :class:`~milo_core.llm.constrained.CommandLogitsProcessor`.
+    """
 
-    def __init__(self, model_name: str) -> None:
+    def __init__(
+        self, model_name: str, command_schema: Dict[str, Any] | None = None
+    ) -> None:
         self.model_name = model_name
+        self.command_schema = command_schema
+        self.command_stats = ConstraintStats()
+        # Text of each token, decoded once for all constrained replies.
+        self._token_pieces: Dict[int, str] = {}
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForCausalLM.from_pretrained(
             model_name,
             device_map="auto",
             torch_dtype=torch.bfloat16,
         )
+        # Token ids, KV cache and compute time of the last prefilled prefix.
+        self._prefix: Tuple[Any, Any, float] | None = None
+        self._prefix_lock = Lock()
+        self.prefill_stats = SpeculationStats()
 
     def load_model(self) -> None:
         return None
@@ -37,18 +79,126 @@ class HuggingFaceModel(LocalModelInterface):
         output = self.model.generate(**inputs, max_new_tokens=max_new_tokens)
         return self.tokenizer.decode(output[0], skip_special_tokens=True)
 
+    def _eos_token_ids(self) -> Set[int]:
+        eos = getattr(self.model.generation_config, "eos_token_id", None)
+        if eos is None:
+            eos = self.tokenizer.eos_token_id
+        if eos is None:
+            return set()
+        return set(eos if isinstance(eos, list) else [eos])
+
+    def _encode(self, history: List[Message]) -> Any:
+        messages = [{"role": m.role, "content": m.content} for m in history]
+        prompt = self.tokenizer.apply_chat_template(messages, tokenize=False)
+        return self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+
+    def prefill(self, history: List[Message]) -> None:
+        """Compute the KV cache for ``history`` ahead of the next reply.
+
+        A later :meth:`stream_response` whose prompt starts with the same
+        tokens reuses the cache and only processes the new part of the
+        prompt. Any other prompt ignores it.
+        """
+        if not history:
+            return
+        input_ids = self._encode(history)["input_ids"]
+        with self._prefix_lock:
+            if self._prefix is not None and torch.equal(self._prefix[0], input_ids):
+                return
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = self.model(input_ids=input_ids, use_cache=True)
+        seconds = time.perf_counter() - start
+        with self._prefix_lock:
+            self._prefix = (input_ids, output.past_key_values, seconds)
+
+    def _reuse_prefix(self, input_ids: Any) -> Tuple[Any, Any, float] | None:
+        """Take the prefilled prefix if ``input_ids`` extends it.
+
+        The prefix is handed over rather than copied, since copying the KV
+        cache costs about as much as the prefill it saves. It is unavailable
+        until :meth:`_restore_prefix` gives it back.
+        """
+        with self._prefix_lock:
+            prefix = self._prefix
+            if prefix is None:
+                return None
+            prefix_ids = prefix[0]
+            length = prefix_ids.shape[-1]
+            self.prefill_stats.attempts += 1
+            if input_ids.shape[-1] <= length or not torch.equal(
+                input_ids[..., :length], prefix_ids
+            ):
+                self.prefill_stats.misses += 1
+                return None
+            self._prefix = None
+        self.prefill_stats.hits += 1
+        self.prefill_stats.saved_seconds += prefix[2]
+        return prefix
+
+    def _restore_prefix(self, prefix: Tuple[Any, Any, float]) -> None:
+        """Crop a used prefix cache back to the prefix and keep it for reuse."""
+        prefix_ids, cache, _ = prefix
+        if not hasattr(cache, "crop"):
+            return
+        cache.crop(prefix_ids.shape[-1])
+        with self._prefix_lock:
+            if self._prefix is None:
+                self._prefix = prefix
+
     def stream_response(
         self, history: List[Message], max_new_tokens: int = 256
     ) -> Iterator[str]:
-        messages = [{"role": m.role, "content": m.content} for m in history]
-        prompt = self.tokenizer.apply_chat_template(messages, tokenize=False)
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        start = time.perf_counter()
+        inputs = self._encode(history)
+        tracing.record("llm_tokenize", time.perf_counter() - start)
+        kwargs = {"max_new_tokens": max_new_tokens, **inputs}
+        prefix = self._reuse_prefix(inputs["input_ids"])
+        if prefix is not None:
+            # generate() extends the cache in place.
+            kwargs["past_key_values"] = prefix[1]
         streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True)
-        thread = Thread(
-            target=self.model.generate,
-            kwargs={"streamer": streamer, "max_new_tokens": max_new_tokens, **inputs},
-        )
+        stop = Event()
+        kwargs["stopping_criteria"] = StoppingCriteriaList([_StopWhenSet(stop)])
+        if self.command_schema is not None:
+            kwargs["logits_processor"] = LogitsProcessorList(
+                [
+                    CommandLogitsProcessor(
+                        self.tokenizer,
+                        self.command_schema,
+                        prompt_length=inputs["input_ids"].shape[-1],
+                        eos_token_ids=self._eos_token_ids(),
+                        stats=self.command_stats,
+                        token_pieces=self._token_pieces,
+                    )
+                ]
+            )
+
+        def generate() -> None:
+            try:
+                self.model.generate(streamer=streamer, **kwargs)
+            finally:
+                if prefix is not None:
+                    self._restore_prefix(prefix)
+
+        thread = Thread(target=generate)
         thread.start()
-        for token in streamer:
-            yield token
+        tokens = 0
+        first: float | None = None
+        try:
+            for token in streamer:
+                if first is None:
+                    # Prompt processing dominates the wait for the first token.
+                    first = time.perf_counter()
+                    tracing.record("llm_prefill", first - start)
+                tokens += 1
+                yield token
+        finally:
+            # Closing the iterator early, e.g. once a command is complete or
+            # the user interrupts, ends generation after the current step.
+            stop.set()
         thread.join()
+        if first is not None and tokens > 1:
+            decode_seconds = time.perf_counter() - first
+            tracing.record("llm_decode", decode_seconds)
+            tracing.metric("llm_tokens_per_sec", (tokens - 1) / decode_seconds)
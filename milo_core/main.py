@@ -1,52 +1,182 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import argparse
+import sys
+from typing import Any, Dict, List
 
+from milo_core import skill_cache, tracing
 from milo_core.config import load_config
-from milo_core.llm import HuggingFaceModel
-from milo_core.plugin_manager import PluginManager
-from milo_core.voice.conversation import converse
-from milo_core.voice.engines import WhisperSTT, PiperTTS
-from milo_core.gui import run_gui
+from milo_core.startup import Startup
+from milo_core.voice.interface import TextToSpeech
 
-from milo_core.memory_manager import MemoryManager
+# Startup components in the order ``converse`` and ``run_gui`` take them.
+COMPONENTS = ["llm", "stt", "tts", "memory", "plugins"]
 
 
 def run(config: Dict[str, Any]) -> None:
-    """Initialize components and start the conversation loop."""
-    model = HuggingFaceModel(config["llm"]["model"])
-    model.load_model()
+    """Initialize components concurrently and start the conversation loop."""
+    # Backends pull in torch, transformers, chromadb, sounddevice and Tk;
+    # import them only when MILO actually starts.
+    from milo_core.commands import command_schema
+    from milo_core.gui import run_gui
+    from milo_core.llm import HuggingFaceModel
+    from milo_core.memory_manager import MemoryManager, load_embedding_model
+    from milo_core.plugin_manager import PluginManager
+    from milo_core.voice import PiperTTS, WhisperSTT, converse
+    from milo_core.voice.process import SpeechProcess
+
+    trace_cfg = config.get("tracing", {})
+    if trace_cfg.get("enabled", False):
+        tracing.configure(
+            trace_cfg.get("path", "./milo_traces/trace.jsonl"),
+            max_bytes=trace_cfg.get("max_bytes", 5_000_000),
+            backup_count=trace_cfg.get("backups", 5),
+        )
+
+    configure_commands(config)
 
     stt_cfg = config.get("stt", {})
-    stt = WhisperSTT(
-        model=stt_cfg.get("model", "base"),
-        sample_rate=stt_cfg.get("sample_rate", 16_000),
-        block_size=stt_cfg.get("block_size", 480),
-        vad_silence_duration=stt_cfg.get("vad_silence_duration", 0.8),
-        vad_mode=stt_cfg.get("vad_mode", 2),
-    )
+    stt_kwargs = {
+        "model": stt_cfg.get("model", "base"),
+        "sample_rate": stt_cfg.get("sample_rate", 16_000),
+        "block_size": stt_cfg.get("block_size", 480),
+        "vad_silence_duration": stt_cfg.get("vad_silence_duration", 0.8),
+        "vad_mode": stt_cfg.get("vad_mode", 2),
+        "partial_interval": stt_cfg.get("partial_interval"),
+    }
+    wake_cfg = stt_cfg.get("wake_word", {})
+    if wake_cfg.get("enabled", False):
+        stt_kwargs.update(
+            wake_word_model=wake_cfg.get("model", "hey_jarvis"),
+            wake_word_threshold=wake_cfg.get("threshold", 0.5),
+            wake_word_timeout=wake_cfg.get("timeout", 5.0),
+        )
 
     tts_cfg = config.get("tts", {})
-    tts = PiperTTS(tts_cfg.get("voice", ""))
-
+    cache_cfg = tts_cfg.get("cache", {})
+    tts_kwargs = {
+        "model_path": tts_cfg.get("voice", ""),
+        "lookahead": tts_cfg.get("lookahead", 2),
+        "onnx_threads": tts_cfg.get("onnx_threads"),
+        "cache_dir": cache_cfg.get("dir"),
+        "cache_entries": cache_cfg.get("max_entries", 256),
+    }
+    warmup = cache_cfg.get("warmup", [])
     memory_cfg = config.get("memory", {})
-    memory_manager = MemoryManager(
-        model, db_path=memory_cfg.get("db_path", "./milo_memory_db")
-    )
-    memory_manager.consolidate_memories()
 
-    pm = PluginManager()
-    pm.discover_plugins()
+    def load_model() -> HuggingFaceModel:
+        model = HuggingFaceModel(config["llm"]["model"])
+        model.load_model()
+        return model
+
+    def load_tts(tts: TextToSpeech) -> TextToSpeech:
+        if warmup:
+            # Rendered by the engine's own synthesis worker in the background.
+            tts.warm_up(warmup)
+        return tts
+
+    def load_memory(model: HuggingFaceModel, embedder: Any) -> MemoryManager:
+        manager = MemoryManager(
+            model,
+            db_path=memory_cfg.get("db_path", "./milo_memory_db"),
+            embedding_model=embedder,
+        )
+        manager.consolidate_memories()
+        return manager
+
+    def constrain_commands(model: HuggingFaceModel, pm: PluginManager) -> None:
+        model.command_schema = command_schema(pm)
+        pm.add_reload_listener(
+            lambda _: setattr(model, "command_schema", command_schema(pm))
+        )
 
+    reload_interval = config.get("skills", {}).get("reload_interval")
+
+    def load_plugins() -> PluginManager:
+        pm = PluginManager()
+        pm.discover_plugins()
+        if reload_interval:
+            pm.watch(reload_interval)
+        return pm
+
+    startup = Startup()
+    startup.add("llm", load_model)
+    if config.get("voice", {}).get("isolated", False):
+        startup.add("speech", lambda: SpeechProcess(stt_kwargs, tts_kwargs))
+        startup.add("stt", lambda speech: speech.stt, after=["speech"])
+        startup.add("tts", lambda speech: load_tts(speech.tts), after=["speech"])
+    else:
+        startup.add("stt", lambda: WhisperSTT(**stt_kwargs))
+        startup.add("tts", lambda: load_tts(PiperTTS(**tts_kwargs)))
+    startup.add("embeddings", load_embedding_model)
+    startup.add("memory", load_memory, after=["llm", "embeddings"])
+    startup.add("plugins", load_plugins)
+    if config["llm"].get("constrained_commands", False):
+        startup.add("command_schema", constrain_commands, after=["llm", "plugins"])
+    startup.when_ready(lambda: print(startup.report()))
+
+    components = [startup.future(name) for name in COMPONENTS]
     try:
         if not config.get("gui", {}).get("enabled", True):
-            converse(model, stt, tts, memory_manager, pm)
+            startup.wait_all()
+            converse(*(future.result() for future in components))
         else:
-            run_gui(model, stt, tts, memory_manager, pm)
+            # The window opens right away and enables input once the
+            # components a text turn needs are ready.
+            run_gui(*components)
     except KeyboardInterrupt:  # pragma: no cover - allow graceful exit
         pass
     finally:
-        model.unload()
+        startup.shutdown()
+        if startup.ready("plugins"):
+            startup.get("plugins").stop_watching()
+        if "speech" in startup and startup.ready("speech"):
+            startup.get("speech").close()
+        if startup.ready("llm"):
+            startup.get("llm").unload()
+        tracing.get_tracer().close()
+
+
+def configure_commands(config: Dict[str, Any]) -> None:
+    """Set up the skill cache, skill worker pool, workflow client and queue."""
+    from milo_core import jobs, sandbox, workflows
+
+    skills_cfg = config.get("skills", {})
+    cache_cfg = skills_cfg.get("cache", {})
+    skill_cache.configure(
+        max_entries=cache_cfg.get("max_entries", 256),
+        path=cache_cfg.get("path"),
+    )
+    sandbox_cfg = skills_cfg.get("sandbox", {})
+    sandbox.configure(
+        max_workers=sandbox_cfg.get("workers", 2),
+        max_calls=sandbox_cfg.get("max_calls", 100),
+        max_memory_mb=sandbox_cfg.get("max_memory_mb", 512),
+        timeout=sandbox_cfg.get("timeout", 30.0),
+    )
+    workflow_cfg = config.get("workflows", {})
+    workflows.configure(
+        base_url=workflow_cfg.get("base_url", workflows.DEFAULT_BASE_URL),
+        connect_timeout=workflow_cfg.get(
+            "connect_timeout", workflows.DEFAULT_CONNECT_TIMEOUT
+        ),
+        read_timeout=workflow_cfg.get("read_timeout", workflows.DEFAULT_TIMEOUT),
+        retries=workflow_cfg.get("retries", 2),
+    )
+    queue_cfg = workflow_cfg.get("queue", {})
+    previous = jobs.install(
+        jobs.JobQueue(
+            path=queue_cfg.get("path"),
+            workers=queue_cfg.get("workers", 2),
+            max_attempts=queue_cfg.get("max_attempts", 3),
+            retry_delay=queue_cfg.get("retry_delay", 5.0),
+            timeout=queue_cfg.get("timeout", 300.0),
+        )
+        if queue_cfg.get("enabled", False)
+        else None
+    )
+    if previous is not None:
+        previous.close()
 
 
 def main(config_path: str | None = None) -> None:
@@ -54,5 +184,119 @@ def main(config_path: str | None = None) -> None:
     run(config)
 
 
+def trace_report(path: str) -> None:
+    """Print per-stage latency percentiles from a trace file and its rotations."""
+    files = tracing.trace_files(path)
+    if not files:
+        print(f"No trace files found at {path}")
+        return
+    print(tracing.report(tracing.load_turns(files)))
+
+
+def run_server(
+    config: Dict[str, Any],
+    host: str | None = None,
+    port: int | None = None,
+    stub: bool = False,
+) -> None:
+    """Serve MILO over HTTP/WebSocket with one shared, batched model."""
+    from milo_core.llm import HuggingFaceModel
+    from milo_core.llm.batching import (
+        BatchScheduler,
+        HuggingFaceBatchBackend,
+        StubBatchBackend,
+    )
+    from milo_core.memory import NoLongTermMemory
+    from milo_core.memory_manager import MemoryManager
+    from milo_core.plugin_manager import PluginManager
+    from milo_core.server import MiloServer, serve
+
+    server_cfg = config.get("server", {})
+    if stub:
+        backend = StubBatchBackend()
+    else:
+        hf_model = HuggingFaceModel(config["llm"]["model"])
+        hf_model.load_model()
+        backend = HuggingFaceBatchBackend(hf_model)
+    scheduler = BatchScheduler(
+        backend,
+        max_batch_size=server_cfg.get("max_batch_size", 8),
+        max_new_tokens=server_cfg.get("max_new_tokens", 256),
+    )
+    if stub:
+        memory_manager = NoLongTermMemory()
+    else:
+        memory_cfg = config.get("memory", {})
+        memory_manager = MemoryManager(
+            scheduler, db_path=memory_cfg.get("db_path", "./milo_memory_db")
+        )
+    configure_commands(config)
+    pm = PluginManager()
+    pm.discover_plugins()
+    reload_interval = config.get("skills", {}).get("reload_interval")
+    if reload_interval:
+        pm.watch(reload_interval)
+
+    server = MiloServer(
+        scheduler,
+        memory_manager,
+        pm,
+        max_sessions=server_cfg.get("max_sessions", 64),
+    )
+    try:
+        serve(
+            server,
+            host=host or server_cfg.get("host", "127.0.0.1"),
+            port=port or server_cfg.get("port", 8765),
+        )
+    finally:
+        pm.stop_watching()
+        scheduler.close()
+
+
+def cli(argv: List[str] | None = None) -> None:
+    """Command line entry point for ``milo-core``.
+
+    ``milo-core [config.yaml]`` starts the assistant, ``milo-core serve``
+    starts the multi-session server and ``milo-core trace report``
+    summarizes recorded latency traces.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["serve"]:
+        parser = argparse.ArgumentParser(prog="milo-core serve")
+        parser.add_argument("--config", help="path to a config.yaml file")
+        parser.add_argument("--host")
+        parser.add_argument("--port", type=int)
+        parser.add_argument(
+            "--stub",
+            action="store_true",
+            help="use a canned stub model, e.g. for load testing",
+        )
+        args = parser.parse_args(argv[1:])
+        config = load_config(args.config) if args.config else load_config()
+        run_server(config, host=args.host, port=args.port, stub=args.stub)
+        return
+    if argv[:1] == ["trace"]:
+        parser = argparse.ArgumentParser(prog="milo-core trace")
+        commands = parser.add_subparsers(dest="command", required=True)
+        report = commands.add_parser("report", help="per-stage latency percentiles")
+        report.add_argument(
+            "--path", help="trace file (defaults to tracing.path in the config)"
+        )
+        report.add_argument("--config", help="path to a config.yaml file")
+        args = parser.parse_args(argv[1:])
+        path = args.path
+        if path is None:
+            config = load_config(args.config) if args.config else load_config()
+            path = config.get("tracing", {}).get("path", "./milo_traces/trace.jsonl")
+        trace_report(path)
+        return
+
+    parser = argparse.ArgumentParser(prog="milo-core")
+    parser.add_argument("config", nargs="?", help="path to a config.yaml file")
+    args = parser.parse_args(argv)
+    main(args.config)
+
+
 if __name__ == "__main__":  # pragma: no cover - entry point
-    main()
+    cli()
@@ -42,3 +42,17 @@ class ShortTermMemory:
     # NOTE: Retrieval augmented generation (RAG) integration would hook into
     # this class. For example, `get_messages` could be expanded to merge
     # results from a local vector store containing long-term knowledge.
+
+
+class NoLongTermMemory:
+    """Stand-in for :class:`~milo_core.memory_manager.MemoryManager` that
+    remembers nothing, for stub servers and offline benchmarks."""
+
+    def retrieve_relevant_memories(self, text: str, limit: int = 3) -> List[str]:
+        return []
+
+    def summarize_and_store_session(self, session_history: List[Message]) -> None:
+        return None
+
+    def consolidate_memories(self) -> None:
+        return None
@@ -3,25 +3,35 @@ import uuid
 from datetime import datetime, timezone, timedelta
 from typing import List
 
-os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "python")
+from . import tracing
+from .memory import Message
 
-import chromadb
 
-from .memory import Message
+def load_embedding_model():
+    """Load the sentence-transformers model used to embed memories."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer("all-MiniLM-L6-v2")
 
 
 class MemoryManager:
     """Manage long-term memories using a local vector store."""
 
-    def __init__(self, llm_instance, db_path: str = "./milo_memory_db") -> None:
+    def __init__(
+        self, llm_instance, db_path: str = "./milo_memory_db", embedding_model=None
+    ) -> None:
+        os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "python")
+        import chromadb
+
         self.llm = llm_instance
         self.db_client = chromadb.PersistentClient(path=db_path)
         self.collection = self.db_client.get_or_create_collection(
             name="long_term_memory"
         )
-        from sentence_transformers import SentenceTransformer
-
-        self.embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+        if embedding_model is None:
+            embedding_model = load_embedding_model()
+        # Anything with a sentence-transformers style ``encode(text)``.
+        self.embedding_model = embedding_model
 
     def summarize_and_store_session(self, session_history: List[Message]) -> None:
         """Summarize a conversation session and store it if useful."""
@@ -40,19 +50,24 @@ class MemoryManager:
             self._store_memory(summary_blurb)
 
     def _store_memory(self, text: str) -> None:
-        embedding = self.embedding_model.encode(text)
-        timestamp = datetime.now(timezone.utc).isoformat()
-        doc_id = str(uuid.uuid4())
-        self.collection.add(
-            embeddings=[embedding],
-            documents=[text],
-            metadatas=[{"timestamp": timestamp}],
-            ids=[doc_id],
-        )
+        with tracing.span("memory_write"):
+            embedding = self.embedding_model.encode(text)
+            timestamp = datetime.now(timezone.utc).isoformat()
+            doc_id = str(uuid.uuid4())
+            self.collection.add(
+                embeddings=[embedding],
+                documents=[text],
+                metadatas=[{"timestamp": timestamp}],
+                ids=[doc_id],
+            )
 
     def retrieve_relevant_memories(self, text: str, limit: int = 3) -> List[str]:
-        embedding = self.embedding_model.encode(text)
-        results = self.collection.query(query_embeddings=[embedding], n_results=limit)
+        with tracing.span("embed"):
+            embedding = self.embedding_model.encode(text)
+        with tracing.span("vector_query"):
+            results = self.collection.query(
+                query_embeddings=[embedding], n_results=limit
+            )
         documents = results.get("documents", [[]])
         return documents[0] if documents else []
 
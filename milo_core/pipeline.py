@@ -0,0 +1,575 @@
+"""Asyncio turn engine shared by the voice and GUI front-ends.
+
+A turn runs through explicit stages::
+
+    listen -> retrieve -> generate -> speak/render -> act -> persist
+
+``listen`` belongs to the front-end; :class:`TurnPipeline` runs the rest.
+Generation and rendering run concurrently and are connected by a bounded
+queue, so a slow speaker or window applies backpressure to the model.
+Cancelling :meth:`TurnPipeline.run_turn` cancels every stage, while
+:meth:`TurnPipeline.interrupt` stops only generation and rendering and lets
+the turn finish its bookkeeping.
+
+A reply that starts with a JSON command is never rendered; generation stops
+as soon as the object is complete and ``act`` runs the command right away.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import queue
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Coroutine, Iterable
+
+from milo_core import jobs as job_queue
+from milo_core import tracing
+from milo_core.commands import (
+    CommandDetector,
+    CommandError,
+    execute_command,
+    execute_plan,
+)
+from milo_core.jobs import JobQueue
+from milo_core.llm import LocalModelInterface
+from milo_core.memory import Message, ShortTermMemory
+from milo_core.plugin_manager import PluginManager
+from milo_core.speculation import Speculator
+
+if TYPE_CHECKING:  # pragma: no cover - imported for annotations only
+    from milo_core.memory_manager import MemoryManager
+
+
+@dataclass
+class TurnResult:
+    """Outcome of a single conversation turn."""
+
+    user_input: str
+    response: str
+    interrupted: bool = False
+    command: dict[str, Any] | None = None
+    command_result: str | None = None
+
+
+class TurnOutput(ABC):
+    """Front-end side of a turn: how replies are presented to the user.
+
+    Coroutines run on the pipeline's event loop and must not block it; use
+    :func:`consume_in_thread` for blocking sinks such as a TTS engine.
+    """
+
+    async def user_message(self, text: str) -> None:
+        """Show the user's input."""
+        return None
+
+    @abstractmethod
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        """Speak or display the reply while it is being generated."""
+        raise NotImplementedError
+
+    async def command_result(self, result: str) -> None:
+        """Present the result of an executed command."""
+        return None
+
+    async def finish(self, result: TurnResult) -> None:
+        """Called once the turn has completed."""
+        return None
+
+    def stop(self) -> None:
+        """Immediately stop presenting the current reply. Must be thread-safe."""
+        return None
+
+
+async def consume_in_thread(
+    consume: Callable[[Iterable[str]], None], tokens: AsyncIterator[str]
+) -> None:
+    """Feed ``tokens`` to a blocking ``consume(iterable)`` call on a worker thread."""
+    bridge: queue.Queue[str | None] = queue.Queue()
+
+    def iterate() -> Iterable[str]:
+        while (token := bridge.get()) is not None:
+            yield token
+
+    # The caller's context carries the active trace turn into the thread.
+    context = contextvars.copy_context()
+    future = asyncio.get_running_loop().run_in_executor(
+        None, context.run, consume, iterate()
+    )
+    try:
+        async for token in tokens:
+            bridge.put(token)
+    finally:
+        bridge.put(None)
+    await future
+
+
+def run_in_daemon_thread(func: Callable[..., Any], *args: Any) -> asyncio.Future[Any]:
+    """Run a blocking call on a daemon thread and return an awaitable future.
+
+    Unlike :func:`asyncio.to_thread`, the thread does not keep the event loop
+    or the interpreter from shutting down, which matters for calls such as
+    microphone reads that only return once the user speaks.
+    """
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[Any] = loop.create_future()
+    context = contextvars.copy_context()
+
+    def resolve(value: Any, error: BaseException | None) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def run() -> None:
+        try:
+            value, error = context.run(func, *args), None
+        except BaseException as exc:  # propagate KeyboardInterrupt as well
+            value, error = None, exc
+        try:
+            loop.call_soon_threadsafe(resolve, value, error)
+        except RuntimeError:  # pragma: no cover - loop already closed
+            pass
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class _Turn:
+    """State shared between the stages of one turn."""
+
+    def __init__(self, output: TurnOutput) -> None:
+        self.output = output
+        self.loop = asyncio.get_running_loop()
+        self.stopped = threading.Event()
+        self.tokens: list[str] = []
+        self.command: dict[str, Any] | None = None
+        self.interrupted = False
+        self.tasks: list[asyncio.Task[Any]] = []
+
+    def interrupt(self) -> None:
+        self.interrupted = True
+        self.stopped.set()
+        for task in self.tasks:
+            task.cancel()
+
+
+class TurnPipeline:
+    """Run conversation turns against a model, memory and plugins.
+
+    Parameters
+    ----------
+    model:
+        Model used to stream replies.
+    memory_manager:
+        Long-term memory used for retrieval and goodbye summaries.
+    plugin_manager:
+        Skills available to JSON commands. ``None`` disables commands.
+    session_memory:
+        Short-term history of the conversation.
+    queue_size:
+        Maximum number of generated tokens waiting to be rendered.
+    source:
+        Front-end name recorded with each traced turn.
+    speculator:
+        Reuses retrieval started from partial transcripts; see
+        :meth:`speculate`.
+    executor:
+        Runs blocking work such as retrieval and goodbye summaries. Defaults
+        to a private pool of ``max_workers`` threads, shut down by
+        :meth:`close`.
+    max_workers:
+        Size of the default executor, and of the separate pool that runs
+        commands.
+    skill_timeout:
+        Seconds a command may run before the turn stops waiting for it. A
+        skill's own ``timeout`` attribute takes precedence. ``None`` waits
+        indefinitely. A command that times out cannot be stopped and keeps
+        its thread until it returns. Commands have a pool of their own, so
+        hung skills cannot hold up retrieval or summaries, but enough of
+        them leave later commands waiting until they time out too. Skills
+        that may hang for good should set ``isolated``; the sandbox kills
+        them at its own timeout.
+    jobs:
+        Queue that runs workflow commands in the background; see
+        :meth:`announce_jobs`. Defaults to the process-wide queue. Without
+        one, workflows run inline like skills.
+    session_id:
+        Name the session's queued jobs are filed under. Defaults to
+        ``source``, so a restarted front-end reports jobs that finished
+        while it was down.
+    """
+
+    def __init__(
+        self,
+        model: LocalModelInterface,
+        memory_manager: MemoryManager,
+        plugin_manager: PluginManager | None = None,
+        session_memory: ShortTermMemory | None = None,
+        queue_size: int = 64,
+        source: str = "text",
+        speculator: Speculator | None = None,
+        executor: Executor | None = None,
+        max_workers: int = 4,
+        skill_timeout: float | None = 30.0,
+        jobs: JobQueue | None = None,
+        session_id: str | None = None,
+    ) -> None:
+        self.model = model
+        self.memory_manager = memory_manager
+        self.plugin_manager = plugin_manager
+        self.session_memory = session_memory or ShortTermMemory()
+        self.queue_size = queue_size
+        self.source = source
+        self.speculator = speculator
+        self.skill_timeout = skill_timeout
+        self.jobs = jobs if jobs is not None else job_queue.get_queue()
+        self.session_id = session_id or source
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="milo-pipeline"
+        )
+        self.command_executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="milo-command"
+        )
+        self._current: _Turn | None = None
+
+    async def run_blocking(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        timeout: float | None = None,
+        executor: Executor | None = None,
+    ) -> Any:
+        """Run a blocking call on ``executor`` without blocking the loop.
+
+        ``executor`` defaults to :attr:`executor`.
+
+        Raises :class:`asyncio.TimeoutError` if ``timeout`` seconds pass
+        first. The call itself cannot be interrupted and keeps its worker
+        until it returns. It runs in a copy of the caller's context, so its
+        timings are traced as part of the caller's turn.
+        """
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+        future = asyncio.get_running_loop().run_in_executor(
+            executor or self.executor, call
+        )
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    def close(self) -> None:
+        """Shut down the command pool and the default executor."""
+        self.command_executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_turn(self, user_input: str, output: TurnOutput) -> TurnResult:
+        """Run every stage after ``listen`` for ``user_input``."""
+        with tracing.turn(self.source):
+            return await self._run_turn(user_input, output)
+
+    async def _run_turn(self, user_input: str, output: TurnOutput) -> TurnResult:
+        turn = _Turn(output)
+        self._current = turn
+        try:
+            await output.user_message(user_input)
+            with tracing.span("retrieve"):
+                memories = await self.retrieve(user_input)
+            with tracing.span("prompt_build"):
+                history = self.build_history(user_input, memories)
+            await self._stream(turn, history)
+            result = self.record_response(user_input, turn)
+            if not turn.interrupted:
+                await self.act(result, output)
+            with tracing.span("persist"):
+                await self.persist(user_input)
+        except asyncio.CancelledError:
+            turn.interrupt()
+            output.stop()
+            raise
+        finally:
+            if self._current is turn:
+                self._current = None
+        await output.finish(result)
+        return result
+
+    def interrupt(self) -> None:
+        """Stop generating and rendering the current reply. Thread-safe."""
+        turn = self._current
+        if turn is None:
+            return
+        turn.loop.call_soon_threadsafe(turn.interrupt)
+        turn.output.stop()
+
+    def speculate(self, partial: str) -> None:
+        """Start retrieval and prefill for a partial transcript. Thread-safe.
+
+        Ignored while a turn is running, so speech that interrupts a reply
+        does not compete with it for the model.
+        """
+        if self.speculator is None or self._current is not None:
+            return
+        self.speculator.speculate(partial, self.session_memory.get_messages())
+
+    def discard_speculation(self) -> None:
+        """Forget work speculated for an utterance that is not becoming a turn."""
+        if self.speculator is not None:
+            self.speculator.discard()
+
+    async def retrieve(self, user_input: str) -> list[str]:
+        """Look up long-term memories relevant to ``user_input``."""
+        if self.speculator is not None:
+            memories = await self.run_blocking(self.speculator.take, user_input)
+            if memories is not None:
+                return memories
+        return await self.run_blocking(
+            self.memory_manager.retrieve_relevant_memories, user_input
+        )
+
+    def build_history(self, user_input: str, memories: list[str]) -> list[Message]:
+        """Add the turn to short-term memory and return the prompt history."""
+        if memories:
+            context_str = " ".join(memories)
+            self.session_memory.add_message(
+                "system", f"Here is some relevant context: {context_str}"
+            )
+        self.session_memory.add_message("user", user_input)
+        return self.session_memory.get_messages()
+
+    async def _stream(self, turn: _Turn, history: list[Message]) -> None:
+        tokens: asyncio.Queue[str | None] = asyncio.Queue(self.queue_size)
+        producer = asyncio.create_task(self.generate(turn, history, tokens))
+        renderer = asyncio.create_task(turn.output.render(self._drain(tokens)))
+        turn.tasks = [producer, renderer]
+        try:
+            done, pending = await asyncio.wait(
+                turn.tasks, return_when=asyncio.FIRST_EXCEPTION
+            )
+            if pending:
+                # One stage failed; stop the other before reporting the error.
+                turn.stopped.set()
+                for task in pending:
+                    task.cancel()
+                await asyncio.wait(pending)
+        except asyncio.CancelledError:
+            turn.interrupt()
+            raise
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()  # type: ignore[misc]
+
+    async def generate(
+        self, turn: _Turn, history: list[Message], tokens: asyncio.Queue[str | None]
+    ) -> None:
+        """Stream model tokens into ``tokens`` from a worker thread."""
+        loop = asyncio.get_running_loop()
+
+        def put(item: str | None) -> bool:
+            future: Future[None] = asyncio.run_coroutine_threadsafe(
+                tokens.put(item), loop
+            )
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    if turn.stopped.is_set():
+                        future.cancel()
+                        return False
+
+        # Commands are held back from the output and end generation as soon
+        # as the JSON object is complete.
+        detector = CommandDetector() if self.plugin_manager else None
+
+        def produce() -> None:
+            try:
+                for token in self.model.stream_response(history):
+                    if turn.stopped.is_set():
+                        break
+                    if not turn.tokens:
+                        tracing.mark("llm_ttft")
+                    turn.tokens.append(token)
+                    visible = detector.feed(token) if detector else token
+                    if visible and not put(visible):
+                        break
+                    if detector and detector.command is not None:
+                        tracing.mark("command_detected")
+                        turn.command = detector.command
+                        break
+                else:
+                    rest = detector.close() if detector else ""
+                    if rest:
+                        put(rest)
+            finally:
+                if not turn.stopped.is_set():
+                    put(None)
+
+        try:
+            # A thread of its own rather than the default executor, so many
+            # concurrent turns, as on the server, cannot exhaust the pool.
+            await run_in_daemon_thread(produce)
+        except asyncio.CancelledError:
+            turn.stopped.set()
+            raise
+
+    @staticmethod
+    async def _drain(tokens: asyncio.Queue[str | None]) -> AsyncIterator[str]:
+        while (token := await tokens.get()) is not None:
+            yield token
+
+    def record_response(self, user_input: str, turn: _Turn) -> TurnResult:
+        """Store the (possibly interrupted) reply in short-term memory."""
+        response = "".join(turn.tokens)
+        if turn.interrupted and response:
+            self.session_memory.add_message(
+                "assistant", f"<interrupted_thought>{response}</interrupted_thought>"
+            )
+        elif response:
+            self.session_memory.add_message("assistant", response)
+        return TurnResult(
+            user_input, response, interrupted=turn.interrupted, command=turn.command
+        )
+
+    async def act(self, result: TurnResult, output: TurnOutput) -> None:
+        """Execute the JSON command the reply started with, if any."""
+        if not self.plugin_manager or result.command is None:
+            return
+        timeout = self.command_timeout(result.command)
+        try:
+            with tracing.span("skill"):
+                if result.command.get("type") == "workflow" and self.jobs is not None:
+                    job = await self.run_blocking(
+                        self.jobs.submit,
+                        result.command,
+                        self.session_id,
+                        executor=self.command_executor,
+                    )
+                    value = (
+                        f"Started workflow {job.workflow}; "
+                        "I'll report back when it finishes."
+                    )
+                elif result.command.get("type") == "plan":
+                    value = await self.run_blocking(
+                        execute_plan,
+                        result.command,
+                        self.plugin_manager,
+                        self.command_timeout,
+                        executor=self.command_executor,
+                    )
+                else:
+                    value = await self.run_blocking(
+                        execute_command,
+                        result.command,
+                        self.plugin_manager,
+                        timeout=timeout,
+                        executor=self.command_executor,
+                    )
+        except CommandError as exc:
+            value = str(exc)
+        except asyncio.TimeoutError:
+            value = f"The command did not finish within {timeout:g} seconds."
+        result.command_result = str(value)
+        self.session_memory.add_message("assistant", result.command_result)
+        await output.command_result(result.command_result)
+
+    def command_timeout(self, command: dict[str, Any]) -> float | None:
+        """Seconds to wait for ``command``; see ``skill_timeout``.
+
+        Plans are not limited as a whole; each of their steps is.
+        """
+        if command.get("type") == "skill" and self.plugin_manager is not None:
+            skill = self.plugin_manager.get_skill_by_name(str(command.get("name")))
+            timeout = getattr(skill, "timeout", None)
+            if isinstance(timeout, (int, float)):
+                return timeout
+        return self.skill_timeout
+
+    async def announce_jobs(
+        self, output: TurnOutput, poll_interval: float = 1.0
+    ) -> None:
+        """Report this session's finished workflow jobs until cancelled.
+
+        Each outcome goes to ``output.command_result`` and into session
+        memory, so the model knows about it on the next turn. Reports wait
+        while a turn is running and are checked when a job finishes or
+        every ``poll_interval`` seconds.
+        """
+        if self.jobs is None:
+            return
+        jobs = self.jobs
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+
+        def wake(job: Any) -> None:
+            if job.owner == self.session_id:
+                loop.call_soon_threadsafe(finished.set)
+
+        jobs.add_listener(wake)
+        try:
+            while True:
+                if self._current is None:
+                    for job in await self.run_blocking(
+                        jobs.take_finished, self.session_id
+                    ):
+                        text = job.describe()
+                        self.session_memory.add_message("assistant", text)
+                        await output.command_result(text)
+                try:
+                    await asyncio.wait_for(finished.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                finished.clear()
+        finally:
+            jobs.remove_listener(wake)
+
+    async def persist(self, user_input: str) -> None:
+        """Summarize and store the session when the user says goodbye."""
+        if user_input.lower() != "goodbye":
+            return
+        await self.run_blocking(
+            self.memory_manager.summarize_and_store_session,
+            self.session_memory.get_messages(),
+        )
+        self.session_memory.clear()
+
+
+class LoopThread:
+    """Run an asyncio event loop on a background thread.
+
+    Lets front-ends with their own main loop, such as Tk, submit turns to the
+    pipeline from the UI thread.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future[Any]:
+        """Schedule ``coro`` on the loop and return a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        """Cancel outstanding tasks and stop the loop."""
+
+        def shutdown() -> None:
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.stop()
+
+        self.loop.call_soon_threadsafe(shutdown)
+        self._thread.join(timeout=5)
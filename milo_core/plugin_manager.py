@@ -1,27 +1,208 @@
 from __future__ import annotations
 
+import ast
+import hashlib
 import importlib
+import importlib.util
 import inspect
+import json
+import logging
 import os
 import pkgutil
+import sys
+import threading
 from pathlib import Path
 from types import ModuleType
-from typing import List
+from typing import Any, Callable, Dict, List, Set, Tuple
 
 from plugins.base import BaseSkill
 
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / "plugins"
+MANIFEST_VERSION = 2
+
+
+def _base_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return ""
+
+
+def _execute_parameters(node: ast.ClassDef) -> List[List[Any]] | None:
+    """``[name, kind, annotation]`` of the ``execute`` method ``node`` defines.
+
+    ``self`` is left out and annotations are kept as source text. ``None``
+    if the class inherits ``execute``.
+    """
+    for statement in node.body:
+        if (
+            isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef))
+            and statement.name == "execute"
+        ):
+            break
+    else:
+        return None
+    arguments = statement.args
+    kinds: List[Tuple[str, ast.arg | None]] = [
+        *(("POSITIONAL_ONLY", a) for a in arguments.posonlyargs),
+        *(("POSITIONAL_OR_KEYWORD", a) for a in arguments.args),
+        ("VAR_POSITIONAL", arguments.vararg),
+        *(("KEYWORD_ONLY", a) for a in arguments.kwonlyargs),
+        ("VAR_KEYWORD", arguments.kwarg),
+    ]
+    parameters = [
+        [arg.arg, kind, None if arg.annotation is None else ast.unparse(arg.annotation)]
+        for kind, arg in kinds
+        if arg is not None
+    ]
+    return parameters[1:]
+
+
+def _scan_module(path: Path) -> Dict[str, Any]:
+    """Find the skills a plugin file defines without importing it.
+
+    Returns ``skills`` as ``[name, class]`` pairs. ``eager`` is set when
+    the file defines a skill whose ``name`` is not a string literal in the
+    class body, so the module has to be imported to register it.
+    ``parameters`` maps each class defining ``execute`` to its parameters,
+    see :func:`_execute_parameters`.
+    """
+    try:
+        tree = ast.parse(path.read_bytes(), filename=str(path))
+    except (OSError, SyntaxError, ValueError):
+        # Importing reports the error the way discovery always has.
+        return {"skills": [], "eager": True, "parameters": {}}
+
+    skill_classes = {"BaseSkill"}
+    skills: List[List[str]] = []
+    parameters: Dict[str, List[List[Any]]] = {}
+    eager = False
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        if not any(_base_name(base) in skill_classes for base in node.bases):
+            continue
+        skill_classes.add(node.name)
+        name = None
+        for statement in node.body:
+            if (
+                isinstance(statement, ast.Assign)
+                and any(
+                    isinstance(t, ast.Name) and t.id == "name"
+                    for t in statement.targets
+                )
+                and isinstance(statement.value, ast.Constant)
+                and isinstance(statement.value.value, str)
+            ):
+                name = statement.value.value
+        if name is None:
+            eager = True
+        else:
+            skills.append([name, node.name])
+        execute = _execute_parameters(node)
+        if execute is not None:
+            parameters[node.name] = execute
+    return {"skills": skills, "eager": eager, "parameters": parameters}
+
 
 class PluginManager:
-    """Discover and load skill plugins from the ``/plugins`` directory."""
+    """Discover and load skill plugins from the ``/plugins`` directory.
+
+    Discovery reads a manifest of skill names instead of importing every
+    plugin. A module is imported, and its skill created, the first time one
+    of its skills is looked up, so plugins with heavy dependencies cost
+    nothing until they are used.
 
-    def __init__(self, plugins_path: Path | None = None) -> None:
-        self.plugins_path = (
-            plugins_path or Path(__file__).resolve().parent.parent / "plugins"
+    :meth:`reload_changed`, or the polling thread started by :meth:`watch`,
+    picks up edited, added and removed plugin files without restarting
+    MILO.
+
+    Parameters
+    ----------
+    plugins_path:
+        Directory containing the plugin modules.
+    manifest_path:
+        JSON file caching the skills found in each module. Entries are
+        refreshed when a module's modification time or size changes.
+        Defaults to ``__pycache__/milo_manifest.json`` under
+        ``plugins_path``.
+    """
+
+    def __init__(
+        self, plugins_path: Path | None = None, manifest_path: Path | None = None
+    ) -> None:
+        self.plugins_path = plugins_path or _DEFAULT_PATH
+        self.manifest_path = manifest_path or (
+            self.plugins_path / "__pycache__" / "milo_manifest.json"
         )
-        self.skills: List[BaseSkill] = []
+        # Skills discovered but not imported yet: name -> (module, class).
+        self._index: Dict[str, Tuple[str, str]] = {}
+        self._skills: Dict[str, BaseSkill] = {}
+        # Module each loaded skill came from, and the modules imported so far.
+        self._owners: Dict[str, str] = {}
+        self._loaded: Set[str] = set()
+        # Manifest entries of the modules currently registered.
+        self._modules: Dict[str, Dict[str, Any]] = {}
+        self._include_tests = False
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self._stop_watching: threading.Event | None = None
+
+    @property
+    def skills(self) -> List[BaseSkill]:
+        """Every discovered skill, importing the ones not loaded yet."""
+        for name in list(self._index):
+            self.get_skill_by_name(name)
+        return list(self._skills.values())
+
+    @skills.setter
+    def skills(self, skills: List[BaseSkill]) -> None:
+        with self._lock:
+            self._index = {}
+            self._skills = {}
+            self._owners = {}
+            for skill in skills:
+                self._skills.setdefault(skill.name, skill)
+
+    def skill_names(self) -> List[str]:
+        """Names of all discovered skills, without importing any of them."""
+        return sorted(set(self._skills) | set(self._index))
+
+    def skill_parameters(self, name: str) -> List[inspect.Parameter] | None:
+        """Parameters of skill ``name``'s ``execute`` method.
+
+        Skills not imported yet are described from the manifest, so this
+        only imports a plugin whose ``execute`` is inherited. ``None`` if
+        the skill is unknown.
+        """
+        entry = self._index.get(name)
+        if name not in self._skills and entry is not None:
+            module_name, class_name = entry
+            module = self._modules.get(module_name, {})
+            described = module.get("parameters", {}).get(class_name)
+            if described is not None:
+                return [
+                    inspect.Parameter(
+                        parameter,
+                        getattr(inspect.Parameter, kind),
+                        annotation=(
+                            inspect.Parameter.empty
+                            if annotation is None
+                            else annotation
+                        ),
+                    )
+                    for parameter, kind, annotation in described
+                ]
+        skill = self.get_skill_by_name(name)
+        if skill is None:
+            return None
+        return list(inspect.signature(skill.execute).parameters.values())
 
     def discover_plugins(self, include_tests: bool | None = None) -> None:
-        """Find and import skill plugins under ``plugins_path``.
+        """Register the skill plugins under ``plugins_path``.
 
         By default, modules with filenames starting with ``test_`` are skipped.
         Set ``include_tests=True`` or the ``MILO_INCLUDE_TEST_PLUGINS``
@@ -33,22 +214,269 @@ class PluginManager:
         if include_tests is None:
             include_tests_env = os.getenv("MILO_INCLUDE_TEST_PLUGINS", "").lower()
             include_tests = include_tests_env in {"1", "true", "yes"}
+        self._include_tests = include_tests
+
+        with self._lock:
+            for module_name, entry in self._wanted_modules().items():
+                self._modules[module_name] = entry
+                if entry["eager"]:
+                    module = self._import(module_name)
+                    for name, skill in self._create_skills(module).items():
+                        if name not in self._skills:
+                            self._skills[name] = skill
+                            self._owners[name] = module_name
+                for name, class_name in entry["skills"]:
+                    if name not in self._skills:
+                        self._index.setdefault(name, (module_name, class_name))
+
+    def _wanted_modules(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: entry
+            for name, entry in self._manifest().items()
+            if self._include_tests or not name.startswith("test_")
+        }
 
-        for module_info in pkgutil.iter_modules([str(self.plugins_path)]):
-            if module_info.name.startswith("test_") and not include_tests:
+    def _manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Skills of every plugin module, rescanning only changed files."""
+        cached: Dict[str, Dict[str, Any]] = {}
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if data.get("version") == MANIFEST_VERSION:
+                cached = data["modules"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+        modules: Dict[str, Dict[str, Any]] = {}
+        for info in pkgutil.iter_modules([str(self.plugins_path)]):
+            path = self._module_path(info.name, info.ispkg)
+            try:
+                stat = path.stat()
+            except OSError:
+                # Compiled or extension modules cannot be scanned.
+                modules[info.name] = {
+                    "stamp": None,
+                    "skills": [],
+                    "eager": True,
+                    "parameters": {},
+                }
                 continue
-            module = importlib.import_module(f"plugins.{module_info.name}")
-            self._load_from_module(module)
+            stamp = [stat.st_mtime_ns, stat.st_size]
+            entry = cached.get(info.name)
+            if entry is None or entry.get("stamp") != stamp:
+                entry = {"stamp": stamp, **_scan_module(path)}
+            modules[info.name] = entry
+
+        if modules != cached:
+            self._write_manifest(modules)
+        return modules
+
+    def _write_manifest(self, modules: Dict[str, Dict[str, Any]]) -> None:
+        data = json.dumps({"version": MANIFEST_VERSION, "modules": modules})
+        tmp = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.manifest_path)
+        except OSError as exc:
+            # A read-only plugin directory only costs a rescan next time.
+            logger.debug("Could not write plugin manifest: %s", exc)
 
-    def _load_from_module(self, module: ModuleType) -> None:
+    def _module_path(self, module_name: str, is_package: bool) -> Path:
+        if is_package:
+            return self.plugins_path / module_name / "__init__.py"
+        return self.plugins_path / f"{module_name}.py"
+
+    def _qualified_name(self, module_name: str) -> str:
+        if self.plugins_path.resolve() == _DEFAULT_PATH:
+            return f"plugins.{module_name}"
+        # Plugins outside the ``plugins`` package get a private module name.
+        digest = hashlib.sha1(str(self.plugins_path.resolve()).encode()).hexdigest()
+        return f"_milo_plugins_{digest[:12]}.{module_name}"
+
+    def _import(self, module_name: str, fresh: bool = False) -> ModuleType:
+        """Import a plugin module, or execute its current source if ``fresh``.
+
+        A failed fresh import leaves the previously imported module in place.
+        """
+        qualified = self._qualified_name(module_name)
+        if not fresh and qualified in sys.modules:
+            self._loaded.add(module_name)
+            return sys.modules[qualified]
+        if not fresh and qualified.startswith("plugins."):
+            module = importlib.import_module(qualified)
+            self._loaded.add(module_name)
+            return module
+
+        is_package = (self.plugins_path / module_name).is_dir()
+        path = self._module_path(module_name, is_package)
+        spec = importlib.util.spec_from_file_location(
+            qualified,
+            path,
+            submodule_search_locations=[str(path.parent)] if is_package else None,
+        )
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot import plugin {module_name} from {path}")
+        module = importlib.util.module_from_spec(spec)
+        previous = sys.modules.get(qualified)
+        sys.modules[qualified] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            if previous is None:
+                del sys.modules[qualified]
+            else:
+                sys.modules[qualified] = previous
+            raise
+        self._loaded.add(module_name)
+        return module
+
+    @staticmethod
+    def _create_skills(module: ModuleType) -> Dict[str, BaseSkill]:
+        """Instantiate the skills defined in ``module``."""
+        skills: Dict[str, BaseSkill] = {}
         for _, obj in inspect.getmembers(module, inspect.isclass):
             if obj is BaseSkill or not issubclass(obj, BaseSkill):
                 continue
-            self.skills.append(obj())
+            name = getattr(obj, "name", None)
+            if obj.__module__ == module.__name__ and name is not None:
+                skills.setdefault(name, obj())
+        return skills
 
     def get_skill_by_name(self, name: str) -> BaseSkill | None:
-        """Retrieve a skill instance by its ``name`` attribute."""
-        for skill in self.skills:
-            if skill.name == name:
-                return skill
-        return None
+        """Retrieve a skill instance by its ``name`` attribute.
+
+        The skill's module is imported on first use. A module that fails to
+        import is logged and its skill treated as unknown.
+        """
+        skill = self._skills.get(name)
+        if skill is not None or name not in self._index:
+            return skill
+        with self._lock:
+            if name in self._skills:
+                return self._skills[name]
+            entry = self._index.pop(name, None)
+            if entry is None:
+                return None
+            module_name, class_name = entry
+            try:
+                skill = getattr(self._import(module_name), class_name)()
+            except Exception:
+                logger.exception("Could not load skill %s from %s", name, module_name)
+                return None
+            self._skills[skill.name] = skill
+            self._owners[skill.name] = module_name
+            return skill
+
+    def reload_changed(self) -> List[str]:
+        """Apply changes to plugin files since discovery or the last reload.
+
+        Imported modules whose file changed are executed again and their
+        skills replaced. Modules not imported yet only have their manifest
+        entry refreshed. Skills of removed files are unregistered. The new
+        registrations replace the old ones at once; calls already running
+        finish on the skill instances they started with.
+
+        A module that fails to import or instantiate keeps its previous
+        version; it is retried once its file changes again.
+
+        Returns
+        -------
+        list of str
+            Names of the modules whose changes were applied.
+        """
+        with self._lock:
+            wanted = self._wanted_modules()
+            changed = sorted(
+                name
+                for name in wanted.keys() | self._modules.keys()
+                if wanted.get(name, {}).get("stamp")
+                != self._modules.get(name, {}).get("stamp")
+            )
+            if not changed:
+                return []
+
+            skills = dict(self._skills)
+            index = dict(self._index)
+            owners = dict(self._owners)
+            applied: List[str] = []
+            for module_name in changed:
+                entry = wanted.get(module_name)
+                new_skills: Dict[str, BaseSkill] = {}
+                if entry is not None and (
+                    module_name in self._loaded or entry["eager"]
+                ):
+                    try:
+                        new_skills = self._create_skills(
+                            self._import(module_name, fresh=True)
+                        )
+                    except Exception:
+                        logger.exception(
+                            "Reloading plugin %s failed; keeping the previous version",
+                            module_name,
+                        )
+                        # Do not retry until the file changes again.
+                        self._modules[module_name] = {
+                            **self._modules.get(module_name, entry),
+                            "stamp": entry["stamp"],
+                        }
+                        continue
+
+                for name in [n for n, m in owners.items() if m == module_name]:
+                    del owners[name]
+                    skills.pop(name, None)
+                for name in [n for n, (m, _) in index.items() if m == module_name]:
+                    del index[name]
+                if entry is None:
+                    self._modules.pop(module_name, None)
+                    self._loaded.discard(module_name)
+                else:
+                    for name, skill in new_skills.items():
+                        skills[name] = skill
+                        owners[name] = module_name
+                    for name, class_name in entry["skills"]:
+                        if name not in skills:
+                            index.setdefault(name, (module_name, class_name))
+                    self._modules[module_name] = entry
+                applied.append(module_name)
+
+            self._skills, self._index, self._owners = skills, index, owners
+            listeners = list(self._listeners)
+
+        if applied:
+            logger.info("Reloaded plugins: %s", ", ".join(applied))
+            for listener in listeners:
+                try:
+                    listener(applied)
+                except Exception:
+                    logger.exception("Plugin reload listener failed")
+        return applied
+
+    def add_reload_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """Call ``listener`` with the module names after every applied reload."""
+        self._listeners.append(listener)
+
+    def watch(self, interval: float = 2.0) -> threading.Thread:
+        """Poll the plugin directory every ``interval`` seconds and reload.
+
+        Polling only compares file modification times and sizes with the
+        manifest, so it needs no file system notification service.
+        """
+        self.stop_watching()
+        stop = self._stop_watching = threading.Event()
+
+        def poll() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.reload_changed()
+                except Exception:
+                    logger.exception("Checking plugins for changes failed")
+
+        thread = threading.Thread(target=poll, name="milo-plugin-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_watching(self) -> None:
+        """Stop the polling thread started by :meth:`watch`, if any."""
+        if self._stop_watching is not None:
+            self._stop_watching.set()
+            self._stop_watching = None
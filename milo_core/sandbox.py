@@ -0,0 +1,270 @@
+"""Run skills in a pool of worker processes.
+
+Skills normally run in MILO's own interpreter, where CPU-heavy work competes
+for the GIL with audio capture and token streaming. A skill that sets
+:attr:`plugins.base.BaseSkill.isolated` runs in a warm worker process
+instead. A call that times out, or a worker that crashes, only costs that
+worker: it is replaced and the caller gets a
+:class:`~milo_core.commands.CommandError`. Workers are also recycled after a
+number of calls or once they use too much memory.
+
+Only the skill's module, class name, arguments and result cross the process
+boundary, pickled with the highest protocol. The skill must be importable in
+the worker, either by module name or from the file that defines it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib
+import importlib.util
+import inspect
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+from typing import Any, Iterable
+
+from milo_core import tracing
+from milo_core.commands import CommandError
+
+
+def _rss_bytes() -> int:
+    """Resident memory of this process, or its peak where that is unknown."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _load_class(module_name: str, path: str, class_name: str, fresh: bool) -> type:
+    module = None if fresh else sys.modules.get(module_name)
+    if module is None and not fresh:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            pass
+    if module is None:
+        # Plugins outside the ``plugins`` package, and plugins edited since
+        # they were imported, are loaded from their file.
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot import {module_name} from {path}")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return getattr(module, class_name)
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _serve(conn: Any) -> None:
+    """Worker entry point: run skill calls received on ``conn``."""
+    # Skill instances with the modification time of the file they came from,
+    # so plugins reloaded by the parent are reloaded here too.
+    skills: dict[tuple[str, str], tuple[int, Any]] = {}
+    while True:
+        try:
+            request = pickle.loads(conn.recv_bytes())
+        except EOFError:
+            break
+        if request is None:
+            break
+        module_name, path, class_name, args, kwargs = request
+        try:
+            key = (module_name, class_name)
+            mtime = _mtime(path)
+            if key not in skills or skills[key][0] != mtime:
+                cls = _load_class(module_name, path, class_name, fresh=key in skills)
+                skills[key] = (mtime, cls())
+            reply: tuple[bool, Any] = (True, skills[key][1].execute(*args, **kwargs))
+        except Exception as exc:
+            reply = (False, f"{type(exc).__name__}: {exc}")
+        try:
+            payload = pickle.dumps((*reply, _rss_bytes()), pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:
+            error = f"result cannot be sent back: {exc}"
+            payload = pickle.dumps((False, error, _rss_bytes()))
+        conn.send_bytes(payload)
+
+
+class _Worker:
+    def __init__(self, ctx: Any) -> None:
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_serve, args=(child,), name="milo-skill-worker", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.calls = 0
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            try:
+                self.conn.send_bytes(pickle.dumps(None))
+            except OSError:
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SkillSandbox:
+    """Warm pool of worker processes that run isolated skills.
+
+    Parameters
+    ----------
+    max_workers:
+        Number of worker processes, started right away. Calls wait for a
+        free worker.
+    max_calls:
+        Calls a worker serves before it is replaced by a fresh process.
+    max_memory_mb:
+        Resident memory above which a worker is replaced after its call.
+    timeout:
+        Seconds a call may run when the skill sets no ``timeout`` of its
+        own. The worker is killed when it expires.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_calls: int = 100,
+        max_memory_mb: float = 512,
+        timeout: float | None = 30.0,
+    ) -> None:
+        self.max_calls = max_calls
+        self.max_memory = max_memory_mb * 2**20
+        self.timeout = timeout
+        self.recycled = 0
+        self._ctx = mp.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        for _ in range(max_workers):
+            self._idle.put(_Worker(self._ctx))
+
+    def run(
+        self,
+        skill: Any,
+        args: Iterable[Any] = (),
+        kwargs: dict[str, Any] | None = None,
+    ) -> Any:
+        """Run ``skill.execute(*args, **kwargs)`` in a worker process.
+
+        Raises
+        ------
+        CommandError
+            If the arguments or result cannot be pickled, the skill raises,
+            the call times out or the worker dies.
+        """
+        cls = type(skill)
+        request = (
+            cls.__module__,
+            inspect.getfile(cls),
+            cls.__qualname__,
+            list(args),
+            dict(kwargs or {}),
+        )
+        try:
+            payload = pickle.dumps(request, pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:
+            raise CommandError(
+                f"Arguments for skill {skill.name} cannot be sent to a worker: {exc}"
+            ) from exc
+        timeout = getattr(skill, "timeout", None)
+        if not isinstance(timeout, (int, float)):
+            timeout = self.timeout
+
+        worker = self._idle.get()
+        start = time.perf_counter()
+        try:
+            worker.conn.send_bytes(payload)
+            if not worker.conn.poll(timeout):
+                self._replace(worker)
+                raise CommandError(
+                    f"Skill {skill.name} did not finish within {timeout:g} seconds"
+                )
+            ok, value, rss = pickle.loads(worker.conn.recv_bytes())
+        except (EOFError, OSError):
+            worker.process.join(1)
+            code = worker.process.exitcode
+            self._replace(worker)
+            raise CommandError(
+                f"Skill {skill.name} crashed (exit code {code})"
+            ) from None
+        finally:
+            tracing.record("skill_sandbox", time.perf_counter() - start)
+
+        worker.calls += 1
+        if worker.calls >= self.max_calls or rss > self.max_memory:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+        if not ok:
+            raise CommandError(f"Skill {skill.name} failed: {value}")
+        return value
+
+    def _replace(self, worker: _Worker) -> None:
+        self.recycled += 1
+        worker.stop()
+        self._idle.put(_Worker(self._ctx))
+
+    def close(self) -> None:
+        """Stop every worker. Calls still running finish in their process."""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+
+
+_lock = threading.Lock()
+_settings: dict[str, Any] = {}
+_sandbox: SkillSandbox | None = None
+
+
+def configure(**settings: Any) -> None:
+    """Set the :class:`SkillSandbox` arguments for the process-wide pool.
+
+    The pool is started the first time an isolated skill runs.
+    """
+    global _settings
+    shutdown()
+    with _lock:
+        _settings = settings
+
+
+def get_sandbox() -> SkillSandbox:
+    """Return the process-wide pool, starting it if needed."""
+    global _sandbox
+    with _lock:
+        if _sandbox is None:
+            _sandbox = SkillSandbox(**_settings)
+        return _sandbox
+
+
+@atexit.register
+def shutdown() -> None:
+    """Stop the process-wide pool, if it was started."""
+    global _sandbox
+    with _lock:
+        sandbox, _sandbox = _sandbox, None
+    if sandbox is not None:
+        sandbox.close()
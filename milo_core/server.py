@@ -0,0 +1,299 @@
+"""HTTP and WebSocket access to MILO for several clients at once.
+
+Every session has its own short-term memory and :class:`TurnPipeline`,
+while all sessions share one model through a
+:class:`~milo_core.llm.batching.BatchScheduler`.
+
+Endpoints
+---------
+``POST /sessions``
+    Create a session and return ``{"session_id": ...}``.
+``DELETE /sessions/{session_id}``
+    Forget a session.
+``POST /sessions/{session_id}/chat``
+    Run a turn for ``{"message": ...}`` and return the reply. With
+    ``?stream=1`` the reply is streamed as newline-delimited JSON events.
+``GET /sessions/{session_id}/ws``
+    WebSocket. Send ``{"message": ...}`` to start a turn and
+    ``{"type": "interrupt"}`` to stop the current reply.
+``GET /sessions/{session_id}/jobs``
+    Return ``{"jobs": [...]}``, the session's queued workflows that finished
+    since the last request. While a WebSocket is open, they are sent to it
+    as ``command_result`` events instead.
+``POST /commands``
+    Execute ``{"command": ...}`` with the loaded skills.
+
+Streamed events are ``{"type": "token", "text": ...}``,
+``{"type": "command_result", "result": ...}``,
+``{"type": "done", "response": ..., "interrupted": ...}`` and
+``{"type": "error", "error": ...}``.
+
+Requires the optional ``aiohttp`` package.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from aiohttp import WSMsgType, web
+
+from milo_core.commands import CommandError, PlanResult, execute_command
+from milo_core.llm.interface import LocalModelInterface
+from milo_core.memory import ShortTermMemory
+from milo_core.pipeline import TurnOutput, TurnPipeline, TurnResult
+from milo_core.plugin_manager import PluginManager
+
+logger = logging.getLogger(__name__)
+
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class EventOutput(TurnOutput):
+    """Forward turn events to a client through ``send``."""
+
+    def __init__(self, send: Send) -> None:
+        self.send = send
+
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        async for token in tokens:
+            await self.send({"type": "token", "text": token})
+
+    async def command_result(self, result: str) -> None:
+        await self.send({"type": "command_result", "result": result})
+
+    async def finish(self, result: TurnResult) -> None:
+        await self.send(
+            {
+                "type": "done",
+                "response": result.response,
+                "interrupted": result.interrupted,
+                "command_result": result.command_result,
+            }
+        )
+
+
+class Session:
+    """State of one client conversation."""
+
+    def __init__(self, session_id: str, pipeline: TurnPipeline) -> None:
+        self.id = session_id
+        self.pipeline = pipeline
+        # Turns of one session run one after another.
+        self.lock = asyncio.Lock()
+
+
+class MiloServer:
+    """Sessions and request handlers of the HTTP/WebSocket server.
+
+    Parameters
+    ----------
+    model:
+        Shared model, normally a :class:`BatchScheduler`.
+    memory_manager:
+        Long-term memory shared by all sessions.
+    plugin_manager:
+        Skills available to commands. ``None`` disables them.
+    max_sessions:
+        Maximum number of sessions kept at once.
+    max_workers:
+        Threads for blocking work such as retrieval and skills, shared by
+        all sessions.
+    """
+
+    def __init__(
+        self,
+        model: LocalModelInterface,
+        memory_manager: Any,
+        plugin_manager: PluginManager | None = None,
+        max_sessions: int = 64,
+        max_workers: int = 8,
+    ) -> None:
+        self.model = model
+        self.memory_manager = memory_manager
+        self.plugin_manager = plugin_manager
+        self.max_sessions = max_sessions
+        # Blocking work of every session shares one bounded pool.
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="milo-server"
+        )
+        self.sessions: dict[str, Session] = {}
+
+    def create_session(self) -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            raise web.HTTPServiceUnavailable(reason="Too many sessions")
+        session_id = uuid.uuid4().hex
+        pipeline = TurnPipeline(
+            self.model,
+            self.memory_manager,
+            self.plugin_manager,
+            session_memory=ShortTermMemory(),
+            source="server",
+            executor=self.executor,
+            session_id=session_id,
+        )
+        session = Session(session_id, pipeline)
+        self.sessions[session_id] = session
+        return session
+
+    def _session(self, request: web.Request) -> Session:
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound(reason="Unknown session")
+        return session
+
+    @staticmethod
+    async def _message(request: web.Request) -> str:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(reason="Body must be JSON") from None
+        message = body.get("message") if isinstance(body, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            raise web.HTTPBadRequest(reason="Missing message")
+        return message
+
+    async def run_turn(self, session: Session, message: str, send: Send) -> None:
+        async with session.lock:
+            try:
+                await session.pipeline.run_turn(message, EventOutput(send))
+            except Exception as exc:  # report to the client, keep serving
+                logger.exception("Turn failed in session %s", session.id)
+                await send({"type": "error", "error": str(exc)})
+
+    async def handle_create(self, request: web.Request) -> web.Response:
+        session = self.create_session()
+        return web.json_response({"session_id": session.id}, status=201)
+
+    async def handle_delete(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        session.pipeline.interrupt()
+        del self.sessions[session.id]
+        return web.Response(status=204)
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        session = self._session(request)
+        message = await self._message(request)
+        if request.query.get("stream"):
+            response = web.StreamResponse(
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+            await response.prepare(request)
+
+            async def write(event: dict[str, Any]) -> None:
+                await response.write(json.dumps(event).encode() + b"\n")
+
+            await self.run_turn(session, message, write)
+            await response.write_eof()
+            return response
+
+        events: list[dict[str, Any]] = []
+
+        async def collect(event: dict[str, Any]) -> None:
+            events.append(event)
+
+        await self.run_turn(session, message, collect)
+        done = next((e for e in events if e["type"] == "done"), {})
+        error = next((e for e in events if e["type"] == "error"), None)
+        if error is not None:
+            return web.json_response(error, status=500)
+        return web.json_response(
+            {
+                "response": done.get("response", ""),
+                "interrupted": done.get("interrupted", False),
+                "command_result": done.get("command_result"),
+            }
+        )
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        session = self._session(request)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        turn: asyncio.Task[None] | None = None
+
+        async def send(event: dict[str, Any]) -> None:
+            if not ws.closed:
+                await ws.send_json(event)
+
+        announcer = asyncio.create_task(
+            session.pipeline.announce_jobs(EventOutput(send))
+        )
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(msg.data)
+                except json.JSONDecodeError:
+                    await send({"type": "error", "error": "Messages must be JSON"})
+                    continue
+                if data.get("type") == "interrupt":
+                    session.pipeline.interrupt()
+                    continue
+                message = data.get("message")
+                if not isinstance(message, str) or not message.strip():
+                    await send({"type": "error", "error": "Missing message"})
+                    continue
+                turn = asyncio.create_task(self.run_turn(session, message, send))
+        finally:
+            announcer.cancel()
+            if turn is not None and not turn.done():
+                turn.cancel()
+        return ws
+
+    async def handle_jobs(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        jobs = session.pipeline.jobs
+        if jobs is None:
+            return web.json_response({"jobs": []})
+        finished = await asyncio.get_running_loop().run_in_executor(
+            self.executor, jobs.take_finished, session.id
+        )
+        return web.json_response({"jobs": [job.to_dict() for job in finished]})
+
+    async def handle_command(self, request: web.Request) -> web.Response:
+        if self.plugin_manager is None:
+            raise web.HTTPNotFound(reason="Commands are disabled")
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(reason="Body must be JSON") from None
+        command = body.get("command") if isinstance(body, dict) else None
+        if command is None:
+            raise web.HTTPBadRequest(reason="Missing command")
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, execute_command, command, self.plugin_manager
+            )
+        except CommandError as exc:
+            return web.json_response({"error": str(exc)}, status=400)
+        if isinstance(result, PlanResult):
+            result = result.to_dict()
+        return web.json_response({"result": result})
+
+    def app(self) -> web.Application:
+        """Build the aiohttp application."""
+        app = web.Application()
+        app.add_routes(
+            [
+                web.post("/sessions", self.handle_create),
+                web.delete("/sessions/{session_id}", self.handle_delete),
+                web.post("/sessions/{session_id}/chat", self.handle_chat),
+                web.get("/sessions/{session_id}/ws", self.handle_ws),
+                web.get("/sessions/{session_id}/jobs", self.handle_jobs),
+                web.post("/commands", self.handle_command),
+            ]
+        )
+        return app
+
+
+def serve(
+    server: MiloServer, host: str = "127.0.0.1", port: int = 8765
+) -> None:  # pragma: no cover - runs until interrupted
+    """Serve ``server`` until interrupted."""
+    web.run_app(server.app(), host=host, port=port)
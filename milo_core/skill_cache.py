@@ -0,0 +1,216 @@
+"""Cache of results from skills that declare them reusable.
+
+A skill opts in by setting :attr:`plugins.base.BaseSkill.cache_ttl`. Its
+results are then kept for that many seconds under the key returned by
+:meth:`~plugins.base.BaseSkill.cache_key`, so repeating a web search a
+minute later does not go back to the network.
+
+Recent results live in an in-memory LRU. When a database path is
+configured, JSON-serializable results are also written to SQLite and
+survive restarts. One cache is shared by the whole process, like the
+tracer; :func:`configure` replaces it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+from milo_core import tracing
+
+# Returned by :meth:`SkillCache.get` when nothing usable is cached, since
+# ``None`` is a valid skill result.
+MISSING = object()
+
+
+class SkillCache:
+    """Two-tier TTL cache of skill results.
+
+    Parameters
+    ----------
+    max_entries:
+        Number of results kept in memory.
+    path:
+        SQLite database for the persistent tier. ``None`` keeps results in
+        memory only.
+    max_disk_entries:
+        Number of results kept in the database; the oldest are dropped.
+    clock:
+        Returns the current time in seconds since the epoch. Expiry times
+        are stored on disk, so this must be wall-clock time.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        path: str | Path | None = None,
+        max_disk_entries: int = 10_000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.path = Path(path) if path is not None else None
+        self.max_disk_entries = max_disk_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, expires REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.execute("DELETE FROM results WHERE expires <= ?", (clock(),))
+            self._db.commit()
+
+    @staticmethod
+    def ttl(skill: Any) -> float | None:
+        """Seconds results of ``skill`` stay fresh, or ``None`` if uncached."""
+        ttl = getattr(skill, "cache_ttl", None)
+        if isinstance(ttl, (int, float)) and ttl > 0:
+            return float(ttl)
+        return None
+
+    @classmethod
+    def key(cls, skill: Any, args: Any, kwargs: dict[str, Any]) -> str | None:
+        """Cache key for running ``skill`` with ``args`` and ``kwargs``.
+
+        ``None`` means the call must not be cached, either because the skill
+        has no ``cache_ttl`` or because its ``cache_key`` declined.
+        """
+        if cls.ttl(skill) is None:
+            return None
+        try:
+            key = skill.cache_key(*args, **kwargs)
+        except TypeError:
+            # Arguments that do not fit the skill; let ``execute`` report it.
+            return None
+        if key is None:
+            return None
+        data = f"{skill.name}\0{key}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for ``key`` or :data:`MISSING`."""
+        now = self.clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return self._hit(entry[1])
+                del self._memory[key]
+            entry = self._read(key, now)
+            if entry is None:
+                return self._miss()
+            self._remember(key, entry)
+            return self._hit(entry[1])
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        """Keep ``value`` under ``key`` for ``ttl`` seconds."""
+        entry = (self.clock() + ttl, value)
+        with self._lock:
+            self._remember(key, entry)
+            self._write(key, entry)
+
+    def clear(self) -> None:
+        """Drop every cached result, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the database; the cache keeps working in memory."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _hit(self, value: Any) -> Any:
+        self.hits += 1
+        self._record()
+        return value
+
+    def _miss(self) -> Any:
+        self.misses += 1
+        self._record()
+        return MISSING
+
+    def _record(self) -> None:
+        tracing.metric("skill_cache_hit_rate", self.hits / (self.hits + self.misses))
+
+    def _remember(self, key: str, entry: tuple[float, Any]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str, now: float) -> tuple[float, Any] | None:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT expires, value FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[0] <= now:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return row[0], json.loads(row[1])
+
+    def _write(self, key: str, entry: tuple[float, Any]) -> None:
+        if self._db is None:
+            return
+        try:
+            value = json.dumps(entry[1])
+        except (TypeError, ValueError):
+            # Only JSON values are persisted; others stay in memory.
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (key, expires, value) VALUES (?, ?, ?)",
+            (key, entry[0], value),
+        )
+        self._db.execute(
+            "DELETE FROM results WHERE key NOT IN "
+            "(SELECT key FROM results ORDER BY expires DESC LIMIT ?)",
+            (self.max_disk_entries,),
+        )
+        self._db.commit()
+
+
+_cache = SkillCache()
+
+
+def configure(
+    max_entries: int = 256,
+    path: str | Path | None = None,
+    max_disk_entries: int = 10_000,
+) -> SkillCache:
+    """Install the process-wide cache. ``path=None`` keeps it in memory."""
+    global _cache
+    _cache.close()
+    _cache = SkillCache(max_entries, path, max_disk_entries=max_disk_entries)
+    return _cache
+
+
+def get_cache() -> SkillCache:
+    return _cache
+
+
+def install(cache: SkillCache) -> SkillCache:
+    """Make ``cache`` the process-wide cache and return the previous one."""
+    global _cache
+    previous, _cache = _cache, cache
+    return previous
@@ -0,0 +1,162 @@
+"""Speculative memory retrieval and LLM prefill while the user is speaking."""
+
+from __future__ import annotations
+
+import difflib
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from milo_core import tracing
+from milo_core.memory import Message
+
+if TYPE_CHECKING:  # pragma: no cover - imported for annotations only
+    from milo_core.memory_manager import MemoryManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpeculationStats:
+    """How often speculative work was reused and how much time it saved."""
+
+    attempts: int = 0
+    hits: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+def similarity(a: str, b: str) -> float:
+    """Similarity of two transcripts in ``[0, 1]``, ignoring case and punctuation."""
+    return difflib.SequenceMatcher(None, _normalize(a), _normalize(b)).ratio()
+
+
+class _Speculation:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.seconds = 0.0
+        self.future: Future[list[str]] | None = None
+
+
+class Speculator:
+    """Start turn work from a partial transcript before the user stops talking.
+
+    :meth:`speculate` looks up memories for the partial transcript and asks
+    the model to prefill the KV cache for the conversation so far, both on a
+    background thread. :meth:`take` hands back the retrieved memories when
+    the final transcript is close enough to the speculated one and discards
+    them otherwise. Utterances that never become a turn must be followed by
+    :meth:`discard`, so their speculation is not matched against a later one.
+
+    Parameters
+    ----------
+    memory_manager:
+        Long-term memory used for retrieval.
+    model:
+        Model whose optional ``prefill(history)`` method warms its cache.
+    threshold:
+        Minimum :func:`similarity` between the speculated and the final
+        transcript for the retrieval to be reused.
+    """
+
+    def __init__(
+        self,
+        memory_manager: MemoryManager,
+        model: Any = None,
+        threshold: float = 0.85,
+    ) -> None:
+        self.memory_manager = memory_manager
+        self.model = model
+        self.threshold = threshold
+        self.stats = SpeculationStats()
+        self._lock = threading.Lock()
+        self._pending: _Speculation | None = None
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="milo-speculate"
+        )
+
+    def speculate(self, partial: str, history: list[Message]) -> None:
+        """Start retrieval for ``partial`` and prefill ``history``. Thread-safe."""
+        with self._lock:
+            if self._closed:
+                return
+            if self._pending is not None and _normalize(
+                self._pending.text
+            ) == _normalize(partial):
+                return
+            prefill = getattr(self.model, "prefill", None)
+            if self._pending is None and prefill is not None:
+                # The history does not depend on the partial text, so it only
+                # needs to be prefilled once per utterance.
+                self._executor.submit(self._prefill, prefill, list(history))
+            speculation = _Speculation(partial)
+            speculation.future = self._executor.submit(self._retrieve, speculation)
+            self._pending = speculation
+
+    @staticmethod
+    def _prefill(prefill: Any, history: list[Message]) -> None:
+        try:
+            prefill(history)
+        except Exception:  # speculative work must never break a turn
+            logger.exception("Speculative prefill failed")
+
+    def _retrieve(self, speculation: _Speculation) -> list[str]:
+        start = time.perf_counter()
+        memories = self.memory_manager.retrieve_relevant_memories(speculation.text)
+        speculation.seconds = time.perf_counter() - start
+        return memories
+
+    def take(self, final: str) -> list[str] | None:
+        """Return speculated memories for ``final`` or ``None`` on a miss."""
+        with self._lock:
+            speculation, self._pending = self._pending, None
+        if speculation is None or speculation.future is None:
+            return None
+        self.stats.attempts += 1
+        if similarity(speculation.text, final) < self.threshold:
+            speculation.future.cancel()
+            self.stats.misses += 1
+            return None
+        start = time.perf_counter()
+        try:
+            memories = speculation.future.result()
+        except Exception:
+            logger.exception("Speculative retrieval failed")
+            self.stats.misses += 1
+            return None
+        saved = max(0.0, speculation.seconds - (time.perf_counter() - start))
+        self.stats.hits += 1
+        self.stats.saved_seconds += saved
+        tracing.metric("speculation_saved_ms", saved * 1000)
+        logger.info(
+            "Speculation hit rate %.0f%%, %.2fs saved in total",
+            self.stats.hit_rate * 100,
+            self.stats.saved_seconds,
+        )
+        return memories
+
+    def discard(self) -> None:
+        """Drop the pending speculation without counting an attempt."""
+        with self._lock:
+            speculation, self._pending = self._pending, None
+        if speculation is not None and speculation.future is not None:
+            speculation.future.cancel()
+
+    def close(self) -> None:
+        """Drop pending speculative work."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,183 @@
+"""Concurrent initialization of MILO's components.
+
+Loading the language model, Whisper, Piper, the embedding model and the
+plugins is dominated by disk I/O and library imports, so the components are
+built on a thread pool instead of one after another. Each component is
+registered with :meth:`Startup.add` and exposed as a
+:class:`~concurrent.futures.Future`, so callers can use whatever is ready
+and wait for the rest.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """Initialize named components concurrently and time each one.
+
+    Parameters
+    ----------
+    max_workers:
+        Size of the thread pool. Components run as soon as their
+        dependencies are ready and a worker is free.
+    """
+
+    def __init__(self, max_workers: int = 6) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="milo-startup"
+        )
+        self._lock = threading.Lock()
+        self._futures: dict[str, Future[Any]] = {}
+        # Offset from the start of startup and duration of each component.
+        self._timings: dict[str, tuple[float, float]] = {}
+        self._callbacks: list[Callable[[], None]] = []
+        self._started = time.perf_counter()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._futures
+
+    def add(
+        self, name: str, init: Callable[..., Any], after: Iterable[str] = ()
+    ) -> Future[Any]:
+        """Schedule ``init`` to build the component ``name``.
+
+        ``init`` receives the results of the components named in ``after``,
+        in order, once they are all ready. If one of them fails, the
+        component fails with the same exception without running ``init``.
+        """
+        deps = [self._futures[dep] for dep in after]
+        future: Future[Any] = Future()
+        with self._lock:
+            self._futures[name] = future
+        future.add_done_callback(self._component_done)
+
+        remaining = [len(deps)]
+        remaining_lock = threading.Lock()
+
+        def dependency_done(_: Future[Any]) -> None:
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._submit(name, init, deps, future)
+
+        if not deps:
+            self._submit(name, init, deps, future)
+        for dep in deps:
+            dep.add_done_callback(dependency_done)
+        return future
+
+    def _submit(
+        self,
+        name: str,
+        init: Callable[..., Any],
+        deps: list[Future[Any]],
+        future: Future[Any],
+    ) -> None:
+        for dep in deps:
+            if dep.exception() is not None:
+                future.set_exception(dep.exception())
+                return
+
+        def build() -> None:
+            start = time.perf_counter()
+            try:
+                result = init(*(dep.result() for dep in deps))
+            except BaseException as exc:
+                error: BaseException | None = exc
+            else:
+                error = None
+            self._timings[name] = (start - self._started, time.perf_counter() - start)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        def cancelled(task: Future[None]) -> None:
+            # ``shutdown`` dropped the build before it started.
+            if task.cancelled() and not future.done():
+                future.set_exception(
+                    RuntimeError(f"Startup shut down before {name} loaded")
+                )
+
+        try:
+            self._executor.submit(build).add_done_callback(cancelled)
+        except RuntimeError as exc:  # executor shut down
+            future.set_exception(exc)
+
+    def future(self, name: str) -> Future[Any]:
+        return self._futures[name]
+
+    def get(self, name: str) -> Any:
+        """Wait for ``name`` and return it, raising if it failed to load."""
+        return self._futures[name].result()
+
+    def wait_all(self) -> None:
+        """Wait for every component, raising the first failure."""
+        for future in list(self._futures.values()):
+            future.result()
+
+    def ready(self, name: str) -> bool:
+        future = self._futures[name]
+        return future.done() and future.exception() is None
+
+    def pending(self) -> list[str]:
+        """Names of the components that are still initializing."""
+        return [name for name, f in self._futures.items() if not f.done()]
+
+    def when_ready(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` once every registered component has finished."""
+        with self._lock:
+            if self.pending():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def _component_done(self, _: Future[Any]) -> None:
+        with self._lock:
+            if self.pending():
+                return
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Startup callback failed")
+
+    def report(self) -> str:
+        """Format when each component started and how long it took."""
+        timings = self._timings.values()
+        elapsed = max((start + seconds for start, seconds in timings), default=0.0)
+        total = sum(seconds for _, seconds in timings)
+        lines = [
+            f"Startup took {elapsed:.2f} s ({total:.2f} s of component work)",
+            f"{'component':<16}{'start s':>10}{'time s':>10}  status",
+        ]
+        for name, future in self._futures.items():
+            if name in self._timings:
+                start, seconds = self._timings[name]
+                timing = f"{start:>10.2f}{seconds:>10.2f}"
+            else:
+                timing = f"{'-':>10}{'-':>10}"
+            if not future.done():
+                status = "warming up"
+            elif future.exception() is not None:
+                status = f"failed: {future.exception()}"
+            else:
+                status = "ok"
+            lines.append(f"{name:<16}{timing}  {status}")
+        return "\n".join(lines)
+
+    def shutdown(self) -> None:
+        """Stop scheduling components; ones already loading keep running.
+
+        Components that had not started loading fail with ``RuntimeError``.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,299 @@
+"""Per-turn latency tracing.
+
+Stages of a conversation turn record their durations with :func:`span`,
+:func:`record` and :func:`mark`. When tracing is enabled every finished turn
+is appended as one JSON line to a rotating trace file::
+
+    {"session": "...", "turn": 3, "source": "voice", "start": 1718000000.0,
+     "spans": {"whisper_decode": [0.41], "llm_ttft": [0.62], ...},
+     "metrics": {"llm_tokens_per_sec": 18.2}}
+
+The active turn is kept in a :class:`~contextvars.ContextVar`, so the turns
+of concurrent sessions under ``milo-core serve`` collect their own timings.
+The pipeline runs blocking calls in the caller's context so they keep their
+turn. Threads outside any turn's context, such as the TTS worker, record
+into the turn in progress if there is exactly one. Timings recorded while no
+turn is active, such as VAD endpointing and Whisper decoding before the
+pipeline starts, are attached to the next turn.
+
+Tracing is off by default and every helper returns immediately in that
+case. ``milo-core trace report`` summarizes trace files with :func:`report`.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, ContextManager, Iterable, Iterator
+
+_NULL = nullcontext()
+
+
+class _TurnTrace:
+    def __init__(self) -> None:
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.spans: dict[str, list[float]] = {}
+        self.metrics: dict[str, float] = {}
+
+
+class Tracer:
+    """Collect stage timings and write one JSON line per turn.
+
+    Parameters
+    ----------
+    path:
+        Trace file. Rotated files get ``.1``, ``.2`` ... suffixes.
+    max_bytes:
+        Size at which the trace file is rotated.
+    backup_count:
+        Number of rotated files to keep.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        max_bytes: int = 5_000_000,
+        backup_count: int = 5,
+    ) -> None:
+        self.enabled = path is not None
+        self.path = Path(path) if path is not None else None
+        self.session = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._current: ContextVar[_TurnTrace | None] = ContextVar(
+            f"milo_turn_{self.session}", default=None
+        )
+        # Turns in progress, oldest first.
+        self._open: list[_TurnTrace] = []
+        self._pending = _TurnTrace()
+        self._logger: logging.Logger | None = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                self.path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.Logger(f"milo_core.tracing.{self.session}")
+            self._logger.addHandler(handler)
+            self._logger.propagate = False
+
+    def _active(self) -> _TurnTrace | None:
+        turn = self._current.get()
+        if turn is None and len(self._open) == 1:
+            turn = self._open[0]
+        return turn
+
+    def _target(self) -> _TurnTrace:
+        return self._active() or self._pending
+
+    def span(self, stage: str) -> ContextManager[None]:
+        """Time the ``with`` block as ``stage``."""
+        if not self.enabled:
+            return _NULL
+        return self._span(stage)
+
+    @contextmanager
+    def _span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add a duration for ``stage`` measured by the caller."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._target().spans.setdefault(stage, []).append(seconds)
+
+    def mark(self, stage: str) -> None:
+        """Record the time since the turn started, once per turn."""
+        if not self.enabled:
+            return
+        with self._lock:
+            turn = self._active()
+            if turn is None or stage in turn.spans:
+                return
+            turn.spans[stage] = [time.perf_counter() - turn.started]
+
+    def metric(self, name: str, value: float) -> None:
+        """Attach a numeric measurement, such as a rate, to the turn."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._target().metrics[name] = value
+
+    def turn(self, source: str) -> ContextManager[None]:
+        """Trace the ``with`` block as one turn coming from ``source``."""
+        if not self.enabled:
+            return _NULL
+        return self._turn(source)
+
+    @contextmanager
+    def _turn(self, source: str) -> Iterator[None]:
+        with self._lock:
+            turn = self._pending
+            turn.started = time.perf_counter()
+            turn.start = time.time()
+            self._pending = _TurnTrace()
+            self._open.append(turn)
+            self._turns += 1
+            number = self._turns
+        token = self._current.set(turn)
+        try:
+            with self._span("turn_total"):
+                yield
+        finally:
+            self._current.reset(token)
+            with self._lock:
+                self._open.remove(turn)
+            self._write(
+                {
+                    "session": self.session,
+                    "turn": number,
+                    "source": source,
+                    "start": turn.start,
+                    "spans": turn.spans,
+                    "metrics": turn.metrics,
+                }
+            )
+
+    def _write(self, entry: dict[str, Any]) -> None:
+        if self._logger is not None:
+            self._logger.info(json.dumps(entry))
+
+    def close(self) -> None:
+        """Flush and close the trace file."""
+        if self._logger is None:
+            return
+        for handler in list(self._logger.handlers):
+            handler.close()
+            self._logger.removeHandler(handler)
+        self._logger = None
+        self.enabled = False
+
+
+_tracer = Tracer()
+
+
+def configure(
+    path: str | Path | None,
+    max_bytes: int = 5_000_000,
+    backup_count: int = 5,
+) -> Tracer:
+    """Install the process-wide tracer. ``path=None`` disables tracing."""
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(path, max_bytes=max_bytes, backup_count=backup_count)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def install(tracer: Tracer) -> Tracer:
+    """Make ``tracer`` the process-wide tracer and return the previous one."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def span(stage: str) -> ContextManager[None]:
+    return _tracer.span(stage)
+
+
+def record(stage: str, seconds: float) -> None:
+    _tracer.record(stage, seconds)
+
+
+def mark(stage: str) -> None:
+    _tracer.mark(stage)
+
+
+def metric(name: str, value: float) -> None:
+    _tracer.metric(name, value)
+
+
+def turn(source: str) -> ContextManager[None]:
+    return _tracer.turn(source)
+
+
+def trace_files(path: str | Path) -> list[Path]:
+    """Return ``path`` and its rotated siblings, oldest first."""
+    path = Path(path)
+    rotated = sorted(
+        (p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]),
+        reverse=True,
+    )
+    return rotated + ([path] if path.exists() else [])
+
+
+def load_turns(paths: Iterable[str | Path]) -> list[dict[str, Any]]:
+    """Read traced turns, skipping lines that are not valid JSON."""
+    turns = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    turns.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return turns
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Linear-interpolated percentile of ``values`` for ``q`` in ``[0, 100]``."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def report(turns: list[dict[str, Any]]) -> str:
+    """Format per-stage percentiles, in milliseconds, across ``turns``."""
+    stages: dict[str, list[float]] = {}
+    metrics: dict[str, list[float]] = {}
+    for entry in turns:
+        for stage, values in entry.get("spans", {}).items():
+            # A stage that ran several times in one turn counts as its total.
+            stages.setdefault(stage, []).append(sum(values))
+        for name, value in entry.get("metrics", {}).items():
+            metrics.setdefault(name, []).append(value)
+
+    sessions = len({entry.get("session") for entry in turns})
+    lines = [f"{len(turns)} turns across {sessions} sessions", ""]
+    header = f"{'stage':<24}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+    lines.append(header)
+    for stage in sorted(stages):
+        values = stages[stage]
+        lines.append(
+            f"{stage:<24}{len(values):>7}"
+            + "".join(f"{percentile(values, q) * 1000:>10.1f}" for q in (50, 90, 99))
+        )
+    if metrics:
+        lines.append("")
+        lines.append(f"{'metric':<24}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}")
+        for name in sorted(metrics):
+            values = metrics[name]
+            lines.append(
+                f"{name:<24}{len(values):>7}"
+                + "".join(f"{percentile(values, q):>10.1f}" for q in (50, 90, 99))
+            )
+    return "\n".join(lines)
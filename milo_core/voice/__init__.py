@@ -1,8 +1,20 @@
-"""Voice utilities for MILO."""
+"""Voice utilities for MILO.
+
+The engines import sounddevice, webrtcvad and their model runtimes, so they
+are loaded on first access.
+"""
+
+from __future__ import annotations
+
+from milo_core._lazy import lazy_getattr
 
 from .interface import SpeechToText, TextToSpeech
-from .engines import PiperTTS, WhisperSTT
-from .conversation import converse
+
+_LAZY = {
+    "WhisperSTT": ".engines",
+    "PiperTTS": ".engines",
+    "converse": ".conversation",
+}
 
 __all__ = [
     "SpeechToText",
@@ -11,3 +23,5 @@ __all__ = [
     "PiperTTS",
     "converse",
 ]
+
+__getattr__ = lazy_getattr(__name__, _LAZY)
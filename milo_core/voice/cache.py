@@ -0,0 +1,145 @@
+"""Content-addressed cache of synthesized phrase audio."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Return the canonical form of ``text`` used for cache keys."""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def voice_fingerprint(model_path: str | Path) -> str:
+    """Identify a voice model so that replacing the file invalidates the cache."""
+    path = Path(model_path).resolve()
+    try:
+        stat = path.stat()
+    except OSError:
+        return str(path)
+    return f"{path}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+class PhraseCache:
+    """Two-tier cache of int16 PCM keyed by voice model and normalized text.
+
+    Recently used phrases stay in an in-memory LRU. When ``cache_dir`` is set,
+    every entry is also written to disk as zlib-compressed PCM so it survives
+    restarts.
+
+    Parameters
+    ----------
+    voice_id:
+        Identifier of the voice that produced the audio, usually from
+        :func:`voice_fingerprint`.
+    cache_dir:
+        Directory for the on-disk tier. ``None`` keeps the cache in memory.
+    max_entries:
+        Number of phrases kept in memory.
+    max_chars:
+        Longest phrase worth caching. Longer text is rarely repeated verbatim.
+    """
+
+    def __init__(
+        self,
+        voice_id: str,
+        cache_dir: str | Path | None = None,
+        max_entries: int = 256,
+        max_chars: int = 120,
+    ) -> None:
+        self.voice_id = voice_id
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def cacheable(self, text: str) -> bool:
+        """Return ``True`` if ``text`` is short enough to be cached."""
+        return 0 < len(normalize_text(text)) <= self.max_chars
+
+    def key(self, text: str) -> str:
+        data = f"{self.voice_id}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, text: str) -> np.ndarray | None:
+        """Return cached audio for ``text`` or ``None``."""
+        if not self.cacheable(text):
+            return None
+        key = self.key(text)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return audio
+        audio = self._read(key)
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, text: str, audio: np.ndarray) -> None:
+        """Store ``audio`` for ``text`` in memory and on disk."""
+        if not self.cacheable(text) or not len(audio):
+            return
+        key = self.key(text)
+        audio = np.ascontiguousarray(audio, dtype=np.int16)
+        with self._lock:
+            self._remember(key, audio)
+        self._write(key, audio)
+
+    def __contains__(self, text: str) -> bool:
+        key = self.key(text)
+        with self._lock:
+            if key in self._memory:
+                return True
+        path = self._path(key)
+        return path is not None and path.exists()
+
+    def _remember(self, key: str, audio: np.ndarray) -> None:
+        self._memory[key] = audio
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / key[:2] / f"{key}.pcm.z"
+
+    def _read(self, key: str) -> np.ndarray | None:
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            data = zlib.decompress(path.read_bytes())
+        except (OSError, zlib.error):
+            return None
+        return np.frombuffer(data, dtype=np.int16)
+
+    def _write(self, key: str, audio: np.ndarray) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(zlib.compress(audio.tobytes(), 6))
+        os.replace(tmp, path)
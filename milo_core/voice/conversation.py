@@ -1,17 +1,44 @@
 from __future__ import annotations
 
-import threading
-from typing import Iterable
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator
 
-import json
 from milo_core.llm import LocalModelInterface
 from milo_core.memory import ShortTermMemory
-from milo_core.memory_manager import MemoryManager
-from milo_core.commands import execute_command, CommandError
+from milo_core.pipeline import (
+    TurnOutput,
+    TurnPipeline,
+    consume_in_thread,
+    run_in_daemon_thread,
+)
 from milo_core.plugin_manager import PluginManager
+from milo_core.speculation import Speculator
 
 from .interface import SpeechToText, TextToSpeech
 
+if TYPE_CHECKING:  # pragma: no cover - imported for annotations only
+    from milo_core.memory_manager import MemoryManager
+
+
+class VoiceOutput(TurnOutput):
+    """Speak replies through a :class:`TextToSpeech` engine."""
+
+    def __init__(self, tts: TextToSpeech) -> None:
+        self.tts = tts
+
+    async def user_message(self, text: str) -> None:
+        print(f"User: {text}")
+
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        await consume_in_thread(self.tts.speak, tokens)
+
+    async def command_result(self, result: str) -> None:
+        print(result)
+        await asyncio.to_thread(self.tts.speak, [result])
+
+    def stop(self) -> None:
+        self.tts.stop()
+
 
 def converse(
     model: LocalModelInterface,
@@ -20,72 +47,65 @@ def converse(
     memory_manager: MemoryManager,
     plugin_manager: PluginManager | None = None,
 ) -> None:
-    """Run a simple interactive voice conversation loop with memory."""
+    """Run a simple interactive voice conversation loop with memory.
+
+    Engines that report partial transcripts through ``on_partial`` let
+    retrieval and prefill start while the user is still speaking.
+    """
+
+    speculator = Speculator(memory_manager, model)
+    pipeline = TurnPipeline(
+        model,
+        memory_manager,
+        plugin_manager,
+        session_memory=ShortTermMemory(),
+        source="voice",
+        speculator=speculator,
+    )
+    if hasattr(stt, "on_partial"):
+        stt.on_partial = pipeline.speculate
+    try:
+        asyncio.run(_voice_loop(pipeline, stt, VoiceOutput(tts)))
+    finally:
+        speculator.close()
+        pipeline.close()
+
+
+async def _voice_loop(
+    pipeline: TurnPipeline, stt: SpeechToText, output: VoiceOutput
+) -> None:
+    # Workflows queued by earlier turns are reported between turns.
+    announcer = asyncio.create_task(pipeline.announce_jobs(output))
+    try:
+        await _listen(pipeline, stt, output)
+    finally:
+        announcer.cancel()
 
-    session_memory = ShortTermMemory()
 
+async def _listen(
+    pipeline: TurnPipeline, stt: SpeechToText, output: VoiceOutput
+) -> None:
+    next_input: asyncio.Future[str] | None = None
     while True:
-        user_input = stt.listen()
+        listening = next_input or run_in_daemon_thread(stt.listen)
+        next_input = None
+        user_input = await listening
         if not user_input:
+            # Silence or no wake word: partials heard so far lead nowhere.
+            pipeline.discard_speculation()
             continue
 
-        relevant_memories = memory_manager.retrieve_relevant_memories(user_input)
-        if relevant_memories:
-            context_str = " ".join(relevant_memories)
-            session_memory.add_message(
-                "system", f"Here is some relevant context: {context_str}"
-            )
-
-        print(f"User: {user_input}")
-        session_memory.add_message("user", user_input)
-        assistant_response_full: list[str] = []
-
-        def generate() -> Iterable[str]:
-            history = session_memory.get_messages()
-            for token in model.stream_response(history):
-                if stop_event.is_set():
-                    break
-                assistant_response_full.append(token)
-                yield token
-
-        stop_event = threading.Event()
-
-        def listen_interrupt() -> None:
-            stt.listen()
-            stop_event.set()
-            tts.stop()
-
-        listener = threading.Thread(target=listen_interrupt, daemon=True)
-        listener.start()
-
-        tts.speak(generate())
-        listener.join()
-        if stop_event.is_set() and assistant_response_full:
-            interrupted = "".join(assistant_response_full)
-            session_memory.add_message(
-                "assistant", f"<interrupted_thought>{interrupted}</interrupted_thought>"
-            )
-            full_response = interrupted
-        elif assistant_response_full:
-            full_response = "".join(assistant_response_full)
-            session_memory.add_message("assistant", full_response)
+        turn = asyncio.create_task(pipeline.run_turn(user_input, output))
+        # Keep listening while MILO speaks so the user can interrupt.
+        barge_in = run_in_daemon_thread(stt.listen)
+        await asyncio.wait({turn, barge_in}, return_when=asyncio.FIRST_COMPLETED)
+        if not turn.done():
+            barge_in.result()
+            # The interruption itself is not answered.
+            pipeline.discard_speculation()
+            pipeline.interrupt()
         else:
-            full_response = ""
-
-        if plugin_manager and full_response:
-            try:
-                command = json.loads(full_response)
-            except json.JSONDecodeError:
-                pass
-            else:
-                try:
-                    result = execute_command(command, plugin_manager)
-                except CommandError as exc:  # pragma: no cover - defensive
-                    result = str(exc)
-                session_memory.add_message("assistant", str(result))
-                print(result)
-                tts.speak([str(result)])
-
-        if user_input.lower() == "goodbye":
-            memory_manager.summarize_and_store_session(session_memory.get_messages())
-            session_memory.clear()
+            # The reply finished first; whatever the user says next is the
+            # next turn's input.
+            next_input = barge_in
+        await turn
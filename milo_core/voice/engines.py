@@ -1,20 +1,43 @@
 from __future__ import annotations
 
+import logging
 import queue
 import threading
 import time
-from typing import Iterable
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterable
 
 import numpy as np
 import sounddevice as sd
-import wave
 import webrtcvad
 
+from milo_core import tracing
+
+from .cache import PhraseCache, voice_fingerprint
 from .interface import SpeechToText, TextToSpeech
+from .playback import AudioPlayer
+from .segmenter import iter_segments
+from .wakeword import OpenWakeWordDetector, WakeWordDetector, WakeWordStats
+
+logger = logging.getLogger(__name__)
 
 
 class WhisperSTT(SpeechToText):
-    """Speech recognition using `faster-whisper` with a WebRTC VAD microphone stream."""
+    """Speech recognition using `faster-whisper` with a WebRTC VAD microphone stream.
+
+    When ``wake_word_model`` is set, speech is first passed through a small
+    keyword spotter and only audio following the wake word is transcribed.
+    Speech that never contains the wake word is discarded without running
+    Whisper; :attr:`wake_stats` records how much decoding that avoided.
+
+    With ``partial_interval`` set, the utterance captured so far is also
+    transcribed in the background every ``partial_interval`` seconds of
+    speech and once more when the speaker pauses, and each partial
+    transcript is passed to :attr:`on_partial`. This lets the caller start
+    work for a turn before the final transcript is ready.
+    """
 
     def __init__(
         self,
@@ -25,6 +48,11 @@ class WhisperSTT(SpeechToText):
         input_device: str = "default",
         vad_silence_duration: float = 0.8,
         vad_mode: int = 2,
+        max_utterance_seconds: float = 30.0,
+        wake_word_model: str | None = None,
+        wake_word_threshold: float = 0.5,
+        wake_word_timeout: float = 5.0,
+        partial_interval: float | None = None,
     ) -> None:
         from faster_whisper import WhisperModel  # lazy import
 
@@ -35,6 +63,53 @@ class WhisperSTT(SpeechToText):
         self.input_device = input_device
         self.vad_silence_duration = vad_silence_duration
         self.vad = webrtcvad.Vad(vad_mode)
+        # Captured frames are written straight into these buffers, which are
+        # reused across utterances and only grow for unusually long ones.
+        capacity = int(max_utterance_seconds * sample_rate)
+        self._pcm = np.empty(capacity, dtype=np.int16)
+        self._audio = np.empty(capacity, dtype=np.float32)
+
+        self.wake_word: WakeWordDetector | None = None
+        if wake_word_model:
+            self.wake_word = OpenWakeWordDetector(wake_word_model, wake_word_threshold)
+        self.wake_word_timeout = wake_word_timeout
+        self.wake_stats = WakeWordStats()
+
+        self.on_partial: Callable[[str], None] | None = None
+        self.partial_samples = int((partial_interval or 0) * sample_rate)
+        self._partial: Future[None] | None = None
+        self._partial_executor: ThreadPoolExecutor | None = None
+
+    def _append(self, data: bytes, length: int) -> int:
+        frame = np.frombuffer(data, dtype=np.int16)
+        end = length + len(frame)
+        if end > len(self._pcm):
+            self._pcm = np.resize(self._pcm, max(end, 2 * len(self._pcm)))
+            self._audio = np.empty(len(self._pcm), dtype=np.float32)
+        self._pcm[length:end] = frame
+        return end
+
+    def _start_partial(self, length: int) -> bool:
+        """Transcribe the first ``length`` samples in the background."""
+        if self.on_partial is None:
+            return False
+        if self._partial is not None and not self._partial.done():
+            return False
+        if self._partial_executor is None:
+            self._partial_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="milo-partial"
+            )
+        # Copy, as capture keeps writing into the shared buffer.
+        audio = self._pcm[:length].astype(np.float32) / 32768.0
+        self._partial = self._partial_executor.submit(self._decode_partial, audio)
+        return True
+
+    def _decode_partial(self, audio: np.ndarray) -> None:
+        segments, _ = self.model.transcribe(audio)
+        text = "".join(segment.text for segment in segments).strip()
+        callback = self.on_partial
+        if text and callback is not None:
+            callback(text)
 
     def listen(self) -> str:
         stream = sd.RawInputStream(
@@ -45,75 +120,288 @@ class WhisperSTT(SpeechToText):
         )
         stream.start()
 
-        audio_chunks: list[bytes] = []
+        length = 0
         silence_start: float | None = None
         speech_detected = False
+        detector = self.wake_word
+        awake = detector is None
+        awake_since: float | None = None
+        gated_samples = 0
+        partial_length = 0
 
         try:
             while True:
                 data, _ = stream.read(self.block_size)
                 is_speech = self.vad.is_speech(data, self.sample_rate)
+                if detector is not None and not awake:
+                    if is_speech:
+                        silence_start = None
+                        gated_samples += self.block_size
+                        frame = np.frombuffer(data, dtype=np.int16)
+                        if detector.detect(frame):
+                            awake = True
+                            awake_since = time.time()
+                            self.wake_stats.accepted += 1
+                            detector.reset()
+                            gated_samples = 0
+                    elif gated_samples:
+                        if silence_start is None:
+                            silence_start = time.time()
+                        elif time.time() - silence_start >= self.vad_silence_duration:
+                            # The utterance ended without the wake word.
+                            self.wake_stats.rejected += 1
+                            self.wake_stats.rejected_audio_seconds += (
+                                gated_samples / self.sample_rate
+                            )
+                            detector.reset()
+                            gated_samples = 0
+                            silence_start = None
+                    continue
                 if is_speech:
                     speech_detected = True
                     silence_start = None
-                    audio_chunks.append(data)
+                    length = self._append(data, length)
+                    if (
+                        self.partial_samples
+                        and length - partial_length >= self.partial_samples
+                        and self._start_partial(length)
+                    ):
+                        partial_length = length
                 elif speech_detected:
                     if silence_start is None:
                         silence_start = time.time()
-                    elif time.time() - silence_start >= self.vad_silence_duration:
-                        break
+                        if (
+                            self.partial_samples
+                            and length > partial_length
+                            and self._start_partial(length)
+                        ):
+                            # Likely the endpoint: the final transcript will
+                            # usually match this one.
+                            partial_length = length
+                    else:
+                        waited = time.time() - silence_start
+                        if waited >= self.vad_silence_duration:
+                            tracing.record("vad_endpoint", waited)
+                            break
+                elif (
+                    awake_since is not None
+                    and time.time() - awake_since >= self.wake_word_timeout
+                ):
+                    # Wake word without a follow-up request; go back to sleep.
+                    awake = False
+                    awake_since = None
         finally:
             stream.stop()
             stream.close()
 
-        if not audio_chunks:
+        if not length:
             return ""
 
-        pcm = b"".join(audio_chunks)
-        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        audio = self._audio[:length]
+        np.multiply(self._pcm[:length], 1 / 32768.0, out=audio, casting="unsafe")
+        start = time.perf_counter()
         segments, _ = self.model.transcribe(audio)
-        return "".join(segment.text for segment in segments).strip()
+        text = "".join(segment.text for segment in segments).strip()
+        elapsed = time.perf_counter() - start
+        tracing.record("whisper_decode", elapsed)
+        self.wake_stats.decode_seconds += elapsed
+        self.wake_stats.decoded_audio_seconds += length / self.sample_rate
+        return text
+
+
+@dataclass
+class SynthesisStats:
+    """Timing of a single synthesized segment."""
+
+    chars: int
+    audio_seconds: float
+    synthesis_seconds: float
+
+    @property
+    def real_time_factor(self) -> float:
+        """Synthesis time divided by audio duration.
+
+        Below 1 is faster than real time.
+        """
+        if not self.audio_seconds:
+            return 0.0
+        return self.synthesis_seconds / self.audio_seconds
+
+
+def _load_voice(model_path: str, onnx_threads: int | None):
+    from piper import PiperVoice
+
+    if not onnx_threads:
+        return PiperVoice.load(model_path)
+
+    import json
+
+    import onnxruntime
+    from piper.config import PiperConfig
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = onnx_threads
+    options.inter_op_num_threads = 1
+    with open(f"{model_path}.json", "r", encoding="utf-8") as f:
+        config = PiperConfig.from_dict(json.load(f))
+    session = onnxruntime.InferenceSession(
+        str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+    )
+    return PiperVoice(session=session, config=config)
 
 
 class PiperTTS(TextToSpeech):
-    """Text to speech engine using ``piper-tts`` and ``sounddevice``."""
+    """Text to speech engine using ``piper-tts`` and ``sounddevice``.
+
+    Synthesis and playback run as two stages: a worker thread renders queued
+    sentences while the :class:`AudioPlayer` callback plays earlier ones.
 
-    def __init__(self, model_path: str) -> None:
-        from io import BytesIO
-        from piper import PiperVoice
+    Parameters
+    ----------
+    model_path:
+        Path to the Piper ``.onnx`` voice.
+    block_size:
+        Frames per audio callback.
+    lookahead:
+        Number of rendered segments allowed to wait for playback. Synthesis
+        pauses once this many segments are ahead of the speaker.
+    onnx_threads:
+        Intra-op thread count for the ONNX session. ``None`` keeps the
+        onnxruntime default, which uses every core and competes with the LLM.
+    cache_dir:
+        Directory for the on-disk phrase cache. ``None`` keeps cached phrases
+        in memory only.
+    cache_entries:
+        Number of phrases kept in the in-memory cache.
+    """
 
-        self.voice = PiperVoice.load(model_path)
+    def __init__(
+        self,
+        model_path: str,
+        block_size: int = 1024,
+        lookahead: int = 2,
+        onnx_threads: int | None = None,
+        cache_dir: str | None = None,
+        cache_entries: int = 256,
+    ) -> None:
+        self.voice = _load_voice(model_path, onnx_threads)
+        self.cache = PhraseCache(
+            voice_fingerprint(model_path), cache_dir, max_entries=cache_entries
+        )
         self.sample_rate = self.voice.config.sample_rate
-        self._queue: queue.Queue[str] = queue.Queue()
-        self._stop_event = threading.Event()
+        self.player = AudioPlayer(
+            self.sample_rate,
+            block_size=block_size,
+            max_segments=lookahead,
+            dtype="int16",
+        )
+        self.stats: Deque[SynthesisStats] = deque(maxlen=100)
+        # Segments to speak, tagged with their generation. Warm-up phrases
+        # are tagged ``None`` and only rendered into the cache.
+        self._queue: queue.Queue[tuple[int | None, str] | None] = queue.Queue()
+        # Bumped by ``stop`` so segments queued or synthesized for an
+        # interrupted reply are dropped instead of played.
+        self._generation = 0
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
-        self._buffer_cls = BytesIO
 
     def _run(self) -> None:
         while True:
-            text = self._queue.get()
-            if text is None:  # type: ignore[comparison-overlap]
+            item = self._queue.get()
+            if item is None:
                 break
-            if not self._stop_event.is_set():
-                buf = self._buffer_cls()
-                with wave.open(buf, "wb") as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)  # 2 bytes for 16-bit audio
-                    wf.setframerate(self.sample_rate)
-                    self.voice.synthesize(text, wf)
-                audio = (
-                    np.frombuffer(buf.getvalue(), dtype=np.int16).astype(np.float32)
-                    / 32768.0
-                )
-                sd.play(audio, self.sample_rate)
-                sd.wait()
+            generation, text = item
+            if generation is None:
+                self._warm(text)
+            elif generation == self._generation:
+                self._synthesize(text, generation)
             self._queue.task_done()
-            self._stop_event.clear()
+
+    def _synthesize(self, text: str, generation: int) -> None:
+        """Render ``text`` and hand each audio chunk to the player.
+
+        Piper yields an ``AudioChunk`` per sentence; its 16-bit samples are
+        played as they are, so no WAV container is involved. Time spent
+        waiting for playback room is not counted as synthesis time. Phrases
+        found in the cache skip synthesis entirely. Nothing is played once
+        ``stop`` has moved on to a new generation.
+        """
+        cached = self.cache.get(text)
+        if cached is not None:
+            if generation == self._generation:
+                tracing.mark("first_audio")
+                self.player.play(cached)
+            return
+
+        chunks = iter(self.voice.synthesize(text))
+        rendered: list[np.ndarray] = []
+        synthesis_seconds = 0.0
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            synthesis_seconds += time.perf_counter() - start
+            if chunk is None:
+                if rendered:
+                    self.cache.put(text, np.concatenate(rendered))
+                break
+            if generation != self._generation:
+                break
+            audio = chunk.audio_int16_array
+            if not rendered:
+                tracing.mark("first_audio")
+            rendered.append(audio)
+            self.player.play(audio)
+        samples = sum(len(audio) for audio in rendered)
+        stats = SynthesisStats(
+            chars=len(text),
+            audio_seconds=samples / self.sample_rate,
+            synthesis_seconds=synthesis_seconds,
+        )
+        self.stats.append(stats)
+        tracing.record("tts_synthesis", synthesis_seconds)
+        logger.info(
+            "Synthesized %d chars into %.2fs of audio in %.2fs (RTF %.2f)",
+            stats.chars,
+            stats.audio_seconds,
+            stats.synthesis_seconds,
+            stats.real_time_factor,
+        )
+
+    def warm_up(self, phrases: Iterable[str]) -> None:
+        """Queue ``phrases`` to be rendered into the cache by the worker.
+
+        Returns right away. The worker renders them between spoken segments,
+        so the voice is never used by two threads at once.
+        """
+        for phrase in phrases:
+            self._queue.put((None, phrase))
+
+    def _warm(self, phrase: str) -> None:
+        if not self.cache.cacheable(phrase) or phrase in self.cache:
+            return
+        chunks = [chunk.audio_int16_array for chunk in self.voice.synthesize(phrase)]
+        if chunks:
+            self.cache.put(phrase, np.concatenate(chunks))
 
     def speak(self, tokens: Iterable[str]) -> None:
-        self._queue.put("".join(tokens))
+        """Queue each sentence for synthesis as soon as it has been generated."""
+        generation = self._generation
+        for segment in iter_segments(tokens):
+            if generation != self._generation:
+                break
+            self._queue.put((generation, segment))
 
     def stop(self) -> None:
-        sd.stop()
-        self._stop_event.set()
+        self._generation += 1
+        warm_up = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[0] is None:
+                warm_up.append(item)
+            self._queue.task_done()
+        for item in warm_up:
+            self._queue.put(item)
+        self.player.flush()
@@ -0,0 +1,137 @@
+"""Gapless audio playback through a single long-lived output stream."""
+
+from __future__ import annotations
+
+import queue
+import threading
+
+import numpy as np
+import sounddevice as sd
+
+
+class AudioPlayer:
+    """Play mono PCM segments back to back from a ``sounddevice`` callback.
+
+    Segments are handed to the audio callback through a bounded queue, so the
+    device is opened once and the next segment starts on the very next sample
+    after the previous one ends.
+
+    Parameters
+    ----------
+    sample_rate:
+        Sample rate of the audio that will be played.
+    block_size:
+        Frames requested per callback. ``flush`` takes effect within one block.
+    max_segments:
+        Maximum number of segments waiting to be played. ``play`` blocks when
+        the queue is full. Segments still waiting for room when ``flush`` is
+        called are dropped as well.
+    dtype:
+        Sample format of the arrays passed to ``play``.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        block_size: int = 1024,
+        max_segments: int = 32,
+        dtype: str = "float32",
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.dtype = dtype
+        # Segments are tagged with the flush epoch they were queued in;
+        # ``flush`` bumps the epoch so older segments are never played.
+        self._queue: queue.Queue[tuple[int, np.ndarray]] = queue.Queue(
+            maxsize=max_segments
+        )
+        self._epoch = 0
+        self._current: np.ndarray | None = None
+        self._current_epoch = 0
+        self._position = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+        self._stream: sd.OutputStream | None = None
+
+    def start(self) -> None:
+        """Open and start the output stream if it is not running yet."""
+        with self._lock:
+            if self._stream is not None:
+                return
+            self._stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                blocksize=self.block_size,
+                channels=1,
+                dtype=self.dtype,
+                callback=self._callback,
+            )
+            self._stream.start()
+
+    def play(self, audio: np.ndarray) -> None:
+        """Queue ``audio`` to start right after everything already queued."""
+        if not len(audio):
+            return
+        self.start()
+        epoch = self._epoch
+        # Cleared first: the callback may play the segment and set it again
+        # before ``put`` returns.
+        self._idle.clear()
+        self._queue.put((epoch, audio))
+        if epoch != self._epoch:
+            # Flushed while waiting for room; the segment must not play.
+            self._discard_stale()
+
+    def flush(self) -> None:
+        """Drop queued and currently playing audio."""
+        self._epoch += 1
+        self._discard_stale()
+
+    def _discard_stale(self) -> None:
+        with self._queue.mutex:
+            fresh = [item for item in self._queue.queue if item[0] == self._epoch]
+            self._queue.queue.clear()
+            self._queue.queue.extend(fresh)
+            self._queue.not_full.notify_all()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until all queued audio has been played."""
+        return self._idle.wait(timeout)
+
+    def close(self) -> None:
+        """Stop and release the output stream."""
+        self.flush()
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._idle.set()
+
+    def _callback(self, outdata: np.ndarray, frames: int, time, status) -> None:
+        out = outdata[:, 0]
+        if self._current_epoch != self._epoch:
+            self._current = None
+        filled = 0
+        while filled < frames:
+            if self._current is None:
+                try:
+                    epoch, audio = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if epoch != self._epoch:
+                    continue
+                self._current, self._current_epoch = audio, epoch
+                self._position = 0
+            count = min(frames - filled, len(self._current) - self._position)
+            out[filled : filled + count] = self._current[
+                self._position : self._position + count
+            ]
+            filled += count
+            self._position += count
+            if self._position >= len(self._current):
+                self._current = None
+        out[filled:] = 0
+        if self._current is None and self._queue.empty():
+            self._idle.set()
@@ -0,0 +1,212 @@
+"""Run the voice engines in a dedicated worker process."""
+
+from __future__ import annotations
+
+import itertools
+import multiprocessing as mp
+import threading
+from concurrent.futures import Future
+from typing import Any, Iterable
+
+from .engines import PiperTTS, WhisperSTT
+from .interface import SpeechToText, TextToSpeech
+from .segmenter import iter_segments
+
+
+def _serve(
+    conn: Any,
+    stt_cls: type[SpeechToText],
+    stt_kwargs: dict[str, Any],
+    tts_cls: type[TextToSpeech],
+    tts_kwargs: dict[str, Any],
+) -> None:
+    """Worker entry point: build the engines and answer requests on ``conn``."""
+    try:
+        stt = stt_cls(**stt_kwargs)
+        tts = tts_cls(**tts_kwargs)
+    except Exception as exc:  # pragma: no cover - reported to the parent
+        conn.send((None, False, repr(exc)))
+        return
+    conn.send((None, True, None))
+
+    send_lock = threading.Lock()
+
+    def reply(request_id: int, ok: bool, value: Any) -> None:
+        with send_lock:
+            conn.send((request_id, ok, value))
+
+    def listen(request_id: int) -> None:
+        try:
+            reply(request_id, True, stt.listen())
+        except Exception as exc:
+            reply(request_id, False, repr(exc))
+
+    while True:
+        try:
+            request_id, method, argument = conn.recv()
+        except EOFError:
+            break
+        if method == "close":
+            break
+        if method == "listen":
+            threading.Thread(target=listen, args=(request_id,), daemon=True).start()
+        elif method == "speak":
+            tts.speak([argument])
+        elif method == "stop":
+            tts.stop()
+        elif method == "warm_up":
+            warm_up = getattr(tts, "warm_up", None)
+            if warm_up is not None:
+                warm_up(argument)
+
+
+class SpeechProcess:
+    """Host the speech-to-text and text-to-speech engines in a child process.
+
+    Audio capture, VAD, Whisper decoding, Piper synthesis and playback all run
+    in the worker, so none of them compete for the GIL with token streaming or
+    the GUI. Only text and control messages cross the process boundary. Use
+    :attr:`stt` and :attr:`tts` wherever a :class:`SpeechToText` or
+    :class:`TextToSpeech` is expected.
+
+    Parameters
+    ----------
+    stt_kwargs:
+        Keyword arguments for ``stt_cls`` in the worker.
+    tts_kwargs:
+        Keyword arguments for ``tts_cls`` in the worker.
+    stt_cls, tts_cls:
+        Engine classes to instantiate. They must be importable by the worker.
+    """
+
+    def __init__(
+        self,
+        stt_kwargs: dict[str, Any],
+        tts_kwargs: dict[str, Any],
+        stt_cls: type[SpeechToText] = WhisperSTT,
+        tts_cls: type[TextToSpeech] = PiperTTS,
+    ) -> None:
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_serve,
+            args=(child_conn, stt_cls, stt_kwargs, tts_cls, tts_kwargs),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+        _, ok, error = self._conn.recv()
+        if not ok:
+            self._process.join()
+            raise RuntimeError(f"Speech process failed to start: {error}")
+
+        self._ids = itertools.count()
+        self._pending: dict[int, Future[Any]] = {}
+        # Guards ``_pending`` and ``_closed``, set once the reader sees the
+        # worker's pipe close.
+        self._pending_lock = threading.Lock()
+        self._closed = False
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+        self.stt = ProcessSTT(self)
+        self.tts = ProcessTTS(self)
+
+    def send(self, method: str, argument: Any = None) -> None:
+        """Send a request that does not expect a reply."""
+        with self._send_lock:
+            self._conn.send((None, method, argument))
+
+    def call(self, method: str, argument: Any = None) -> Any:
+        """Send a request and block until the worker replies.
+
+        Raises
+        ------
+        RuntimeError
+            If the worker fails the request or has exited.
+        """
+        future: Future[Any] = Future()
+        request_id = next(self._ids)
+        with self._pending_lock:
+            if self._closed:
+                raise RuntimeError("Speech process exited")
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self._conn.send((request_id, method, argument))
+        except OSError as exc:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise RuntimeError("Speech process exited") from exc
+        return future.result()
+
+    def close(self) -> None:
+        """Shut the worker down."""
+        if not self._process.is_alive():
+            return
+        try:
+            self.send("close")
+        except (BrokenPipeError, OSError):  # pragma: no cover - already gone
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():  # pragma: no cover - defensive
+            self._process.terminate()
+
+    def _read_replies(self) -> None:
+        while True:
+            try:
+                request_id, ok, value = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._pending_lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+        with self._pending_lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        error = RuntimeError("Speech process exited")
+        for future in pending.values():
+            future.set_exception(error)
+
+
+class ProcessSTT(SpeechToText):
+    """:class:`SpeechToText` proxy for an engine inside a :class:`SpeechProcess`."""
+
+    def __init__(self, process: SpeechProcess) -> None:
+        self._process = process
+
+    def listen(self) -> str:
+        return self._process.call("listen")
+
+
+class ProcessTTS(TextToSpeech):
+    """:class:`TextToSpeech` proxy for an engine inside a :class:`SpeechProcess`.
+
+    Tokens are segmented locally and each finished sentence is sent to the
+    worker right away, so synthesis starts as early as with an in-process
+    engine.
+    """
+
+    def __init__(self, process: SpeechProcess) -> None:
+        self._process = process
+        self._generation = 0
+
+    def speak(self, tokens: Iterable[str]) -> None:
+        generation = self._generation
+        for segment in iter_segments(tokens):
+            if generation != self._generation:
+                break
+            self._process.send("speak", segment)
+
+    def stop(self) -> None:
+        self._generation += 1
+        self._process.send("stop")
+
+    def warm_up(self, phrases: Iterable[str]) -> None:
+        self._process.send("warm_up", list(phrases))
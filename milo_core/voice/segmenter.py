@@ -0,0 +1,152 @@
+"""Split a stream of LLM tokens into speakable segments."""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator
+
+# Words that end with a period without ending the sentence. Stored without
+# the trailing period and lower-cased.
+ABBREVIATIONS = frozenset(
+    {
+        "mr",
+        "mrs",
+        "ms",
+        "dr",
+        "prof",
+        "sr",
+        "jr",
+        "st",
+        "mt",
+        "vs",
+        "etc",
+        "e.g",
+        "i.e",
+        "a.m",
+        "p.m",
+        "u.s",
+        "u.k",
+        "inc",
+        "ltd",
+        "co",
+        "corp",
+        "approx",
+        "dept",
+        "est",
+        "fig",
+        "ave",
+        "jan",
+        "feb",
+        "mar",
+        "apr",
+        "jun",
+        "jul",
+        "aug",
+        "sep",
+        "sept",
+        "oct",
+        "nov",
+        "dec",
+    }
+)
+
+# A terminator run, optional closing quotes/brackets, whitespace and the first
+# character of the next segment. Requiring that character means a boundary is
+# only decided once we can see what follows it.
+_SENTENCE_RE = re.compile(r"([.!?…]+)[\"'”’)\]]*\s+(?=(\S))")
+_NEWLINE_RE = re.compile(r"\s*\n\s*(?=\S)")
+_CLAUSE_RE = re.compile(r"[,;:—]\s+(?=\S)")
+_WORD_BEFORE_RE = re.compile(r"([\w.]+)$")
+
+
+class SentenceSegmenter:
+    """Incrementally cut text into sentence or clause sized segments.
+
+    Parameters
+    ----------
+    clause_chars:
+        Minimum segment length before a comma, semicolon or colon is treated
+        as a boundary. Keeps short clauses together for natural prosody.
+    max_chars:
+        Hard limit after which a segment is cut at the last space even when no
+        punctuation was seen.
+    """
+
+    def __init__(self, clause_chars: int = 80, max_chars: int = 240) -> None:
+        self.clause_chars = clause_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._scan = 0
+
+    def feed(self, token: str) -> list[str]:
+        """Add ``token`` and return any segments that are now complete."""
+        self._buffer += token
+        segments: list[str] = []
+        while True:
+            cut = self._find_boundary()
+            if cut is None:
+                break
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            self._scan = 0
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> str | None:
+        """Return whatever text is left once the stream has ended."""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        self._scan = 0
+        return segment or None
+
+    def _find_boundary(self) -> int | None:
+        text = self._buffer
+        for match in _SENTENCE_RE.finditer(text, self._scan):
+            if self._is_sentence_end(text, match):
+                return match.end()
+            self._scan = match.end()
+
+        match = _NEWLINE_RE.search(text)
+        if match and match.start() > 0:
+            return match.end()
+
+        if len(text) >= self.clause_chars:
+            match = _CLAUSE_RE.search(text, self.clause_chars - 1)
+            if match:
+                return match.end()
+
+        if len(text) > self.max_chars:
+            space = text.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+    @staticmethod
+    def _is_sentence_end(text: str, match: re.Match[str]) -> bool:
+        if match.group(1) != ".":
+            return True
+        word_match = _WORD_BEFORE_RE.search(text, 0, match.start())
+        if word_match is None:
+            return True
+        word = word_match.group(1).lower()
+        if word in ABBREVIATIONS:
+            return False
+        if len(word) == 1 and word.isalpha():
+            # Initials such as "J. R. R. Tolkien".
+            return False
+        if word.isdigit() and not text[: word_match.start()].strip():
+            # Numbered list item at the start of a segment: "1. Preheat".
+            return False
+        # "approx. ten" or "3 p.m. today" - a lower-case continuation means
+        # the period did not end the sentence.
+        return not match.group(2).islower()
+
+
+def iter_segments(tokens: Iterable[str], **kwargs: int) -> Iterator[str]:
+    """Yield speakable segments from ``tokens`` as soon as each one is complete."""
+    segmenter = SentenceSegmenter(**kwargs)
+    for token in tokens:
+        yield from segmenter.feed(token)
+    tail = segmenter.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,182 @@
+"""Wake-word gating between voice activity detection and Whisper."""
+
+from __future__ import annotations
+
+import argparse
+import wave
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+
+class WakeWordDetector(ABC):
+    """Keyword spotter fed with 16 kHz mono ``int16`` speech frames."""
+
+    @abstractmethod
+    def detect(self, frame: np.ndarray) -> bool:
+        """Consume ``frame`` and return ``True`` once the wake word was heard."""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Forget any partially heard audio."""
+        return None
+
+
+class OpenWakeWordDetector(WakeWordDetector):
+    """Wake-word detection with an `openWakeWord` ONNX model.
+
+    Requires the optional ``openwakeword`` package.
+
+    Parameters
+    ----------
+    model:
+        Name of a pretrained openWakeWord model or path to a custom one.
+    threshold:
+        Score above which the wake word counts as detected.
+    """
+
+    chunk_samples = 1280  # openWakeWord scores 80 ms chunks
+
+    def __init__(self, model: str = "hey_jarvis", threshold: float = 0.5) -> None:
+        from openwakeword.model import Model  # optional dependency
+
+        self.threshold = threshold
+        self._model = Model(wakeword_models=[model], inference_framework="onnx")
+        self._pending = np.empty(0, dtype=np.int16)
+
+    def detect(self, frame: np.ndarray) -> bool:
+        self._pending = np.concatenate((self._pending, frame))
+        detected = False
+        while len(self._pending) >= self.chunk_samples:
+            chunk = self._pending[: self.chunk_samples]
+            self._pending = self._pending[self.chunk_samples :]
+            scores = self._model.predict(chunk)
+            detected = detected or max(scores.values(), default=0.0) >= self.threshold
+        return detected
+
+    def reset(self) -> None:
+        self._model.reset()
+        self._pending = np.empty(0, dtype=np.int16)
+
+
+@dataclass
+class WakeWordStats:
+    """Counters showing how much Whisper work the wake-word stage avoided."""
+
+    accepted: int = 0
+    rejected: int = 0
+    rejected_audio_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    decoded_audio_seconds: float = 0.0
+
+    @property
+    def avoided_decode_seconds(self) -> float:
+        """Estimated Whisper time saved, using the measured decode speed."""
+        if not self.decoded_audio_seconds:
+            return 0.0
+        rate = self.decode_seconds / self.decoded_audio_seconds
+        return self.rejected_audio_seconds * rate
+
+
+@dataclass
+class WakeWordEvaluation:
+    """False-accept and false-reject results over a set of recordings."""
+
+    positives: int
+    negatives: int
+    false_rejects: int
+    false_accepts: int
+    negative_hours: float
+
+    @property
+    def false_reject_rate(self) -> float:
+        return self.false_rejects / self.positives if self.positives else 0.0
+
+    @property
+    def false_accept_rate(self) -> float:
+        return self.false_accepts / self.negatives if self.negatives else 0.0
+
+    @property
+    def false_accepts_per_hour(self) -> float:
+        return self.false_accepts / self.negative_hours if self.negative_hours else 0.0
+
+
+def read_wav(path: str | Path) -> np.ndarray:
+    """Return the samples of a 16-bit mono WAV file."""
+    with wave.open(str(path), "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{path} must be 16-bit mono PCM")
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def _triggers(detector: WakeWordDetector, audio: np.ndarray, block_size: int) -> bool:
+    detector.reset()
+    for start in range(0, len(audio), block_size):
+        if detector.detect(audio[start : start + block_size]):
+            return True
+    return False
+
+
+def evaluate_detector(
+    detector: WakeWordDetector,
+    positives: Iterable[str | Path],
+    negatives: Iterable[str | Path],
+    sample_rate: int = 16_000,
+    block_size: int = 480,
+) -> WakeWordEvaluation:
+    """Run ``detector`` over recorded clips and count its mistakes.
+
+    ``positives`` are recordings that contain the wake word and should
+    trigger; ``negatives`` are background speech, TV and other audio that
+    should not.
+    """
+    positive_files: list[Path] = [Path(p) for p in positives]
+    negative_files: list[Path] = [Path(p) for p in negatives]
+    false_rejects = sum(
+        not _triggers(detector, read_wav(path), block_size) for path in positive_files
+    )
+    false_accepts = 0
+    negative_samples = 0
+    for path in negative_files:
+        audio = read_wav(path)
+        negative_samples += len(audio)
+        false_accepts += _triggers(detector, audio, block_size)
+    return WakeWordEvaluation(
+        positives=len(positive_files),
+        negatives=len(negative_files),
+        false_rejects=false_rejects,
+        false_accepts=false_accepts,
+        negative_hours=negative_samples / sample_rate / 3600,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Evaluate an openWakeWord model on directories of WAV recordings."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("positive_dir", type=Path)
+    parser.add_argument("negative_dir", type=Path)
+    parser.add_argument("--model", default="hey_jarvis")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    detector = OpenWakeWordDetector(args.model, args.threshold)
+    result = evaluate_detector(
+        detector,
+        sorted(args.positive_dir.glob("*.wav")),
+        sorted(args.negative_dir.glob("*.wav")),
+    )
+    print(
+        f"False rejects: {result.false_rejects}/{result.positives}"
+        f" ({result.false_reject_rate:.1%})"
+    )
+    print(
+        f"False accepts: {result.false_accepts}/{result.negatives}"
+        f" ({result.false_accept_rate:.1%}, {result.false_accepts_per_hour:.2f}/hour)"
+    )
+
+
+if __name__ == "__main__":  # pragma: no cover - manual evaluation
+    main()
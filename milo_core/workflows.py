@@ -1,19 +1,218 @@
-"""Utilities for interacting with local n8n workflows."""
+"""Utilities for interacting with local n8n workflows.
+
+:class:`WorkflowClient` keeps a pooled keep-alive session to the n8n
+instance, bounds every request with connect and read timeouts, retries
+connection failures and server errors with exponential backoff, and records
+latency and error counts per workflow. :func:`trigger_workflow` uses a
+shared client per base URL.
+"""
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from milo_core import tracing
 
+logger = logging.getLogger(__name__)
 
 DEFAULT_BASE_URL = "http://localhost:5678"
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_TIMEOUT = 10.0
+
+
+@dataclass
+class WorkflowStats:
+    """Latency and outcome counts for one workflow.
+
+    ``errors`` counts calls that raised or ended with an error status after
+    all retries; ``retries`` counts the extra attempts.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=256))
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Latency percentile in seconds over the most recent calls."""
+        return tracing.percentile(list(self.latencies), q)
+
+
+class WorkflowClient:
+    """Pooled, retrying client for n8n webhooks.
+
+    Parameters
+    ----------
+    base_url:
+        Base URL for the locally hosted n8n instance.
+    connect_timeout:
+        Seconds to wait for a connection to n8n.
+    read_timeout:
+        Seconds to wait for the webhook to respond once connected. Read
+        timeouts are not retried, since the workflow may already be running.
+    retries:
+        Extra attempts after a connection error or a 5xx response.
+    backoff:
+        Delay before the first retry; it doubles with every attempt.
+    pool_size:
+        Keep-alive connections kept open to n8n.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float | None = DEFAULT_TIMEOUT,
+        retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 4,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._stats: Dict[str, WorkflowStats] = {}
+        self._lock = threading.Lock()
+
+    def trigger(
+        self,
+        workflow_id: str,
+        payload: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> requests.Response:
+        """POST ``payload`` to the webhook of ``workflow_id``.
+
+        ``timeout`` overrides the read timeout for this call. The last
+        response is returned even if it is a server error; connection errors
+        and timeouts are raised as ``requests`` exceptions.
+        """
+        url = f"{self.base_url}/webhook/{workflow_id}"
+        timeouts = (self.connect_timeout, timeout or self.read_timeout)
+        start = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = self.session.post(
+                        url, json=payload or {}, timeout=timeouts
+                    )
+                except requests.ConnectionError as exc:
+                    # Includes connect timeouts, but not read timeouts.
+                    if attempt >= self.retries:
+                        raise
+                    logger.debug("Workflow %s: %s, retrying", workflow_id, exc)
+                else:
+                    if response.status_code < 500 or attempt >= self.retries:
+                        break
+                    logger.debug(
+                        "Workflow %s: status %d, retrying",
+                        workflow_id,
+                        response.status_code,
+                    )
+                    response.close()
+                time.sleep(self.backoff * 2**attempt)
+                attempt += 1
+        except requests.RequestException:
+            self._record(workflow_id, start, attempt, failed=True)
+            raise
+        self._record(workflow_id, start, attempt, failed=not response.ok)
+        return response
+
+    async def trigger_async(
+        self,
+        workflow_id: str,
+        payload: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+        executor: Executor | None = None,
+    ) -> requests.Response:
+        """Run :meth:`trigger` on ``executor`` without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, self.trigger, workflow_id, payload, timeout
+        )
+
+    def _record(
+        self, workflow_id: str, start: float, retries: int, failed: bool
+    ) -> None:
+        seconds = time.perf_counter() - start
+        tracing.record("workflow", seconds)
+        with self._lock:
+            stats = self._stats.setdefault(workflow_id, WorkflowStats())
+            stats.calls += 1
+            stats.retries += retries
+            stats.errors += failed
+            stats.latencies.append(seconds)
+
+    def stats(self) -> Dict[str, WorkflowStats]:
+        """Statistics per workflow id since the client was created."""
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
+
+_clients: Dict[Tuple[str, int | None], WorkflowClient] = {}
+_client_settings: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def configure(**settings: Any) -> None:
+    """Set the :class:`WorkflowClient` arguments used by :func:`get_client`."""
+    global _client_settings
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _client_settings = settings
+    for client in clients:
+        client.close()
+
+
+def get_client(
+    base_url: str | None = None, retries: int | None = None
+) -> WorkflowClient:
+    """Return the shared client for ``base_url``, creating it if needed.
+
+    ``retries`` overrides the configured number of retries; callers that
+    retry on their own, like the job queue, pass ``0``.
+    """
+    with _clients_lock:
+        settings = dict(_client_settings)
+        url = (base_url or settings.pop("base_url", DEFAULT_BASE_URL)).rstrip("/")
+        settings.pop("base_url", None)
+        if retries is not None:
+            settings["retries"] = retries
+        client = _clients.get((url, retries))
+        if client is None:
+            client = _clients[url, retries] = WorkflowClient(url, **settings)
+        return client
 
 
 def trigger_workflow(
     workflow_id: str,
     payload: Dict[str, Any] | None = None,
-    base_url: str = DEFAULT_BASE_URL,
+    base_url: str | None = None,
+    timeout: float | None = None,
 ) -> requests.Response:
     """Trigger an n8n workflow via a local webhook.
 
@@ -24,13 +223,15 @@ def trigger_workflow(
     payload:
         Optional JSON payload to send with the webhook POST request.
     base_url:
-        Base URL for the locally hosted n8n instance.
+        Base URL for the locally hosted n8n instance. Defaults to the
+        configured URL, ``http://localhost:5678`` unless changed.
+    timeout:
+        Seconds to wait for the webhook to respond, overriding the client's
+        read timeout.
 
     Returns
     -------
     requests.Response
         The response from the webhook request.
     """
-    url = f"{base_url}/webhook/{workflow_id}"
-    response = requests.post(url, json=payload or {})
-    return response
+    return get_client(base_url).trigger(workflow_id, payload, timeout=timeout)
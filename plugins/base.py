@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from abc import ABC, abstractmethod
 
 
@@ -7,8 +8,26 @@ class BaseSkill(ABC):
     """Base class for all MILO skill plugins."""
 
     name: str
+    # Seconds MILO waits for ``execute`` before giving up on the command.
+    # ``None`` uses the pipeline's default.
+    timeout: float | None = None
+    # Seconds a result may be reused for the same arguments. ``None`` runs
+    # ``execute`` every time; set it only for skills without side effects.
+    cache_ttl: float | None = None
+    # Run ``execute`` in a worker process (see ``milo_core.sandbox``) so CPU
+    # heavy or blocking work cannot stall audio and token streaming.
+    # Arguments and results must be picklable.
+    isolated: bool = False
 
     @abstractmethod
     def execute(self, *args: object, **kwargs: object) -> object:
         """Run the skill's action."""
         raise NotImplementedError
+
+    def cache_key(self, *args: object, **kwargs: object) -> str | None:
+        """Identify the result of ``execute(*args, **kwargs)`` for caching.
+
+        Calls with equal keys share a cached result while it is fresh.
+        Return ``None`` to skip the cache for a call.
+        """
+        return json.dumps([args, kwargs], sort_keys=True, default=str)
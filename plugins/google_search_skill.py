@@ -9,6 +9,8 @@ class GoogleSearchSkill(BaseSkill):
     """Skill to perform a web search using the googlesearch library."""
 
     name = "googlesearch"
+    timeout = 15.0
+    cache_ttl = 600.0
 
     def execute(self, query: str, num_results: int = 5) -> str:  # type: ignore[override]
         """Return the top URLs for ``query``."""
@@ -16,3 +18,7 @@ class GoogleSearchSkill(BaseSkill):
         for url in search(query, num_results=num_results):
             results.append(url)
         return "\n".join(results)
+
+    def cache_key(self, query: str, num_results: int = 5) -> str:  # type: ignore[override]
+        """Treat queries differing only in case or spacing as the same."""
+        return f"{num_results}:{' '.join(query.lower().split())}"
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from milo_core.llm.batching import (
+    BatchScheduler,
+    HuggingFaceBatchBackend,
+    StubBatchBackend,
+)
+from milo_core.memory import Message
+
+
+def test_concurrent_requests_share_decoding_steps() -> None:
+    backend = StubBatchBackend("one two three four five", step_seconds=0.01)
+    scheduler = BatchScheduler(backend, max_batch_size=4)
+    results: dict[int, str] = {}
+
+    def run(i: int) -> None:
+        history = [Message(role="user", content=f"hi {i}")]
+        results[i] = "".join(scheduler.stream_response(history))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    scheduler.close()
+
+    assert set(results.values()) == {"one two three four five"}
+    assert scheduler.stats.max_batch_size == 4
+    assert max(backend.batch_sizes) <= 4
+    # Eight sequential requests would need 8 * 6 steps.
+    assert scheduler.stats.steps < 8 * 6
+
+
+def test_requests_join_a_running_batch() -> None:
+    backend = StubBatchBackend(" ".join(["w"] * 30), step_seconds=0.005)
+    scheduler = BatchScheduler(backend, max_batch_size=4)
+    first = scheduler.stream_response([Message(role="user", content="a")])
+    next(first)  # the first request is already decoding
+    second = "".join(scheduler.stream_response([Message(role="user", content="b")], 3))
+    rest = "".join(first)
+    scheduler.close()
+
+    assert second == "w w w"
+    assert rest.count("w") == 29
+    assert (scheduler.stats.rebuilds, scheduler.stats.joins) == (1, 1)
+
+
+def test_closing_a_stream_frees_its_slot() -> None:
+    backend = StubBatchBackend(" ".join(["w"] * 1000), step_seconds=0.001)
+    scheduler = BatchScheduler(backend, max_batch_size=1)
+    stream = scheduler.stream_response([Message(role="user", content="a")])
+    next(stream)
+    stream.close()
+
+    reply = scheduler.generate_response("hello", max_new_tokens=2)
+    scheduler.close()
+    assert reply == "w w"
+
+
+def tiny_gpt2(prompts: dict[str, list[int]]):
+    """A random GPT-2 wrapped like :class:`HuggingFaceModel`, and its tokenizer."""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(
+        vocab_size=50, n_positions=64, n_embd=32, n_layer=2, n_head=2
+    )
+    lm = transformers.GPT2LMHeadModel(config).eval()
+    lm.generation_config.eos_token_id = None
+    lm.generation_config.pad_token_id = 0
+    tokenizer = SimpleNamespace(
+        eos_token_id=49,
+        pad_token_id=0,
+        decode=lambda ids, skip_special_tokens=True: "".join(f"<{i}>" for i in ids),
+    )
+    hf = SimpleNamespace(
+        tokenizer=tokenizer,
+        model=lm,
+        _encode=lambda history: {
+            "input_ids": torch.tensor([prompts[history[-1].content]])
+        },
+    )
+    return hf
+
+
+def greedy_reply(hf, prompt: list[int], limit: int) -> str:
+    import torch
+
+    ids = torch.tensor([prompt])
+    expected = hf.model.generate(
+        ids,
+        attention_mask=torch.ones_like(ids),
+        max_new_tokens=limit,
+        do_sample=False,
+    )[0, ids.shape[-1] :].tolist()
+    return hf.tokenizer.decode(expected)
+
+
+def test_huggingface_backend_matches_greedy_generate() -> None:
+    prompts = {"a": [5, 6, 7], "bb": [8, 9], "ccc": [10, 11, 12, 13, 14]}
+    hf = tiny_gpt2(prompts)
+    backend = HuggingFaceBatchBackend(hf)
+    scheduler = BatchScheduler(backend, max_batch_size=3, max_new_tokens=6)
+    results: dict[str, str] = {}
+
+    def run(key: str, limit: int) -> None:
+        history = [Message(role="user", content=key)]
+        results[key] = "".join(scheduler.stream_response(history, limit))
+
+    threads = [
+        threading.Thread(target=run, args=(key, limit))
+        for key, limit in (("a", 6), ("bb", 3), ("ccc", 6))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    scheduler.close()
+
+    for key, limit in (("a", 6), ("bb", 3), ("ccc", 6)):
+        assert results[key] == greedy_reply(hf, prompts[key], limit)
+
+
+def test_huggingface_backend_joins_without_reprocessing_the_batch() -> None:
+    prompts = {"short": [5, 6], "long": [10, 11, 12, 13, 14, 15, 16]}
+    hf = tiny_gpt2(prompts)
+    scheduler = BatchScheduler(HuggingFaceBatchBackend(hf), max_new_tokens=8)
+    first = scheduler.stream_response([Message(role="user", content="short")])
+    head = next(first)  # the first request is already decoding
+    second = "".join(scheduler.stream_response([Message(role="user", content="long")]))
+    rest = "".join(first)
+    scheduler.close()
+
+    assert head + rest == greedy_reply(hf, prompts["short"], 8)
+    assert second == greedy_reply(hf, prompts["long"], 8)
+    assert (scheduler.stats.rebuilds, scheduler.stats.joins) == (1, 1)
@@ -1,9 +1,21 @@
 from __future__ import annotations
 
+import json
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
-from milo_core.commands import execute_command, CommandError
+import pytest
+
+from milo_core.commands import (
+    CommandDetector,
+    CommandError,
+    PlanResult,
+    execute_command,
+    execute_plan,
+)
 from milo_core.plugin_manager import PluginManager
+from plugins.base import BaseSkill
 from plugins.test_skill import TestSkill
 
 
@@ -54,3 +66,174 @@ def test_execute_workflow_failure(mock_trigger) -> None:
         assert "failed" in str(exc)
     else:
         raise AssertionError("Expected CommandError")
+
+
+def feed_all(detector: CommandDetector, tokens: list[str]) -> str:
+    return "".join(detector.feed(token) for token in tokens) + detector.close()
+
+
+def test_detector_holds_back_command_split_across_tokens() -> None:
+    detector = CommandDetector()
+    tokens = [" {", '"type": "skill", ', '"name": "echo", "args": ["}{\\"', '"]', "}"]
+    shown = [detector.feed(token) for token in tokens[:-1]]
+    assert detector.command is None
+
+    assert detector.feed(tokens[-1]) == ""
+    assert shown == ["", "", "", ""]
+    assert detector.command == {"type": "skill", "name": "echo", "args": ['}{"']}
+    assert detector.feed("ignored after the command") == ""
+
+
+def test_detector_passes_plain_text_through() -> None:
+    detector = CommandDetector()
+    assert feed_all(detector, ["  Hel", "lo {not json}"]) == "  Hello {not json}"
+    assert detector.command is None
+
+
+def test_detector_recognizes_bare_list_plans() -> None:
+    detector = CommandDetector()
+    step = {"type": "skill", "name": "test"}
+    assert feed_all(detector, [" [", json.dumps(step), "]"]) == ""
+    assert detector.command == {"type": "plan", "steps": [step]}
+
+    prose = CommandDetector()
+    assert feed_all(prose, ["[1, 2]", " are numbers"]) == "[1, 2] are numbers"
+    assert prose.command is None
+
+
+def test_detector_releases_invalid_or_unfinished_objects() -> None:
+    detector = CommandDetector()
+    assert feed_all(detector, ["{oops}", " more"]) == "{oops} more"
+    assert detector.command is None
+
+    detector = CommandDetector()
+    assert feed_all(detector, ['{"type": "sk']) == '{"type": "sk'
+    assert detector.command is None
+
+
+@patch("milo_core.commands.trigger_workflow")
+def test_execute_workflow_request_error(mock_trigger) -> None:
+    import requests
+
+    mock_trigger.side_effect = requests.Timeout("too slow")
+    try:
+        execute_command({"type": "workflow", "id": "wf"}, setup_manager())
+    except CommandError as exc:
+        assert "too slow" in str(exc)
+    else:
+        raise AssertionError("Expected CommandError")
+
+
+class SleepSkill(BaseSkill):
+    name = "sleep"
+
+    def execute(self, seconds: float, value: object = None) -> object:  # type: ignore[override]
+        time.sleep(seconds)
+        return value
+
+
+class FailSkill(BaseSkill):
+    name = "fail"
+
+    def execute(self) -> None:  # type: ignore[override]
+        raise RuntimeError("boom")
+
+
+def plan_manager() -> PluginManager:
+    pm = PluginManager()
+    pm.skills = [SleepSkill(), FailSkill(), TestSkill()]
+    return pm
+
+
+def test_plan_runs_independent_steps_concurrently() -> None:
+    steps = [
+        {"step": "a", "type": "skill", "name": "sleep", "args": [0.2, "A"]},
+        {"step": "b", "type": "skill", "name": "sleep", "args": [0.2, "B"]},
+    ]
+    start = time.monotonic()
+    result = execute_command({"type": "plan", "steps": steps}, plan_manager())
+
+    assert time.monotonic() - start < 0.35
+    assert isinstance(result, PlanResult) and result.ok
+    assert str(result) == "a: A\nb: B"
+    assert all(step.seconds >= 0.2 for step in result.steps.values())
+
+
+def test_plan_passes_results_to_later_steps() -> None:
+    order: list[str] = []
+    pm = plan_manager()
+    pm.skills[0].execute = lambda seconds, value=None: order.append(value) or value
+    result = execute_plan(
+        [
+            {"step": "late", "type": "skill", "name": "sleep", "args": [0, "$early"]},
+            {"step": "early", "type": "skill", "name": "sleep", "args": [0, "x"]},
+            {"type": "skill", "name": "test", "after": ["late"]},
+        ],
+        pm,
+    )
+
+    assert order == ["x", "x"]
+    assert list(result.steps) == ["late", "early", "3"]
+    assert result.steps["3"].value == "executed"
+
+
+@patch("milo_core.commands.trigger_workflow")
+def test_plan_isolates_failures(mock_trigger) -> None:
+    mock_trigger.return_value = MagicMock(ok=True)
+    result = execute_plan(
+        {
+            "type": "plan",
+            "steps": [
+                {"step": "bad", "type": "skill", "name": "fail"},
+                {"step": "after_bad", "type": "skill", "name": "test", "after": "bad"},
+                {"step": "good", "type": "workflow", "id": "wf"},
+            ],
+        },
+        plan_manager(),
+    )
+
+    assert not result.ok
+    assert result.steps["bad"].error == "RuntimeError: boom"
+    assert result.steps["after_bad"].error == "skipped because bad failed"
+    assert result.steps["good"].ok
+    mock_trigger.assert_called_once_with("wf", None)
+
+
+def test_plan_step_timeout_does_not_hold_up_other_steps() -> None:
+    release = threading.Event()
+    pm = plan_manager()
+    pm.skills[1].execute = lambda: release.wait(5)
+    start = time.monotonic()
+    result = execute_plan(
+        [
+            {"step": "stuck", "type": "skill", "name": "fail"},
+            {"step": "quick", "type": "skill", "name": "test"},
+        ],
+        pm,
+        step_timeout=lambda command: 0.1 if command["name"] == "fail" else None,
+    )
+    release.set()
+
+    assert time.monotonic() - start < 1
+    assert result.steps["stuck"].error == "did not finish within 0.1 seconds"
+    assert result.steps["quick"].value == "executed"
+
+
+@pytest.mark.parametrize(
+    "plan, message",
+    [
+        ({"type": "plan", "steps": []}, "non-empty"),
+        ([{"type": "plan", "steps": []}], "must be a skill or workflow"),
+        ([{"type": "skill", "name": "test", "after": ["nope"]}], "unknown step"),
+        (
+            [
+                {"step": "a", "type": "skill", "name": "test", "after": ["b"]},
+                {"step": "b", "type": "skill", "name": "test", "args": ["$a"]},
+            ],
+            "cycle",
+        ),
+    ],
+)
+def test_malformed_plans(plan, message) -> None:
+    with pytest.raises(CommandError, match=message):
+        execute_command(plan, plan_manager())
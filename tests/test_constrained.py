@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from milo_core.commands import command_schema
+from milo_core.llm.constrained import (
+    COMPLETE,
+    INVALID,
+    PARTIAL,
+    CommandLogitsProcessor,
+    ConstraintStats,
+    prefix_status,
+)
+from milo_core.plugin_manager import PluginManager
+from plugins.base import BaseSkill
+
+
+class SearchSkill(BaseSkill):
+    name = "search"
+
+    def execute(self, query: str, num_results: int = 5) -> str:  # type: ignore[override]
+        return query
+
+
+@pytest.fixture
+def schema():
+    pm = PluginManager()
+    pm.skills = [SearchSkill()]
+    return command_schema(pm)
+
+
+@pytest.mark.parametrize(
+    "text, status",
+    [
+        ("", PARTIAL),
+        ('{"type": "sk', PARTIAL),
+        ('{"name": "sea', PARTIAL),
+        ('{"type": "skill", "name": "search"}', COMPLETE),
+        ('{"type": "skill", "name": "serch"', INVALID),
+        ('{"type": "skill", "name": "search", "args": ["q", 3]}', COMPLETE),
+        ('{"type": "skill", "name": "search", "args": ["q", 3.5', INVALID),
+        ('{"type": "skill", "name": "search", "args": ["q", 3, 4', INVALID),
+        ('{"type": "skill", "name": "search", "kwargs": {"query": "a\\"b"}}', COMPLETE),
+        ('{"type": "skill", "name": "search", "kwargs": {"limit"', INVALID),
+        ('{"type": "workflow", "id": "w", "payload": {"a": [1, null]}}', COMPLETE),
+        ('{"type": "workflow"}', INVALID),
+        ('{"type": "workflow", "id": "w", "payload": {},', INVALID),
+        ('{"type": "skill", "name": "search"} trailing', INVALID),
+        ('{"type": "plan", "steps": [{"step": "s", "type": "skill"', PARTIAL),
+        (
+            '{"type": "plan", "steps": [{"step": "s", "type": "skill", '
+            '"name": "search", "args": ["q"]}, {"type": "workflow", "id": "w", '
+            '"payload": {"r": "$s"}, "after": ["s"]}]}',
+            COMPLETE,
+        ),
+        ('{"type": "plan", "steps": []}', INVALID),
+    ],
+)
+def test_prefix_status(schema, text, status) -> None:
+    assert prefix_status(schema, text) == status
+
+
+class CharTokenizer:
+    """One token per character; the last id is end-of-sequence."""
+
+    def __init__(self, alphabet: str) -> None:
+        self.alphabet = alphabet
+        self.eos_token_id = len(alphabet)
+
+    def decode(self, ids, skip_special_tokens=True) -> str:
+        return "".join(self.alphabet[i] for i in ids if i < len(self.alphabet))
+
+    def encode(self, text: str) -> list[int]:
+        return [self.alphabet.index(c) for c in text]
+
+
+def greedy(processor, tokenizer, preferred: str, max_steps: int = 200) -> str:
+    """Decode greedily from a "model" that always prefers ``preferred``."""
+    torch = pytest.importorskip("torch")
+    ids: list[int] = []
+    vocab = len(tokenizer.alphabet) + 1
+    for step in range(max_steps):
+        scores = torch.zeros((1, vocab))
+        if step < len(preferred):
+            scores[0, tokenizer.encode(preferred[step])] = 10.0
+        scores[0, tokenizer.eos_token_id] = 1.0 if step >= len(preferred) else -1.0
+        scores = processor(torch.tensor([ids or [0]])[:, : len(ids)], scores)
+        token_id = int(scores[0].argmax())
+        if token_id == tokenizer.eos_token_id:
+            break
+        ids.append(token_id)
+    return tokenizer.decode(ids)
+
+
+ALPHABET = ' {}[]":,0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def test_processor_repairs_malformed_command(schema) -> None:
+    tokenizer = CharTokenizer(ALPHABET)
+    stats = ConstraintStats()
+    processor = CommandLogitsProcessor(
+        tokenizer, schema, 0, [tokenizer.eos_token_id], stats=stats
+    )
+
+    text = greedy(processor, tokenizer, '{"type": "skill", "name": "serch"} and')
+
+    command = json.loads(text)
+    assert command["type"] == "skill" and command["name"] == "search"
+    assert stats.commands == 1
+    assert stats.corrected == 1
+    assert stats.corrections >= 1
+    assert stats.saved_tokens == stats.tokens
+
+
+def test_processor_leaves_plain_text_and_valid_commands_alone(schema) -> None:
+    tokenizer = CharTokenizer(ALPHABET)
+    stats = ConstraintStats()
+    processor = CommandLogitsProcessor(
+        tokenizer, schema, 0, [tokenizer.eos_token_id], stats=stats
+    )
+    assert greedy(processor, tokenizer, "hello there") == "hello there"
+    assert stats.commands == 0
+
+    valid = '{"type": "workflow", "id": "abc"}'
+    processor = CommandLogitsProcessor(
+        tokenizer, schema, 0, [tokenizer.eos_token_id], stats=stats
+    )
+    # The model would keep talking after the object; EOS is forced instead.
+    assert greedy(processor, tokenizer, valid + " more") == valid
+    assert stats.commands == 1
+    assert stats.corrected == 0
+    assert stats.saved_tokens == 0
+
+
+def test_processor_decodes_each_token_once(schema) -> None:
+    tokenizer = CharTokenizer(ALPHABET)
+    decoded = []
+    decode = tokenizer.decode
+    tokenizer.decode = lambda ids, **kwargs: decoded.append(ids) or decode(ids)
+    pieces: dict[int, str] = {}
+    command = '{"type": "skill", "name": "search"}'
+    for _ in range(2):
+        processor = CommandLogitsProcessor(
+            tokenizer, schema, 0, [tokenizer.eos_token_id], token_pieces=pieces
+        )
+        assert greedy(processor, tokenizer, command) == command
+
+    # Tokens are decoded after the anchor token, each one a single time.
+    tokens = [ids[1] for ids in decoded if len(ids) == 2]
+    assert tokens and len(tokens) == len(set(tokens))
+    assert pieces[ALPHABET.index("{")] == "{"
+
+
+def test_processor_with_generate() -> None:
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    tokenizer = CharTokenizer(ALPHABET)
+    config = transformers.GPT2Config(
+        vocab_size=len(ALPHABET) + 1, n_positions=256, n_embd=32, n_layer=2, n_head=2
+    )
+    lm = transformers.GPT2LMHeadModel(config).eval()
+    lm.generation_config.eos_token_id = tokenizer.eos_token_id
+    lm.generation_config.pad_token_id = tokenizer.eos_token_id
+    schema = {
+        "type": "object",
+        "properties": {"type": {"const": "workflow"}, "id": {"enum": ["a", "bc"]}},
+        "required": ["type", "id"],
+        "additionalProperties": False,
+    }
+    # The prompt ends with "{", which the processor counts as the reply's
+    # first token, so the random model is constrained from the start.
+    prompt = torch.tensor([tokenizer.encode("go {")])
+    processor = CommandLogitsProcessor(
+        tokenizer, schema, prompt.shape[-1] - 1, [tokenizer.eos_token_id]
+    )
+    output = lm.generate(
+        prompt,
+        attention_mask=torch.ones_like(prompt),
+        max_new_tokens=60,
+        do_sample=False,
+        logits_processor=transformers.LogitsProcessorList([processor]),
+    )
+    text = "{" + tokenizer.decode(output[0, prompt.shape[-1] :].tolist())
+    assert json.loads(text)["type"] == "workflow"
+    assert prefix_status(schema, text) == COMPLETE
@@ -8,22 +8,7 @@ import pytest
 from milo_core.voice import conversation
 
 
-class DummyThread:
-    def __init__(self, target, daemon=False):
-        self.target = target
-
-    def start(self) -> None:  # pragma: no cover - thread logic mocked
-        pass
-
-    def join(self) -> None:  # pragma: no cover - thread logic mocked
-        pass
-
-
 def test_converse_handles_interruption(monkeypatch: pytest.MonkeyPatch) -> None:
-    stop_event = threading.Event()
-    monkeypatch.setattr(conversation.threading, "Event", lambda: stop_event)
-    monkeypatch.setattr(conversation.threading, "Thread", DummyThread)
-
     session_memory = MagicMock()
     monkeypatch.setattr(
         conversation, "ShortTermMemory", MagicMock(return_value=session_memory)
@@ -32,12 +17,16 @@ def test_converse_handles_interruption(monkeypatch: pytest.MonkeyPatch) -> None:
     model = MagicMock()
     model.stream_response.return_value = iter(["He", "llo, ", "world"])
 
-    calls = ["hello", "raise"]
+    first_token_spoken = threading.Event()
+    stopped = threading.Event()
+    calls = ["hello", "interrupt", "raise"]
 
     def listen_side_effect() -> str:
         value = calls.pop(0)
         if value == "raise":
             raise KeyboardInterrupt
+        if value == "interrupt":
+            first_token_spoken.wait(5)
         return value
 
     stt = MagicMock()
@@ -46,15 +35,14 @@ def test_converse_handles_interruption(monkeypatch: pytest.MonkeyPatch) -> None:
     consumed: list[str] = []
     tts = MagicMock()
 
-    def speak(tokens: list[str]) -> None:
-        for i, token in enumerate(tokens):
+    def speak(tokens) -> None:
+        for token in tokens:
             consumed.append(token)
-            if i == 0:
-                stop_event.set()
-                tts.stop()
-                break
+            first_token_spoken.set()
+            stopped.wait(5)
 
     tts.speak.side_effect = speak
+    tts.stop.side_effect = lambda: stopped.set()
 
     memory_manager = MagicMock()
 
@@ -67,3 +55,25 @@ def test_converse_handles_interruption(monkeypatch: pytest.MonkeyPatch) -> None:
         c for c in session_memory.add_message.call_args_list if c.args[0] == "assistant"
     ]
     assert any("<interrupted_thought>" in c.args[1] for c in assistant_calls)
+
+
+def test_converse_discards_speculation_for_empty_utterances(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    speculator = MagicMock()
+    monkeypatch.setattr(conversation, "Speculator", MagicMock(return_value=speculator))
+    calls = ["", "raise"]
+
+    def listen_side_effect() -> str:
+        if calls.pop(0) == "raise":
+            raise KeyboardInterrupt
+        return ""
+
+    stt = MagicMock()
+    stt.listen.side_effect = listen_side_effect
+
+    with pytest.raises(KeyboardInterrupt):
+        conversation.converse(MagicMock(), stt, MagicMock(), MagicMock(), MagicMock())
+
+    speculator.discard.assert_called_once()
+    speculator.take.assert_not_called()
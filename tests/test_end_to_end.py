@@ -36,13 +36,14 @@ def test_end_to_end_skill_execution() -> None:
         tts_arg.speak([result])
 
     with (
-        patch("milo_core.main.HuggingFaceModel", return_value=model),
-        patch("milo_core.main.WhisperSTT", return_value=stt),
-        patch("milo_core.main.PiperTTS", return_value=tts),
-        patch("milo_core.main.run_gui"),
-        patch("milo_core.main.PluginManager", return_value=plugin_manager),
-        patch("milo_core.main.MemoryManager", return_value=memory_manager),
-        patch("milo_core.main.converse", side_effect=fake_converse),
+        patch("milo_core.llm.HuggingFaceModel", return_value=model),
+        patch("milo_core.voice.WhisperSTT", return_value=stt),
+        patch("milo_core.voice.PiperTTS", return_value=tts),
+        patch("milo_core.gui.run_gui"),
+        patch("milo_core.plugin_manager.PluginManager", return_value=plugin_manager),
+        patch("milo_core.memory_manager.MemoryManager", return_value=memory_manager),
+        patch("milo_core.memory_manager.load_embedding_model"),
+        patch("milo_core.voice.converse", side_effect=fake_converse),
         patch(
             "milo_core.commands.execute_command", wraps=commands.execute_command
         ) as exec_mock,
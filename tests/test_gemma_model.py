@@ -28,3 +28,82 @@ def test_hf_stream(mock_tokenizer_cls, mock_model_cls, mock_streamer) -> None:
     history = [Message(role="user", content="hi")]
     tokens = list(model.stream_response(history))
     assert tokens == ["a", "b"]
+
+
+@patch("milo_core.llm.huggingface.TextIteratorStreamer", return_value=iter(["a"]))
+@patch("milo_core.llm.huggingface.AutoModelForCausalLM")
+@patch("milo_core.llm.huggingface.AutoTokenizer")
+def test_hf_prefill_reuses_prefix_cache(
+    mock_tokenizer_cls, mock_model_cls, mock_streamer
+) -> None:
+    import torch
+
+    prompts = {"hi": [[1, 2, 3]], "hi|there": [[1, 2, 3, 4, 5]], "bye": [[9, 9]]}
+
+    class TokenOut(dict):
+        def to(self, device):
+            return self
+
+    mock_tokenizer = MagicMock()
+    mock_tokenizer.apply_chat_template.side_effect = lambda messages, **k: "|".join(
+        m["content"] for m in messages
+    )
+    mock_tokenizer.side_effect = lambda prompt, **k: TokenOut(
+        {"input_ids": torch.tensor(prompts[prompt])}
+    )
+    mock_tokenizer_cls.from_pretrained.return_value = mock_tokenizer
+
+    mock_model = MagicMock()
+    cache = MagicMock()
+    mock_model.return_value.past_key_values = cache
+    mock_model_cls.from_pretrained.return_value = mock_model
+
+    model = HuggingFaceModel("model")
+    prefix = [Message(role="user", content="hi")]
+    model.prefill(prefix)
+    model.prefill(prefix)  # unchanged prefix is not recomputed
+    assert mock_model.call_count == 1
+
+    # The cache is handed to generate() without a copy, then cropped back to
+    # the prefix so the next reply can reuse it.
+    for _ in range(2):
+        mock_streamer.return_value = iter(["a"])
+        list(model.stream_response(prefix + [Message(role="user", content="there")]))
+        assert mock_model.generate.call_args.kwargs["past_key_values"] is cache
+    assert cache.crop.call_args_list == [((3,),), ((3,),)]
+
+    mock_streamer.return_value = iter(["b"])
+    list(model.stream_response([Message(role="user", content="bye")]))
+    assert "past_key_values" not in mock_model.generate.call_args.kwargs
+    assert model.prefill_stats.hits == 2
+    assert model.prefill_stats.misses == 1
+
+
+@patch("milo_core.llm.huggingface.TextIteratorStreamer", return_value=iter(["a", "b"]))
+@patch("milo_core.llm.huggingface.AutoModelForCausalLM")
+@patch("milo_core.llm.huggingface.AutoTokenizer")
+def test_hf_stream_stops_generation_when_closed(
+    mock_tokenizer_cls, mock_model_cls, mock_streamer
+) -> None:
+    import torch
+
+    class TokenOut(dict):
+        def to(self, device):
+            return self
+
+    mock_tokenizer = MagicMock()
+    mock_tokenizer.apply_chat_template.return_value = "prompt"
+    mock_tokenizer.return_value = TokenOut({"input_ids": torch.tensor([[0]])})
+    mock_tokenizer_cls.from_pretrained.return_value = mock_tokenizer
+    mock_model = MagicMock()
+    mock_model_cls.from_pretrained.return_value = mock_model
+
+    model = HuggingFaceModel("model")
+    stream = model.stream_response([Message(role="user", content="hi")])
+    assert next(stream) == "a"
+    (criterion,) = mock_model.generate.call_args.kwargs["stopping_criteria"]
+    input_ids = torch.zeros((1, 3), dtype=torch.long)
+    assert not criterion(input_ids, None).any()
+
+    stream.close()
+    assert criterion(input_ids, None).all()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import time
+from concurrent.futures import Future
 from unittest.mock import MagicMock
 
 import pytest
@@ -8,14 +10,6 @@ from milo_core.gui import app
 from milo_core.gui.app import run_gui
 
 
-class DummyThread:
-    def __init__(self, target, daemon=False):
-        self.target = target
-
-    def start(self) -> None:
-        self.target()
-
-
 class DummyGUI:
     def __init__(self, on_end):
         DummyGUI.instance = self
@@ -23,6 +17,8 @@ class DummyGUI:
         self.messages: list[tuple[str, str]] = []
         self._stream_author = ""
         self._buffer = ""
+        self._scheduled: list = []
+        self.loading = False
 
     def set_send_callback(self, cb):
         self.cb = cb
@@ -41,25 +37,33 @@ class DummyGUI:
         self.messages.append((self._stream_author, self._buffer))
 
     def set_loading(self, loading):
-        pass
+        self.loading = loading
 
     def schedule(self, cb, delay=0):
-        cb()
+        self._scheduled.append(cb)
+
+    def send_and_wait(self, text):
+        self.cb(text)
+        deadline = time.monotonic() + 5
+        while self.loading and time.monotonic() < deadline:
+            pending, self._scheduled = self._scheduled, []
+            for cb in pending:
+                cb()
+            time.sleep(0.01)
 
     def mainloop(self):
-        self.cb("hello")
+        self.send_and_wait("hello")
         self.on_end()
 
 
 class DummyGoodbyeGUI(DummyGUI):
     def mainloop(self):
-        self.cb("goodbye")
+        self.send_and_wait("goodbye")
         self.on_end()
 
 
 def test_run_gui_basic_flow(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(app, "MiloGUI", DummyGUI)
-    monkeypatch.setattr(app, "threading", MagicMock(Thread=DummyThread))
     model = MagicMock()
     model.stream_response.return_value = iter(["hi"])
     memory = MagicMock()
@@ -73,7 +77,6 @@ def test_run_gui_basic_flow(monkeypatch: pytest.MonkeyPatch) -> None:
 
 def test_run_gui_summarizes_on_goodbye(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(app, "MiloGUI", DummyGoodbyeGUI)
-    monkeypatch.setattr(app, "threading", MagicMock(Thread=DummyThread))
     model = MagicMock()
     model.stream_response.return_value = iter(["bye"])
     memory = MagicMock()
@@ -81,3 +84,55 @@ def test_run_gui_summarizes_on_goodbye(monkeypatch: pytest.MonkeyPatch) -> None:
     memory.consolidate_memories.return_value = None
     run_gui(model, None, None, memory, MagicMock())
     memory.summarize_and_store_session.assert_called_once()
+
+
+class DummyWarmingGUI(DummyGUI):
+    memory_future: Future
+
+    def __init__(self, on_end):
+        super().__init__(on_end)
+        self.warming: list[tuple[list[str], bool]] = []
+
+    def set_warming_up(self, pending, ready):
+        self.warming.append((pending, ready))
+
+    def mainloop(self):
+        self.memory_future.set_result(self.memory)
+        self.send_and_wait("hello")
+        self.on_end()
+
+
+def test_run_gui_opens_before_components_are_ready(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(app, "MiloGUI", DummyWarmingGUI)
+    model = MagicMock()
+    model.stream_response.return_value = iter(["hi"])
+    memory = MagicMock()
+    memory.retrieve_relevant_memories.return_value = []
+    DummyWarmingGUI.memory = memory
+    DummyWarmingGUI.memory_future = Future()
+
+    run_gui(model, Future(), None, DummyWarmingGUI.memory_future, MagicMock())
+
+    gui = DummyWarmingGUI.instance
+    assert gui.warming[0] == (["speech recognition", "memory"], False)
+    assert (["speech recognition"], True) in gui.warming
+    assert ("You", "hello") in gui.messages
+    assert ("M.I.L.O", "hi") in gui.messages
+    memory.consolidate_memories.assert_called_once()
+
+
+def test_pump_records_main_loop_stalls(monkeypatch: pytest.MonkeyPatch) -> None:
+    gui = DummyGUI(lambda: None)
+    output = app.GUIOutput(gui)
+    clock = iter([0.0, 0.001, 0.051, 0.052, 0.152, 0.153])
+    monkeypatch.setattr(app.time, "perf_counter", lambda: next(clock))
+
+    output.pump()  # first run; schedules the next one for t=0.051
+    output.pump()  # on time
+    output.post(lambda: None)
+    output.pump()  # 50 ms late
+
+    assert len(output.stalls) == 1
+    assert output.stalls[0] == pytest.approx(0.05)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# ``import milo_core.main`` took several seconds when it pulled in every
+# backend; it now takes a few tens of milliseconds.
+IMPORT_BUDGET_SECONDS = 0.5
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "chromadb",
+    "sentence_transformers",
+    "sounddevice",
+    "webrtcvad",
+    "tkinter",
+    "faster_whisper",
+    "piper",
+    "aiohttp",
+]
+
+
+def _import_in_fresh_interpreter(*modules: str) -> dict:
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {list(modules)!r}:\n"
+        "    __import__(name)\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'heavy': heavy}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_importing_milo_core_skips_heavy_backends() -> None:
+    result = _import_in_fresh_interpreter(
+        "milo_core",
+        "milo_core.main",
+        "milo_core.llm",
+        "milo_core.voice",
+        "milo_core.gui",
+        "milo_core.pipeline",
+    )
+    assert result["heavy"] == []
+
+
+def test_import_time_budget() -> None:
+    # Best of three to keep a busy machine from failing the check.
+    seconds = min(
+        _import_in_fresh_interpreter("milo_core", "milo_core.main")["seconds"]
+        for _ in range(3)
+    )
+    assert seconds < IMPORT_BUDGET_SECONDS
+
+
+def test_lazy_attributes_resolve() -> None:
+    import milo_core
+    from milo_core import llm
+
+    assert callable(milo_core.execute_command)
+    assert llm.HuggingFaceModel.__name__ == "HuggingFaceModel"
+    assert "HuggingFaceModel" in llm.__all__
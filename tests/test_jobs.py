@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Callable
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from milo_core.jobs import DONE, FAILED, Job, JobQueue
+from milo_core.memory import ShortTermMemory
+from milo_core.pipeline import TurnOutput, TurnPipeline
+
+
+def response(status: int, body: Any) -> requests.Response:
+    reply = requests.Response()
+    reply.status_code = status
+    reply._content = json.dumps(body).encode()
+    return reply
+
+
+class StubTrigger:
+    """Stand-in for ``trigger_workflow`` answering with ``statuses`` in order.
+
+    Calls block until ``release`` is set.
+    """
+
+    def __init__(self, statuses: list[int] | None = None) -> None:
+        self.statuses = list(statuses or [])
+        self.calls: list[dict[str, Any]] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(
+        self, workflow_id: str, payload: dict[str, Any], timeout: float | None
+    ) -> requests.Response:
+        self.calls.append(payload)
+        self.release.wait()
+        status = self.statuses.pop(0) if self.statuses else 200
+        return response(status, {"workflow": workflow_id, "n": len(self.calls)})
+
+
+class RecordingOutput(TurnOutput):
+    def __init__(self) -> None:
+        self.commands: list[str] = []
+        self.reported = asyncio.Event()
+
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        async for _ in tokens:
+            pass
+
+    async def command_result(self, result: str) -> None:
+        self.commands.append(result)
+        if result.startswith("Workflow"):
+            self.reported.set()
+
+
+@pytest.fixture
+def trigger():
+    trigger = StubTrigger()
+    yield trigger
+    trigger.release.set()
+
+
+def listen(queue: JobQueue) -> Callable[..., list[Job]]:
+    """Return a function that waits for jobs to finish and takes them."""
+    finished = threading.Semaphore(0)
+    queue.add_listener(lambda job: finished.release())
+
+    def wait_finished(owner: str, count: int = 1) -> list[Job]:
+        for _ in range(count):
+            assert finished.acquire(timeout=5)
+        return queue.take_finished(owner)
+
+    return wait_finished
+
+
+def test_submit_returns_before_the_workflow_finishes(trigger) -> None:
+    trigger.release.clear()
+    queue = JobQueue(trigger=trigger)
+    wait_finished = listen(queue)
+
+    job = queue.submit({"type": "workflow", "id": "gmail_read"}, owner="voice")
+
+    assert queue.get(job.id).status in ("queued", "running")
+    trigger.release.set()
+    (finished,) = wait_finished("voice")
+    assert (finished.id, finished.status) == (job.id, DONE)
+    assert finished.result == {"workflow": "gmail_read", "n": 1}
+    assert finished.describe().startswith("Workflow gmail_read finished:")
+    assert queue.take_finished("voice") == []
+    queue.close()
+
+
+def test_server_errors_are_retried_with_backoff(trigger) -> None:
+    trigger.statuses = [503, 502]
+    queue = JobQueue(trigger=trigger, max_attempts=3, retry_delay=0.01)
+    wait_finished = listen(queue)
+
+    flaky = queue.enqueue("flaky", {"n": 1}, owner="gui")
+    (job,) = wait_finished("gui")
+    assert (job.id, job.status, job.attempts) == (flaky.id, DONE, 3)
+
+    missing = queue.enqueue("missing", None, owner="gui")
+    trigger.statuses = [404]
+    (job,) = wait_finished("gui")
+    assert (job.id, job.status, job.attempts) == (missing.id, FAILED, 1)
+    assert job.describe() == "Workflow missing failed: status 404"
+    queue.close()
+
+
+def test_jobs_are_reported_to_their_owner_only(trigger) -> None:
+    queue = JobQueue(trigger=trigger)
+    wait_finished = listen(queue)
+    queue.enqueue("a", None, owner="session-a")
+    queue.enqueue("b", None, owner="session-b")
+    wait_finished("nobody", count=2)
+
+    assert [job.workflow for job in queue.take_finished("session-b")] == ["b"]
+    assert [job.workflow for job in queue.take_finished("session-a")] == ["a"]
+    queue.close()
+
+
+def test_interrupted_jobs_run_again_after_restart(tmp_path, trigger) -> None:
+    path = tmp_path / "jobs.sqlite3"
+    trigger.release.clear()
+    queue = JobQueue(path, trigger=trigger)
+    job = queue.enqueue("gmail_read", {"query": "label:inbox"}, owner="voice")
+    queue.close(timeout=0.1)
+
+    trigger.release.clear()
+    restarted = JobQueue(path, trigger=trigger)
+    wait_finished = listen(restarted)
+    trigger.release.set()
+    (finished,) = wait_finished("voice")
+
+    assert (finished.id, finished.status) == (job.id, DONE)
+    assert finished.payload == {"query": "label:inbox"}
+    restarted.close()
+
+
+def test_invalid_commands_are_rejected(trigger) -> None:
+    from milo_core.commands import CommandError
+
+    queue = JobQueue(trigger=trigger, workers=0)
+    with pytest.raises(CommandError):
+        queue.submit({"type": "workflow"}, owner="voice")
+    with pytest.raises(CommandError):
+        queue.submit({"type": "skill", "name": "test"}, owner="voice")
+    queue.close()
+
+
+def test_pipeline_queues_workflows_and_announces_them(trigger) -> None:
+    trigger.release.clear()
+    queue = JobQueue(trigger=trigger)
+    command = {"type": "workflow", "id": "gmail_read"}
+    model = MagicMock()
+    model.stream_response.side_effect = lambda history: iter([json.dumps(command)])
+    pipeline = TurnPipeline(
+        model,
+        MagicMock(),
+        MagicMock(),
+        session_memory=ShortTermMemory(),
+        source="voice",
+        jobs=queue,
+    )
+    output = RecordingOutput()
+
+    async def main() -> None:
+        announcer = asyncio.create_task(pipeline.announce_jobs(output))
+        await pipeline.run_turn("check my mail", output)
+        assert output.commands == [
+            "Started workflow gmail_read; I'll report back when it finishes."
+        ]
+        trigger.release.set()
+        await asyncio.wait_for(output.reported.wait(), 5)
+        announcer.cancel()
+
+    asyncio.run(main())
+    pipeline.close()
+    queue.close()
+
+    assert output.commands[-1].startswith("Workflow gmail_read finished:")
+    messages = pipeline.session_memory.get_messages()
+    assert messages[-1].content == output.commands[-1]
+
+
+def test_default_trigger_leaves_retries_to_the_queue(monkeypatch) -> None:
+    from milo_core import workflows
+
+    clients = []
+
+    def trigger(client, workflow_id, payload=None, timeout=None):
+        clients.append(client)
+        return response(503, {})
+
+    monkeypatch.setattr(workflows.WorkflowClient, "trigger", trigger)
+    workflows.configure(retries=2)
+    queue = JobQueue(max_attempts=2, retry_delay=0.01)
+    wait_finished = listen(queue)
+    try:
+        queue.enqueue("flaky", None, owner="voice")
+        (job,) = wait_finished("voice")
+    finally:
+        queue.close()
+        workflows.configure()
+
+    assert (job.status, job.attempts) == (FAILED, 2)
+    assert [client.retries for client in clients] == [0, 0]
@@ -5,16 +5,18 @@ from unittest.mock import patch
 from milo_core.main import main
 
 
-@patch("milo_core.main.converse")
-@patch("milo_core.main.run_gui")
-@patch("milo_core.main.HuggingFaceModel")
-@patch("milo_core.main.WhisperSTT")
-@patch("milo_core.main.PiperTTS")
-@patch("milo_core.main.PluginManager")
-@patch("milo_core.main.MemoryManager")
+@patch("milo_core.voice.converse")
+@patch("milo_core.gui.run_gui")
+@patch("milo_core.llm.HuggingFaceModel")
+@patch("milo_core.voice.WhisperSTT")
+@patch("milo_core.voice.PiperTTS")
+@patch("milo_core.plugin_manager.PluginManager")
+@patch("milo_core.memory_manager.MemoryManager")
+@patch("milo_core.memory_manager.load_embedding_model")
 @patch("milo_core.main.load_config")
 def test_main_starts_conversation(
     mock_load,
+    mock_embedder,
     mock_memory,
     mock_pm,
     mock_tts,
@@ -22,6 +24,7 @@ def test_main_starts_conversation(
     mock_model,
     mock_run_gui,
     mock_converse,
+    capsys,
 ) -> None:
     mock_load.return_value = {
         "llm": {"model": "my-model"},
@@ -31,10 +34,16 @@ def test_main_starts_conversation(
         "memory": {},
     }
     main()
+    out = capsys.readouterr().out
     mock_model.assert_called_with("my-model")
     mock_model.return_value.load_model.assert_called_once()
     mock_pm.return_value.discover_plugins.assert_called_once()
-    mock_memory.assert_called_with(mock_model.return_value, db_path="./milo_memory_db")
+    mock_memory.assert_called_with(
+        mock_model.return_value,
+        db_path="./milo_memory_db",
+        embedding_model=mock_embedder.return_value,
+    )
+    mock_memory.return_value.consolidate_memories.assert_called_once()
     mock_converse.assert_called_once_with(
         mock_model.return_value,
         mock_stt.return_value,
@@ -43,3 +52,52 @@ def test_main_starts_conversation(
         mock_pm.return_value,
     )
     mock_run_gui.assert_not_called()
+    assert "Startup took" in out
+    for component in ("llm", "stt", "tts", "embeddings", "memory", "plugins"):
+        assert component in out
+
+
+@patch("milo_core.voice.converse")
+@patch("milo_core.llm.HuggingFaceModel")
+@patch("milo_core.voice.WhisperSTT")
+@patch("milo_core.voice.PiperTTS")
+@patch("milo_core.plugin_manager.PluginManager")
+@patch("milo_core.memory_manager.MemoryManager")
+@patch("milo_core.memory_manager.load_embedding_model")
+@patch("milo_core.main.load_config")
+def test_main_constrains_commands_when_enabled(
+    mock_load, mock_embedder, mock_memory, mock_pm, mock_tts, mock_stt, mock_model, _
+) -> None:
+    mock_load.return_value = {
+        "llm": {"model": "my-model", "constrained_commands": True},
+        "gui": {"enabled": False},
+    }
+    mock_pm.return_value.skills = []
+    main()
+    schema = mock_model.return_value.command_schema
+    types = [option["properties"]["type"] for option in schema["anyOf"]]
+    assert types == [{"const": "workflow"}, {"const": "plan"}]
+
+
+def test_cli_trace_report(tmp_path, capsys) -> None:
+    from milo_core import tracing
+    from milo_core.main import cli
+
+    tracer = tracing.Tracer(tmp_path / "trace.jsonl")
+    with tracer.turn("voice"):
+        tracer.record("whisper_decode", 0.2)
+    tracer.close()
+
+    cli(["trace", "report", "--path", str(tmp_path / "trace.jsonl")])
+
+    out = capsys.readouterr().out
+    assert "1 turns across 1 sessions" in out
+    assert "whisper_decode" in out
+
+
+@patch("milo_core.main.main")
+def test_cli_passes_config_path(mock_main) -> None:
+    from milo_core.main import cli
+
+    cli(["custom.yaml"])
+    mock_main.assert_called_once_with("custom.yaml")
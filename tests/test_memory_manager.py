@@ -12,9 +12,7 @@ def setup_manager() -> tuple[MemoryManager, MagicMock, MagicMock]:
     mock_collection = MagicMock()
     mock_client = MagicMock()
     mock_client.get_or_create_collection.return_value = mock_collection
-    with patch(
-        "milo_core.memory_manager.chromadb.PersistentClient", return_value=mock_client
-    ):
+    with patch("chromadb.PersistentClient", return_value=mock_client):
         with patch("sentence_transformers.SentenceTransformer") as mock_model:
             mock_model.return_value.encode.return_value = [0.1, 0.2]
             manager = MemoryManager(mock_llm, db_path="./milo_memory_db")
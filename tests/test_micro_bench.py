@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from milo_core.bench import micro
+
+
+def test_measure_reports_per_operation_time() -> None:
+    calls = []
+    case = micro.Case("noop", lambda: calls.append(1), ops=10)
+
+    stats = micro.measure(case, repeat=3, min_time=0.001)
+
+    assert stats["loops"] * 3 <= len(calls) <= stats["loops"] * 4 + 100
+    assert stats["ops"] == 10
+    assert stats["min_us"] <= stats["p50_us"]
+
+
+def test_run_selected_groups_and_skips() -> None:
+    @micro.benchmark("needs_hardware")
+    def unavailable(options):
+        raise micro.Skip("no device")
+        yield  # pragma: no cover
+
+    try:
+        result = micro.run(
+            ["commands", "short_term_memory", "needs_hardware"],
+            repeat=2,
+            min_time=0.001,
+        )
+    finally:
+        del micro.BENCHMARKS["needs_hardware"]
+
+    assert {
+        "execute_command.json",
+        "execute_command.dict",
+        "constrained.prefix_status",
+        "short_term_memory.append",
+        "short_term_memory.read_10k",
+    } == set(result["benchmarks"])
+    assert result["skipped"] == {"needs_hardware": "no device"}
+
+
+def test_memory_manager_benchmark_uses_offline_embedder() -> None:
+    options = micro.Options(memory_sizes=[20])
+    result = micro.run(["memory_manager"], options, repeat=2, min_time=0.001)
+
+    assert {
+        "memory_manager.encode[hash]",
+        "memory_manager.query[20]",
+        "memory_manager.store[20]",
+    } == set(result["benchmarks"])
+
+
+def test_compare_and_main_exit_code(tmp_path: Path) -> None:
+    baseline = {"benchmarks": {"a": {"p50_us": 10.0}, "b": {"p50_us": 10.0}}}
+    result = {"benchmarks": {"a": {"p50_us": 12.0}, "b": {"p50_us": 14.0}}}
+    (regression,) = micro.compare(result, baseline, threshold=0.25)
+    assert regression.startswith("b:")
+
+    out = tmp_path / "result.json"
+    assert micro.main(["commands", "--out", str(out), "--min-time", "0.001"]) == 0
+    saved = json.loads(out.read_text())
+    for stats in saved["benchmarks"].values():
+        stats["p50_us"] /= 100
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps(saved))
+    assert (
+        micro.main(
+            ["commands", "--baseline", str(baseline_path), "--min-time", "0.001"]
+        )
+        == 1
+    )
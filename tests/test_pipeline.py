@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator
+from unittest.mock import MagicMock
+
+from milo_core.memory import ShortTermMemory
+from milo_core.pipeline import LoopThread, TurnOutput, TurnPipeline
+
+
+class RecordingOutput(TurnOutput):
+    def __init__(self) -> None:
+        self.rendered: list[str] = []
+        self.commands: list[str] = []
+        self.results = []
+
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        async for token in tokens:
+            self.rendered.append(token)
+
+    async def command_result(self, result: str) -> None:
+        self.commands.append(result)
+
+    async def finish(self, result) -> None:
+        self.results.append(result)
+
+
+def make_pipeline(tokens, plugin_manager=None, **kwargs) -> TurnPipeline:
+    model = MagicMock()
+    model.stream_response.side_effect = lambda history: iter(tokens)
+    memory_manager = MagicMock()
+    memory_manager.retrieve_relevant_memories.return_value = ["likes tea"]
+    return TurnPipeline(
+        model,
+        memory_manager,
+        plugin_manager,
+        session_memory=ShortTermMemory(),
+        **kwargs,
+    )
+
+
+def test_run_turn_streams_and_records_reply() -> None:
+    pipeline = make_pipeline(["Hel", "lo"])
+    output = RecordingOutput()
+
+    result = asyncio.run(pipeline.run_turn("hi", output))
+
+    assert output.rendered == ["Hel", "lo"]
+    assert result.response == "Hello"
+    assert output.results == [result]
+    roles = [m.role for m in pipeline.session_memory.get_messages()]
+    assert roles == ["system", "user", "assistant"]
+
+
+def test_run_turn_executes_json_command(monkeypatch) -> None:
+    calls = []
+    monkeypatch.setattr(
+        "milo_core.pipeline.execute_command",
+        lambda command, pm: calls.append(command) or "done",
+    )
+    command = {"skill": "echo", "args": {}}
+    pipeline = make_pipeline([json.dumps(command)], plugin_manager=MagicMock())
+    output = RecordingOutput()
+
+    result = asyncio.run(pipeline.run_turn("do it", output))
+
+    assert calls == [command]
+    assert result.command_result == "done"
+    assert output.commands == ["done"]
+
+
+def test_plan_steps_are_limited_individually() -> None:
+    from milo_core.plugin_manager import PluginManager
+    from plugins.test_skill import TestSkill
+
+    pm = PluginManager()
+    pm.skills = [TestSkill()]
+    plan = {
+        "type": "plan",
+        "steps": [
+            {"step": "one", "type": "skill", "name": "test"},
+            {"type": "skill", "name": "missing", "after": ["one"]},
+        ],
+    }
+    pipeline = make_pipeline([json.dumps(plan)], plugin_manager=pm)
+    output = RecordingOutput()
+
+    result = asyncio.run(pipeline.run_turn("do both", output))
+    pipeline.close()
+
+    assert pipeline.command_timeout(plan) == 30.0
+    assert result.command_result == "one: executed\n2: failed: Unknown skill: missing"
+    assert output.commands == [result.command_result]
+
+
+def test_command_is_hidden_and_stops_generation(monkeypatch) -> None:
+    calls = []
+    monkeypatch.setattr(
+        "milo_core.pipeline.execute_command",
+        lambda command, pm: calls.append(command) or "done",
+    )
+    produced = []
+
+    def tokens():
+        for token in ['{"type": "skill", ', '"name": "echo"}', " and more", "!"]:
+            produced.append(token)
+            yield token
+
+    pipeline = make_pipeline(tokens(), plugin_manager=MagicMock())
+    output = RecordingOutput()
+
+    result = asyncio.run(pipeline.run_turn("echo", output))
+
+    assert output.rendered == []
+    assert produced == ['{"type": "skill", ', '"name": "echo"}']
+    assert calls == [{"type": "skill", "name": "echo"}]
+    assert result.command == {"type": "skill", "name": "echo"}
+    assert output.commands == ["done"]
+
+
+def test_reply_that_only_looks_like_a_command_is_rendered() -> None:
+    pipeline = make_pipeline(["{braces}", " are fun"], plugin_manager=MagicMock())
+    output = RecordingOutput()
+
+    result = asyncio.run(pipeline.run_turn("hi", output))
+
+    assert "".join(output.rendered) == "{braces} are fun"
+    assert result.command is None
+    assert output.commands == []
+
+
+def test_slow_command_times_out_without_blocking_the_turn(monkeypatch) -> None:
+    import threading
+    import time
+
+    release = threading.Event()
+    monkeypatch.setattr(
+        "milo_core.pipeline.execute_command",
+        lambda command, pm: release.wait(5) and "late",
+    )
+    pipeline = make_pipeline(
+        ['{"type": "skill", "name": "slow"}'], plugin_manager=MagicMock()
+    )
+    pipeline.skill_timeout = 0.05
+    output = RecordingOutput()
+
+    start = time.monotonic()
+    result = asyncio.run(pipeline.run_turn("slow", output))
+
+    assert time.monotonic() - start < 2
+    assert result.command_result == "The command did not finish within 0.05 seconds."
+    release.set()
+    pipeline.close()
+
+
+def test_hung_commands_do_not_hold_up_retrieval(monkeypatch) -> None:
+    import threading
+
+    release = threading.Event()
+    monkeypatch.setattr(
+        "milo_core.pipeline.execute_command",
+        lambda command, pm: release.wait(5) and "late",
+    )
+    pipeline = make_pipeline(
+        ['{"type": "skill", "name": "slow"}'],
+        plugin_manager=MagicMock(),
+        max_workers=1,
+    )
+    pipeline.skill_timeout = 0.05
+
+    async def main() -> None:
+        await pipeline.run_turn("slow", RecordingOutput())
+        # The hung skill still holds the only command thread.
+        await asyncio.wait_for(pipeline.retrieve("hello"), 1)
+
+    asyncio.run(main())
+    release.set()
+    pipeline.close()
+
+
+def test_skill_timeout_attribute_takes_precedence() -> None:
+    from milo_core.plugin_manager import PluginManager
+    from plugins.base import BaseSkill
+
+    class Quick(BaseSkill):
+        name = "quick"
+        timeout = 2.0
+
+        def execute(self, *args, **kwargs):
+            return "ok"
+
+    pm = PluginManager()
+    pm.skills = [Quick()]
+    pipeline = make_pipeline([], plugin_manager=pm)
+
+    assert pipeline.command_timeout({"type": "skill", "name": "quick"}) == 2.0
+    assert pipeline.command_timeout({"type": "workflow", "id": "w"}) == 30.0
+
+
+def test_blocking_work_runs_on_the_pipeline_executor() -> None:
+    import threading
+
+    threads = []
+    pipeline = make_pipeline(["ok"])
+    pipeline.memory_manager.retrieve_relevant_memories.side_effect = lambda text: (
+        threads.append(threading.current_thread().name) or []
+    )
+
+    asyncio.run(pipeline.run_turn("hi", RecordingOutput()))
+    pipeline.close()
+
+    assert threads and threads[0].startswith("milo-pipeline")
+
+
+def test_slow_renderer_applies_backpressure() -> None:
+    produced = []
+
+    def tokens():
+        for i in range(100):
+            produced.append(i)
+            yield str(i)
+
+    class SlowOutput(RecordingOutput):
+        async def render(self, stream: AsyncIterator[str]) -> None:
+            async for token in stream:
+                self.rendered.append(token)
+                if len(self.rendered) == 1:
+                    await asyncio.sleep(0.2)
+                    self.backlog = len(produced) - 1
+
+    pipeline = make_pipeline(tokens())
+    pipeline.queue_size = 4
+    output = SlowOutput()
+
+    asyncio.run(pipeline.run_turn("count", output))
+
+    assert len(output.rendered) == 100
+    assert output.backlog <= pipeline.queue_size + 2
+
+
+def test_interrupt_stops_generation_and_marks_reply() -> None:
+    def tokens():
+        yield "one "
+        while True:
+            yield "more "
+
+    pipeline = make_pipeline(tokens())
+
+    class InterruptingOutput(RecordingOutput):
+        async def render(self, stream: AsyncIterator[str]) -> None:
+            async for token in stream:
+                self.rendered.append(token)
+                pipeline.interrupt()
+
+    output = InterruptingOutput()
+    result = asyncio.run(pipeline.run_turn("talk", output))
+
+    assert result.interrupted
+    last = pipeline.session_memory.get_messages()[-1]
+    assert last.content.startswith("<interrupted_thought>")
+
+
+def test_loop_thread_runs_turns_from_another_thread() -> None:
+    pipeline = make_pipeline(["ok"])
+    runner = LoopThread()
+    runner.start()
+    try:
+        result = runner.submit(pipeline.run_turn("hi", RecordingOutput())).result(5)
+    finally:
+        runner.stop()
+    assert result.response == "ok"
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+from unittest.mock import patch
+
+import numpy as np
+
+from milo_core.voice.playback import AudioPlayer
+
+
+def make_player(max_segments: int = 32) -> AudioPlayer:
+    player = AudioPlayer(16000, block_size=4, max_segments=max_segments)
+    with patch("milo_core.voice.playback.sd.OutputStream"):
+        player.start()
+    return player
+
+
+def pull(player: AudioPlayer, frames: int = 4) -> np.ndarray:
+    out = np.full((frames, 1), -1.0, dtype=np.float32)
+    player._callback(out, frames, None, None)
+    return out[:, 0]
+
+
+def test_segments_play_back_to_back() -> None:
+    player = make_player()
+    player.play(np.array([1, 2, 3], dtype=np.float32))
+    player.play(np.array([4, 5, 6], dtype=np.float32))
+    np.testing.assert_array_equal(pull(player), [1, 2, 3, 4])
+    np.testing.assert_array_equal(pull(player), [5, 6, 0, 0])
+    assert player.wait(0)
+
+
+def test_flush_silences_within_one_block() -> None:
+    player = make_player()
+    player.play(np.arange(1, 10, dtype=np.float32))
+    player.play(np.ones(8, dtype=np.float32))
+    np.testing.assert_array_equal(pull(player), [1, 2, 3, 4])
+    player.flush()
+    np.testing.assert_array_equal(pull(player), [0, 0, 0, 0])
+    assert player.wait(0)
+
+
+def test_flush_drops_segments_waiting_for_room() -> None:
+    player = make_player(max_segments=1)
+    player.play(np.ones(4, dtype=np.float32))
+    producer = threading.Thread(
+        target=player.play, args=(np.full(4, 2, dtype=np.float32),)
+    )
+    producer.start()
+    producer.join(0.05)
+    assert producer.is_alive()  # blocked on the full queue
+
+    player.flush()
+    producer.join(1)
+
+    assert not producer.is_alive()
+    np.testing.assert_array_equal(pull(player), [0, 0, 0, 0])
+    assert player.wait(0)
+    player.play(np.full(2, 3, dtype=np.float32))
+    np.testing.assert_array_equal(pull(player), [3, 3, 0, 0])
+
+
+def test_stream_is_opened_once() -> None:
+    player = AudioPlayer(16000)
+    with patch("milo_core.voice.playback.sd.OutputStream") as mock_stream:
+        player.play(np.ones(2, dtype=np.float32))
+        player.play(np.ones(2, dtype=np.float32))
+    mock_stream.assert_called_once()
+    mock_stream.return_value.start.assert_called_once()
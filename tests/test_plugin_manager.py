@@ -1,8 +1,31 @@
 from __future__ import annotations
 
+import os
+from pathlib import Path
+
+from milo_core import plugin_manager
 from milo_core.plugin_manager import PluginManager
 from plugins.base import BaseSkill
 
+SKILL_TEMPLATE = """
+from plugins.base import BaseSkill
+{imports}
+
+class {cls}(BaseSkill):
+    name = "{name}"
+
+    def execute(self, *args, **kwargs):
+        return "{name} ran"
+"""
+
+
+def write_skill(directory: Path, module: str, name: str, imports: str = "") -> Path:
+    path = directory / f"{module}.py"
+    path.write_text(
+        SKILL_TEMPLATE.format(imports=imports, cls=name.title() + "Skill", name=name)
+    )
+    return path
+
 
 def test_discover_plugins_ignores_test_plugins_by_default() -> None:
     manager = PluginManager()
@@ -19,6 +42,123 @@ def test_discover_plugins_can_include_tests(monkeypatch) -> None:
     assert skill.execute() == "executed"
 
 
+def test_discovery_registers_skills_without_importing_them(tmp_path, caplog) -> None:
+    write_skill(tmp_path, "weather", "weather")
+    write_skill(tmp_path, "broken", "broken", imports="import milo_missing_dependency")
+    manager = PluginManager(tmp_path)
+
+    manager.discover_plugins()
+
+    assert manager.skill_names() == ["broken", "weather"]
+    assert manager.get_skill_by_name("weather").execute() == "weather ran"
+    assert manager.get_skill_by_name("broken") is None
+    assert "milo_missing_dependency" in caplog.text
+    assert [skill.name for skill in manager.skills] == ["weather"]
+
+
+def test_manifest_is_reused_until_a_plugin_changes(tmp_path, monkeypatch) -> None:
+    path = write_skill(tmp_path, "weather", "weather")
+    PluginManager(tmp_path).discover_plugins()
+    assert (tmp_path / "__pycache__" / "milo_manifest.json").exists()
+
+    scanned = []
+    scan = plugin_manager._scan_module
+    monkeypatch.setattr(
+        plugin_manager, "_scan_module", lambda p: scanned.append(p.name) or scan(p)
+    )
+    PluginManager(tmp_path).discover_plugins()
+    assert scanned == []
+
+    write_skill(tmp_path, "weather", "forecast")
+    os.utime(path, ns=(0, 10**18))
+    manager = PluginManager(tmp_path)
+    manager.discover_plugins()
+    assert scanned == ["weather.py"]
+    assert manager.skill_names() == ["forecast"]
+
+
+def test_skills_with_computed_names_are_imported_at_discovery(tmp_path) -> None:
+    (tmp_path / "dynamic.py").write_text(
+        "from plugins.base import BaseSkill\n\n"
+        "class Dynamic(BaseSkill):\n"
+        "    name = 'dyn' + 'amic'\n\n"
+        "    def execute(self):\n"
+        "        return 'ok'\n"
+    )
+    manager = PluginManager(tmp_path)
+    manager.discover_plugins()
+
+    assert manager._index == {}
+    assert manager.get_skill_by_name("dynamic").execute() == "ok"
+
+
+def rewrite(path: Path, text: str) -> None:
+    # Make the change visible even on file systems with coarse timestamps.
+    stamp = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(path, ns=(stamp + 10**9, stamp + 10**9))
+
+
+def test_reload_swaps_changed_modules_in_place(tmp_path) -> None:
+    path = write_skill(tmp_path, "weather", "weather")
+    write_skill(tmp_path, "idle", "idle")
+    manager = PluginManager(tmp_path)
+    manager.discover_plugins()
+    old = manager.get_skill_by_name("weather")
+    reloads = []
+    manager.add_reload_listener(reloads.append)
+
+    assert manager.reload_changed() == []
+    rewrite(
+        path,
+        SKILL_TEMPLATE.format(imports="", cls="W", name="weather").replace(
+            "weather ran", "weather v2"
+        ),
+    )
+    write_skill(tmp_path, "news", "news")
+    (tmp_path / "idle.py").unlink()
+
+    assert manager.reload_changed() == ["idle", "news", "weather"]
+    assert reloads == [["idle", "news", "weather"]]
+    assert manager.get_skill_by_name("weather").execute() == "weather v2"
+    # A call that started before the reload keeps the old version.
+    assert old.execute() == "weather ran"
+    assert manager.skill_names() == ["news", "weather"]
+
+
+def test_failed_reload_keeps_previous_version(tmp_path, caplog) -> None:
+    path = write_skill(tmp_path, "weather", "weather")
+    manager = PluginManager(tmp_path)
+    manager.discover_plugins()
+    skill = manager.get_skill_by_name("weather")
+
+    rewrite(path, path.read_text() + "\nraise RuntimeError('half-saved')\n")
+
+    assert manager.reload_changed() == []
+    assert "half-saved" in caplog.text
+    assert manager.get_skill_by_name("weather") is skill
+    # Not retried until the file changes again.
+    assert manager.reload_changed() == []
+
+
+def test_watch_reloads_in_the_background(tmp_path) -> None:
+    import time
+
+    path = write_skill(tmp_path, "weather", "weather")
+    manager = PluginManager(tmp_path)
+    manager.discover_plugins()
+    manager.get_skill_by_name("weather")
+    manager.watch(interval=0.01)
+    try:
+        rewrite(path, path.read_text().replace("weather ran", "watched"))
+        deadline = time.monotonic() + 5
+        while manager.get_skill_by_name("weather").execute() != "watched":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        manager.stop_watching()
+
+
 def test_local_model_interface_stub():
     from milo_core.llm.interface import StubLocalModel, LocalModelInterface
 
@@ -35,3 +175,44 @@ def test_local_model_interface_stub():
             pass
         else:
             raise AssertionError("Stub methods should raise NotImplementedError")
+
+
+def test_command_schema_does_not_import_plugins(tmp_path) -> None:
+    from milo_core.commands import command_schema, skill_schema
+
+    (tmp_path / "weather.py").write_text(
+        "from __future__ import annotations\n\n"
+        "import milo_missing_dependency\n"
+        "from plugins.base import BaseSkill\n\n"
+        "class Weather(BaseSkill):\n"
+        "    name = 'weather'\n\n"
+        "    def execute(self, city: str, /, days: int = 3, *, units='metric'):\n"
+        "        return city\n"
+    )
+    (tmp_path / "inherited.py").write_text(
+        "from plugins.base import BaseSkill\n\n"
+        "class Echo(BaseSkill):\n"
+        "    name = 'echo'\n\n"
+        "    def execute(self, text: str):\n"
+        "        return text\n\n"
+        "class Loud(Echo):\n"
+        "    name = 'loud'\n"
+    )
+    manager = PluginManager(tmp_path)
+    manager.discover_plugins()
+
+    schema = command_schema(manager)
+
+    # Only the skill inheriting ``execute`` needs its module imported.
+    assert manager._loaded == {"inherited"}
+    weather, echo, loud = (
+        next(c for c in schema["anyOf"] if c["properties"]["name"] == {"const": name})
+        for name in ("weather", "echo", "loud")
+    )
+    assert weather["properties"]["args"]["prefixItems"] == [
+        {"type": "string"},
+        {"type": "integer"},
+    ]
+    assert set(weather["properties"]["kwargs"]["properties"]) == {"days", "units"}
+    assert echo == skill_schema(manager.get_skill_by_name("echo"))
+    assert loud == skill_schema(manager.get_skill_by_name("loud"))
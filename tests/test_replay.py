@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from milo_core import tracing
+from milo_core.bench import replay
+
+
+def write_session(tmp_path: Path, turns: list) -> Path:
+    path = tmp_path / "session.json"
+    path.write_text(json.dumps({"name": "t", "turns": turns}))
+    return path
+
+
+def test_replay_default_sessions_offline() -> None:
+    before = tracing.get_tracer()
+    harness = replay.ReplayHarness()
+    result = harness.run(replay.load_sessions(replay.DEFAULT_SESSIONS), repeat=2)
+
+    assert result["turns"] == 10
+    assert result["turns_per_sec"] > 0
+    assert result["command_mismatches"] == []
+    assert {"retrieve", "llm_ttft", "skill", "first_audio", "turn_total"} <= set(
+        result["stages"]
+    )
+    assert result["stages"]["skill"]["count"] == 2
+    assert tracing.get_tracer() is before
+
+
+def test_replay_audio_turns_and_command_mismatch(tmp_path: Path) -> None:
+    with wave.open(str(tmp_path / "hi.wav"), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16_000)
+        wf.writeframes(np.zeros(1600, dtype=np.int16).tobytes())
+    path = write_session(
+        tmp_path,
+        [
+            {"audio": "hi.wav", "transcript": "hello", "reply": "Hi there."},
+            {
+                "text": "run it",
+                "reply": '{"type": "skill", "name": "test"}',
+                "expect_command": {"type": "skill", "name": "other"},
+            },
+        ],
+    )
+    seen = []
+
+    class Transcriber:
+        def transcribe(self, audio, turn):
+            seen.append(len(audio))
+            return turn["transcript"]
+
+    harness = replay.ReplayHarness(transcriber=Transcriber())
+    result = harness.run(replay.load_sessions(path))
+
+    assert seen == [1600]
+    assert result["stages"]["stt"]["count"] == 1
+    (mismatch,) = result["command_mismatches"]
+    assert mismatch["turn"] == 1
+    assert mismatch["actual"] == {"type": "skill", "name": "test"}
+
+
+def test_compare_flags_slower_stages_and_throughput() -> None:
+    baseline = {
+        "turns_per_sec": 100.0,
+        "stages": {"retrieve": {"p50_ms": 10.0}, "skill": {"p50_ms": 0.1}},
+    }
+    result = {
+        "turns_per_sec": 70.0,
+        "stages": {"retrieve": {"p50_ms": 13.0}, "skill": {"p50_ms": 0.5}},
+    }
+
+    regressions = replay.compare(result, baseline, threshold=0.2)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("turns_per_sec")
+    assert regressions[1].startswith("retrieve")
+    assert replay.compare(baseline, baseline) == []
+
+
+def test_main_writes_results_and_checks_baseline(tmp_path: Path) -> None:
+    out = tmp_path / "result.json"
+    assert replay.main(["--out", str(out)]) == 0
+    result = json.loads(out.read_text())
+    assert result["turns"] == 5
+
+    result["turns_per_sec"] *= 1000
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(result))
+    assert replay.main(["--baseline", str(baseline)]) == 1
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+
+from milo_core import sandbox
+from milo_core.commands import CommandError, execute_command
+from milo_core.plugin_manager import PluginManager
+from milo_core.sandbox import SkillSandbox
+from plugins.base import BaseSkill
+
+
+class PidSkill(BaseSkill):
+    name = "pid"
+    isolated = True
+
+    def execute(self, payload: bytes = b"") -> tuple:  # type: ignore[override]
+        return os.getpid(), len(payload)
+
+
+class FailingSkill(BaseSkill):
+    name = "failing"
+    isolated = True
+
+    def execute(self, mode: str) -> None:  # type: ignore[override]
+        if mode == "raise":
+            raise ValueError("bad input")
+        if mode == "crash":
+            os._exit(3)
+        if mode == "hang":
+            time.sleep(30)
+
+
+class QuickTimeoutSkill(FailingSkill):
+    name = "quick_timeout"
+    timeout = 0.5
+
+
+@pytest.fixture
+def pool():
+    pool = SkillSandbox(max_workers=1, timeout=10)
+    yield pool
+    pool.close()
+
+
+def test_isolated_skill_runs_in_worker_via_execute_command(monkeypatch, pool) -> None:
+    monkeypatch.setattr(sandbox, "get_sandbox", lambda: pool)
+    pm = PluginManager()
+    pm.skills = [PidSkill()]
+
+    pid, size = execute_command(
+        {"type": "skill", "name": "pid", "kwargs": {"payload": b"x" * 100_000}}, pm
+    )
+
+    assert pid != os.getpid()
+    assert size == 100_000
+
+
+def test_skill_errors_and_crashes_surface_as_command_errors(pool) -> None:
+    with pytest.raises(CommandError, match="failed: ValueError: bad input"):
+        pool.run(FailingSkill(), ["raise"])
+    with pytest.raises(CommandError, match=r"crashed \(exit code 3\)"):
+        pool.run(FailingSkill(), ["crash"])
+    with pytest.raises(CommandError, match="cannot be sent"):
+        pool.run(PidSkill(), [threading.Lock()])
+
+    assert pool.run(PidSkill())[0] != os.getpid()
+
+
+def test_timed_out_call_kills_the_worker(pool) -> None:
+    start = time.monotonic()
+    with pytest.raises(CommandError, match="did not finish within 0.5 seconds"):
+        pool.run(QuickTimeoutSkill(), ["hang"])
+
+    assert time.monotonic() - start < 5
+    assert pool.recycled == 1
+    assert pool.run(PidSkill())[0] != os.getpid()
+
+
+@pytest.mark.parametrize(
+    "settings", [{"max_calls": 2}, {"max_calls": 100, "max_memory_mb": 1}]
+)
+def test_workers_are_recycled(settings) -> None:
+    pool = SkillSandbox(max_workers=1, **settings)
+    try:
+        pids = [pool.run(PidSkill())[0] for _ in range(4)]
+    finally:
+        pool.close()
+
+    expected = 2 if settings["max_calls"] == 2 else 4
+    assert len(set(pids)) == expected
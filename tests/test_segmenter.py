@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from milo_core.voice.segmenter import SentenceSegmenter, iter_segments
+
+
+def test_segments_emitted_before_stream_ends() -> None:
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("Hello there") == []
+    assert segmenter.feed(". How") == ["Hello there."]
+    assert segmenter.feed(" are you?") == []
+    assert segmenter.flush() == "How are you?"
+
+
+def test_abbreviations_and_numbers_do_not_split() -> None:
+    text = (
+        "Dr. Smith paid $3.50 at 3 p.m. today. "
+        "It costs approx. ten dollars. J. R. R. Tolkien wrote it!"
+    )
+    tokens = [text[i : i + 3] for i in range(0, len(text), 3)]
+    assert list(iter_segments(tokens)) == [
+        "Dr. Smith paid $3.50 at 3 p.m. today.",
+        "It costs approx. ten dollars.",
+        "J. R. R. Tolkien wrote it!",
+    ]
+
+
+def test_numbered_list_items_stay_whole() -> None:
+    segments = list(iter_segments(["1. Preheat the oven.\n2. Mix the flour."]))
+    assert segments == ["1. Preheat the oven.", "2. Mix the flour."]
+
+
+def test_long_clauses_split_at_commas() -> None:
+    text = "a" * 30 + ", " + "b" * 30 + ", and then the rest"
+    segments = list(iter_segments([text], clause_chars=40))
+    assert segments == ["a" * 30 + ", " + "b" * 30 + ",", "and then the rest"]
+
+
+def test_hard_limit_without_punctuation() -> None:
+    words = " ".join(["word"] * 20)
+    segments = list(iter_segments([words], max_chars=30))
+    assert all(len(s) <= 30 for s in segments)
+    assert " ".join(segments) == words
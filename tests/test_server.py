@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from milo_core.llm.batching import BatchScheduler, StubBatchBackend
+from milo_core.memory import NoLongTermMemory
+from milo_core.server import MiloServer
+
+REPLY = "This is a stub reply from MILO."
+
+
+def run_client(server: MiloServer, scenario) -> None:
+    async def main() -> None:
+        async with TestClient(TestServer(server.app())) as client:
+            await scenario(client)
+
+    asyncio.run(main())
+
+
+def make_server(plugin_manager=None, **kwargs):
+    backend = StubBatchBackend(REPLY, **kwargs)
+    scheduler = BatchScheduler(backend, max_batch_size=8)
+    return MiloServer(scheduler, NoLongTermMemory(), plugin_manager), scheduler
+
+
+def test_chat_keeps_history_per_session() -> None:
+    server, scheduler = make_server()
+
+    async def scenario(client) -> None:
+        first = (await (await client.post("/sessions")).json())["session_id"]
+        second = (await (await client.post("/sessions")).json())["session_id"]
+        resp = await client.post(f"/sessions/{first}/chat", json={"message": "hi"})
+        assert resp.status == 200
+        assert (await resp.json())["response"] == REPLY
+        await client.post(f"/sessions/{first}/chat", json={"message": "again"})
+        await client.post(f"/sessions/{second}/chat", json={"message": "yo"})
+
+        missing = await client.post("/sessions/nope/chat", json={"message": "x"})
+        assert missing.status == 404
+        bad = await client.post(f"/sessions/{first}/chat", json={})
+        assert bad.status == 400
+
+    run_client(server, scenario)
+    scheduler.close()
+
+    histories = sorted(
+        [m.content for m in s.pipeline.session_memory.get_messages()]
+        for s in server.sessions.values()
+    )
+    assert histories == [["hi", REPLY, "again", REPLY], ["yo", REPLY]]
+
+
+def test_streamed_chat_sends_token_events() -> None:
+    server, scheduler = make_server()
+
+    async def scenario(client) -> None:
+        session = (await (await client.post("/sessions")).json())["session_id"]
+        resp = await client.post(
+            f"/sessions/{session}/chat?stream=1", json={"message": "hi"}
+        )
+        events = [json.loads(line) for line in (await resp.text()).splitlines()]
+        tokens = [e["text"] for e in events if e["type"] == "token"]
+        assert "".join(tokens) == REPLY
+        assert len(tokens) > 1
+        assert events[-1] == {
+            "type": "done",
+            "response": REPLY,
+            "interrupted": False,
+            "command_result": None,
+        }
+
+    run_client(server, scenario)
+    scheduler.close()
+
+
+def test_websocket_turn_and_interrupt() -> None:
+    server, scheduler = make_server(step_seconds=0.05)
+
+    async def scenario(client) -> None:
+        session = (await (await client.post("/sessions")).json())["session_id"]
+        ws = await client.ws_connect(f"/sessions/{session}/ws")
+        await ws.send_json({"message": "hi"})
+        first = await ws.receive_json(timeout=5)
+        assert first["type"] == "token"
+        await ws.send_json({"type": "interrupt"})
+        while (event := await ws.receive_json(timeout=5))["type"] != "done":
+            pass
+        assert event["interrupted"]
+        await ws.close()
+
+    run_client(server, scenario)
+    scheduler.close()
+
+
+def test_commands_endpoint(monkeypatch) -> None:
+    monkeypatch.setattr(
+        "milo_core.server.execute_command", lambda command, pm: f"ran {command}"
+    )
+    server, scheduler = make_server(plugin_manager=MagicMock())
+
+    async def scenario(client) -> None:
+        resp = await client.post("/commands", json={"command": "x"})
+        assert await resp.json() == {"result": "ran x"}
+        missing = await client.post("/commands", json={})
+        assert missing.status == 400
+
+    run_client(server, scenario)
+    scheduler.close()
+
+
+def test_load_many_concurrent_sessions_are_batched() -> None:
+    server, scheduler = make_server(step_seconds=0.01)
+    clients = 24
+
+    async def scenario(client) -> None:
+        async def converse(i: int) -> None:
+            session = (await (await client.post("/sessions")).json())["session_id"]
+            for turn in range(2):
+                resp = await client.post(
+                    f"/sessions/{session}/chat", json={"message": f"{i}-{turn}"}
+                )
+                assert (await resp.json())["response"] == REPLY
+
+        await asyncio.gather(*(converse(i) for i in range(clients)))
+
+    run_client(server, scenario)
+    scheduler.close()
+
+    assert scheduler.stats.requests == clients * 2
+    assert scheduler.stats.max_batch_size == 8
+    # Every request needs len(words) + 1 steps on its own.
+    sequential_steps = clients * 2 * (len(REPLY.split()) + 1)
+    assert scheduler.stats.steps < sequential_steps / 3
+
+
+def test_jobs_endpoint_reports_finished_workflows() -> None:
+    import requests
+
+    from milo_core import jobs
+
+    def trigger(workflow_id, payload, timeout):
+        reply = requests.Response()
+        reply.status_code = 200
+        reply._content = b'{"unread": 3}'
+        return reply
+
+    queue = jobs.JobQueue(trigger=trigger)
+    previous = jobs.install(queue)
+    server, scheduler = make_server()
+
+    async def scenario(client) -> None:
+        session = (await (await client.post("/sessions")).json())["session_id"]
+        job = queue.enqueue("gmail_read", None, owner=session)
+        for _ in range(100):
+            if queue.get(job.id).finished:
+                break
+            await asyncio.sleep(0.01)
+        first = await (await client.get(f"/sessions/{session}/jobs")).json()
+        again = await (await client.get(f"/sessions/{session}/jobs")).json()
+        assert [(j["workflow"], j["result"]) for j in first["jobs"]] == [
+            ("gmail_read", {"unread": 3})
+        ]
+        assert again == {"jobs": []}
+
+    try:
+        run_client(server, scenario)
+    finally:
+        jobs.install(previous)
+        queue.close()
+        scheduler.close()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import pytest
+
+from milo_core import skill_cache
+from milo_core.commands import execute_command
+from milo_core.plugin_manager import PluginManager
+from milo_core.skill_cache import MISSING, SkillCache
+from plugins.base import BaseSkill
+from plugins.google_search_skill import GoogleSearchSkill
+from plugins.test_skill import TestSkill
+
+
+class StubSearch:
+    """Offline stand-in for ``googlesearch.search``."""
+
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+
+    def __call__(self, query: str, num_results: int = 5) -> list[str]:
+        self.queries.append(query)
+        return [
+            f"http://example.com/{len(self.queries)}/{i}" for i in range(num_results)
+        ]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    cache = SkillCache(max_entries=2, clock=clock)
+    previous = skill_cache.install(cache)
+    yield cache
+    skill_cache.install(previous)
+
+
+@pytest.fixture
+def stub_search(monkeypatch):
+    stub = StubSearch()
+    monkeypatch.setattr("plugins.google_search_skill.search", stub)
+    return stub
+
+
+def search_manager() -> PluginManager:
+    pm = PluginManager()
+    pm.skills = [GoogleSearchSkill(), TestSkill()]
+    return pm
+
+
+def search(query: str, pm: PluginManager, num_results: int = 2) -> str:
+    command = {"type": "skill", "name": "googlesearch", "args": [query, num_results]}
+    return execute_command(command, pm)
+
+
+def test_repeated_search_is_served_from_cache(cache, clock, stub_search) -> None:
+    pm = search_manager()
+
+    first = search("Weather in  Paris", pm)
+    clock.now += 60
+    again = search("weather in paris", pm)
+
+    assert again == first
+    assert stub_search.queries == ["Weather in  Paris"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    search("weather in paris", pm, num_results=3)
+    assert len(stub_search.queries) == 2
+
+
+def test_cached_results_expire(cache, clock, stub_search) -> None:
+    pm = search_manager()
+    search("news", pm)
+    clock.now += GoogleSearchSkill.cache_ttl
+
+    search("news", pm)
+
+    assert stub_search.queries == ["news", "news"]
+
+
+def test_skills_without_ttl_are_not_cached(cache) -> None:
+    pm = search_manager()
+    execute_command({"type": "skill", "name": "test"}, pm)
+    execute_command({"type": "skill", "name": "test"}, pm)
+
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_skill_can_decline_caching(cache) -> None:
+    calls = []
+
+    class Random(BaseSkill):
+        name = "random"
+        cache_ttl = 60.0
+
+        def execute(self, seed: int | None = None) -> int:  # type: ignore[override]
+            calls.append(seed)
+            return len(calls)
+
+        def cache_key(self, seed: int | None = None) -> str | None:  # type: ignore[override]
+            return None if seed is None else str(seed)
+
+    pm = PluginManager()
+    pm.skills = [Random()]
+
+    def run(*args):
+        return execute_command(
+            {"type": "skill", "name": "random", "args": list(args)}, pm
+        )
+
+    assert [run(), run(), run(1), run(1)] == [1, 2, 3, 3]
+
+
+def test_memory_tier_is_bounded(cache) -> None:
+    for key in ("a", "b", "c"):
+        cache.put(key, key, ttl=60)
+
+    assert cache.get("a") is MISSING
+    assert cache.get("c") == "c"
+
+
+def test_sqlite_tier_survives_restart(tmp_path, clock) -> None:
+    path = tmp_path / "skills.sqlite3"
+    cache = SkillCache(path=path, clock=clock)
+    cache.put("json", {"urls": ["a", "b"]}, ttl=60)
+    cache.put("object", object(), ttl=60)
+    cache.put("stale", "old", ttl=1)
+    cache.close()
+
+    clock.now += 30
+    reopened = SkillCache(path=path, clock=clock)
+
+    assert reopened.get("json") == {"urls": ["a", "b"]}
+    assert reopened.get("object") is MISSING
+    assert reopened.get("stale") is MISSING
+    reopened.clear()
+    assert reopened.get("json") is MISSING
+    reopened.close()
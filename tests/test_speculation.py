@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import AsyncIterator
+from unittest.mock import MagicMock
+
+from milo_core.memory import Message, ShortTermMemory
+from milo_core.pipeline import TurnOutput, TurnPipeline
+from milo_core.speculation import Speculator, similarity
+
+
+def test_similarity_ignores_case_and_punctuation() -> None:
+    assert similarity("What's the weather?", "what's the weather") == 1.0
+    assert similarity("turn on the lights", "play some music") < 0.5
+
+
+def test_take_reuses_close_transcript_and_records_savings() -> None:
+    memory = MagicMock()
+    memory.retrieve_relevant_memories.return_value = ["likes tea"]
+    model = MagicMock()
+    speculator = Speculator(memory, model)
+    history = [Message(role="user", content="hi")]
+
+    speculator.speculate("what's the weather in", history)
+    speculator.speculate("What's the weather in Paris", history)
+    memories = speculator.take("what's the weather in Paris?")
+    speculator.close()
+
+    assert memories == ["likes tea"]
+    assert speculator.stats.hits == 1
+    assert speculator.stats.hit_rate == 1.0
+    assert speculator.stats.saved_seconds >= 0.0
+    model.prefill.assert_called_once_with(history)
+
+
+def test_take_discards_speculation_on_mismatch() -> None:
+    memory = MagicMock()
+    speculator = Speculator(memory)
+
+    speculator.speculate("turn on the lights", [])
+    assert speculator.take("play some music please") is None
+    assert speculator.take("play some music please") is None
+    speculator.close()
+
+    assert speculator.stats.attempts == 1
+    assert speculator.stats.misses == 1
+    assert speculator.stats.hit_rate == 0.0
+
+
+def test_discarded_speculation_is_not_reused() -> None:
+    memory = MagicMock()
+    memory.retrieve_relevant_memories.return_value = ["likes tea"]
+    speculator = Speculator(memory)
+
+    speculator.speculate("what's the weather", [])
+    speculator.discard()
+    assert speculator.take("what's the weather") is None
+    speculator.close()
+
+    assert speculator.stats.attempts == 0
+
+
+def test_failing_speculation_falls_back() -> None:
+    memory = MagicMock()
+    memory.retrieve_relevant_memories.side_effect = RuntimeError("db locked")
+    speculator = Speculator(memory)
+
+    speculator.speculate("hello there", [])
+    assert speculator.take("hello there") is None
+    speculator.close()
+    assert speculator.stats.misses == 1
+
+
+class Output(TurnOutput):
+    async def render(self, tokens: AsyncIterator[str]) -> None:
+        async for _ in tokens:
+            pass
+
+
+def test_pipeline_uses_speculated_retrieval() -> None:
+    memory = MagicMock()
+    memory.retrieve_relevant_memories.return_value = ["likes tea"]
+    model = MagicMock()
+    model.stream_response.return_value = iter(["ok"])
+    speculator = Speculator(memory, model)
+    pipeline = TurnPipeline(
+        model, memory, session_memory=ShortTermMemory(), speculator=speculator
+    )
+
+    pipeline.speculate("do I like tea")
+    asyncio.run(pipeline.run_turn("Do I like tea?", Output()))
+    speculator.close()
+
+    memory.retrieve_relevant_memories.assert_called_once_with("do I like tea")
+    messages = pipeline.session_memory.get_messages()
+    assert messages[0].content == "Here is some relevant context: likes tea"
+
+
+def test_pipeline_ignores_partials_during_a_turn() -> None:
+    memory = MagicMock()
+    memory.retrieve_relevant_memories.return_value = []
+    speculator = MagicMock()
+    speculator.take.return_value = None
+    release = threading.Event()
+
+    def tokens(history):
+        pipeline.speculate("stop talking")
+        release.set()
+        yield "ok"
+
+    model = MagicMock()
+    model.stream_response.side_effect = tokens
+    pipeline = TurnPipeline(
+        model, memory, session_memory=ShortTermMemory(), speculator=speculator
+    )
+
+    asyncio.run(pipeline.run_turn("hello", Output()))
+
+    assert release.is_set()
+    speculator.speculate.assert_not_called()
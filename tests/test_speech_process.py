@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from typing import Iterable
+
+import pytest
+
+from milo_core.voice.interface import SpeechToText, TextToSpeech
+from milo_core.voice.process import SpeechProcess
+
+# Shared between the fake engines inside the worker process.
+EVENTS: list[str] = []
+
+
+class FakeSTT(SpeechToText):
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+
+    def listen(self) -> str:
+        return self.prefix + "|".join(EVENTS)
+
+
+class FakeTTS(TextToSpeech):
+    def __init__(self) -> None:
+        pass
+
+    def speak(self, tokens: Iterable[str]) -> None:
+        EVENTS.extend(tokens)
+
+    def stop(self) -> None:
+        EVENTS.append("<stop>")
+
+
+class BrokenTTS(FakeTTS):
+    def __init__(self) -> None:
+        raise ValueError("no voice")
+
+
+def wait_for(stt: SpeechToText, expected: str) -> str:
+    deadline = time.monotonic() + 10
+    while True:
+        heard = stt.listen()
+        if heard == expected or time.monotonic() > deadline:
+            return heard
+        time.sleep(0.05)
+
+
+def test_engines_run_in_worker_process() -> None:
+    process = SpeechProcess({"prefix": "heard:"}, {}, FakeSTT, FakeTTS)
+    try:
+        process.tts.speak(["Hello there. How", " are you?"])
+        process.tts.stop()
+        assert (
+            wait_for(process.stt, "heard:Hello there.|How are you?|<stop>")
+            == "heard:Hello there.|How are you?|<stop>"
+        )
+        assert EVENTS == []
+    finally:
+        process.close()
+    assert not process._process.is_alive()
+
+
+def test_startup_failure_is_reported() -> None:
+    with pytest.raises(RuntimeError, match="no voice"):
+        SpeechProcess({"prefix": ""}, {}, FakeSTT, BrokenTTS)
+
+
+def test_calls_fail_once_the_worker_has_exited() -> None:
+    process = SpeechProcess({"prefix": ""}, {}, FakeSTT, FakeTTS)
+    process._process.kill()
+    process._reader.join(timeout=10)
+
+    with pytest.raises(RuntimeError, match="exited"):
+        process.stt.listen()
+    process.close()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from milo_core.startup import Startup
+
+
+def test_components_load_concurrently() -> None:
+    startup = Startup()
+    barrier = threading.Barrier(3, timeout=5)
+
+    def load(value):
+        def init():
+            barrier.wait()
+            return value
+
+        return init
+
+    for name in ("a", "b", "c"):
+        startup.add(name, load(name))
+
+    assert [startup.get(name) for name in ("a", "b", "c")] == ["a", "b", "c"]
+    startup.shutdown()
+
+
+def test_dependencies_receive_results_and_propagate_errors() -> None:
+    startup = Startup()
+    startup.add("model", lambda: time.sleep(0.05) or "model")
+    startup.add("embedder", lambda: "embedder")
+    startup.add("memory", lambda m, e: (m, e), after=["model", "embedder"])
+    startup.add("broken", lambda: 1 / 0)
+    startup.add("uses_broken", lambda b: b, after=["broken"])
+
+    assert startup.get("memory") == ("model", "embedder")
+    with pytest.raises(ZeroDivisionError):
+        startup.get("uses_broken")
+    assert startup.ready("memory")
+    assert not startup.ready("broken")
+    startup.shutdown()
+
+
+def test_report_lists_every_component_once_ready() -> None:
+    startup = Startup()
+    release = threading.Event()
+    startup.add("fast", lambda: None)
+    startup.add("slow", lambda: release.wait(5))
+    startup.add("broken", lambda: 1 / 0)
+    reports: list[str] = []
+    done = threading.Event()
+
+    def on_ready() -> None:
+        reports.append(startup.report())
+        done.set()
+
+    startup.when_ready(on_ready)
+    startup.get("fast")
+    assert "slow" in startup.pending()
+    assert "warming up" in startup.report()
+
+    release.set()
+    assert done.wait(5)
+    (report,) = reports
+    assert report.startswith("Startup took")
+    assert "fast" in report and "slow" in report
+    assert "failed: division by zero" in report
+
+    called = []
+    startup.when_ready(lambda: called.append(True))
+    assert called == [True]
+    startup.shutdown()
+
+
+def test_shutdown_fails_components_that_never_started() -> None:
+    startup = Startup(max_workers=1)
+    release = threading.Event()
+    startup.add("slow", release.wait)
+    startup.add("queued", lambda: "never")
+    startup.add("dependent", lambda value: value, after=["queued"])
+    finished = threading.Event()
+    startup.when_ready(finished.set)
+
+    startup.shutdown()
+    release.set()
+
+    for name in ("queued", "dependent"):
+        with pytest.raises(RuntimeError, match="shut down"):
+            startup.get(name)
+    assert startup.get("slow") is True
+    assert finished.wait(5)
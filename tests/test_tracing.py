@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import AsyncIterator
+from unittest.mock import MagicMock
+
+import pytest
+
+from milo_core import tracing
+from milo_core.memory import ShortTermMemory
+from milo_core.pipeline import TurnOutput, TurnPipeline
+
+
+@pytest.fixture
+def tracer(tmp_path: Path):
+    tracer = tracing.configure(tmp_path / "trace.jsonl")
+    yield tracer
+    tracing.configure(None)
+
+
+def read_turns(path: Path) -> list:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_disabled_tracer_records_nothing(tmp_path: Path) -> None:
+    tracer = tracing.Tracer()
+    assert tracer.span("x") is tracer.span("y")
+    with tracer.turn("voice"):
+        with tracer.span("stage"):
+            pass
+        tracer.mark("first")
+    assert not list(tmp_path.iterdir())
+
+
+def test_turn_writes_spans_marks_and_metrics(tracer) -> None:
+    tracing.record("whisper_decode", 0.25)  # before the turn starts
+    with tracing.turn("voice"):
+        with tracing.span("retrieve"):
+            pass
+        worker = threading.Thread(target=tracing.mark, args=("first_audio",))
+        worker.start()
+        worker.join()
+        tracing.mark("first_audio")
+        tracing.metric("llm_tokens_per_sec", 20.0)
+    tracer.close()
+
+    (turn,) = read_turns(tracer.path)
+    assert turn["source"] == "voice"
+    assert turn["turn"] == 1
+    assert turn["spans"]["whisper_decode"] == [0.25]
+    assert len(turn["spans"]["first_audio"]) == 1
+    assert {"retrieve", "turn_total"} <= set(turn["spans"])
+    assert turn["metrics"] == {"llm_tokens_per_sec": 20.0}
+
+
+def test_concurrent_turns_keep_their_own_spans(tracer) -> None:
+    pipeline = TurnPipeline(MagicMock(), MagicMock(), MagicMock())
+    both_started = asyncio.Barrier(2)
+
+    async def turn(source: str) -> None:
+        with tracing.turn(source):
+            await both_started.wait()
+            await pipeline.run_blocking(tracing.record, f"{source}_stage", 0.1)
+
+    async def main() -> None:
+        await asyncio.gather(turn("voice"), turn("gui"))
+
+    asyncio.run(main())
+    pipeline.close()
+    tracer.close()
+
+    spans = {entry["source"]: set(entry["spans"]) for entry in read_turns(tracer.path)}
+    assert spans == {
+        "voice": {"voice_stage", "turn_total"},
+        "gui": {"gui_stage", "turn_total"},
+    }
+
+
+def test_trace_file_rotates(tmp_path: Path) -> None:
+    tracer = tracing.Tracer(tmp_path / "trace.jsonl", max_bytes=200, backup_count=2)
+    for _ in range(10):
+        with tracer.turn("gui"):
+            tracer.record("stage", 0.1)
+    tracer.close()
+
+    files = tracing.trace_files(tmp_path / "trace.jsonl")
+    assert [p.name for p in files] == ["trace.jsonl.2", "trace.jsonl.1", "trace.jsonl"]
+    turns = tracing.load_turns(files)
+    numbers = [t["turn"] for t in turns]
+    assert numbers == sorted(numbers)
+
+
+def test_report_percentiles() -> None:
+    turns = [
+        {"session": "a", "spans": {"llm_ttft": [i / 1000]}, "metrics": {}}
+        for i in range(1, 101)
+    ]
+    turns.append(
+        {"session": "b", "spans": {"tts": [0.1, 0.2]}, "metrics": {"rate": 5.0}}
+    )
+
+    text = tracing.report(turns)
+
+    assert "101 turns across 2 sessions" in text
+    ttft = next(line for line in text.splitlines() if line.startswith("llm_ttft"))
+    assert ttft.split()[1:] == ["100", "50.5", "90.1", "99.0"]
+    tts = next(line for line in text.splitlines() if line.startswith("tts"))
+    assert tts.split()[2] == "300.0"
+    assert any(line.startswith("rate") for line in text.splitlines())
+
+
+def test_pipeline_turn_is_traced(tracer) -> None:
+    class Output(TurnOutput):
+        async def render(self, tokens: AsyncIterator[str]) -> None:
+            async for _ in tokens:
+                pass
+
+    model = MagicMock()
+    model.stream_response.return_value = iter(["a", "b"])
+    pipeline = TurnPipeline(
+        model, MagicMock(), session_memory=ShortTermMemory(), source="gui"
+    )
+
+    asyncio.run(pipeline.run_turn("hi", Output()))
+    tracer.close()
+
+    (turn,) = read_turns(tracer.path)
+    assert turn["source"] == "gui"
+    assert {"retrieve", "prompt_build", "llm_ttft", "persist"} <= set(turn["spans"])
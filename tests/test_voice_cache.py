@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from milo_core.voice.cache import PhraseCache, normalize_text
+
+
+def test_normalized_text_shares_key() -> None:
+    cache = PhraseCache("voice")
+    assert normalize_text("  Okay,\n  done. ") == "Okay, done."
+    assert cache.key("Okay,  done.") == cache.key(" Okay, done.")
+    assert cache.key("Okay.") != PhraseCache("other").key("Okay.")
+
+
+def test_memory_lru_evicts_oldest() -> None:
+    cache = PhraseCache("voice", max_entries=2)
+    cache.put("one", np.array([1], dtype=np.int16))
+    cache.put("two", np.array([2], dtype=np.int16))
+    assert cache.get("one") is not None
+    cache.put("three", np.array([3], dtype=np.int16))
+    assert cache.get("two") is None
+    assert cache.get("one") is not None
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path: Path) -> None:
+    audio = np.arange(100, dtype=np.int16)
+    PhraseCache("voice", tmp_path).put("Hello there.", audio)
+    assert list(tmp_path.rglob("*.pcm.z"))
+
+    reloaded = PhraseCache("voice", tmp_path)
+    assert "Hello there." in reloaded
+    np.testing.assert_array_equal(reloaded.get("Hello there."), audio)
+
+
+def test_long_text_is_not_cached() -> None:
+    cache = PhraseCache("voice", max_chars=10)
+    cache.put("this is far too long", np.ones(4, dtype=np.int16))
+    assert cache.get("this is far too long") is None
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import numpy as np
+from piper import PiperVoice
 
 from milo_core.voice.engines import PiperTTS, WhisperSTT
 
 
+def piper_voice() -> MagicMock:
+    """Mock limited to the ``PiperVoice`` API."""
+    voice = MagicMock(spec=PiperVoice)
+    voice.config = SimpleNamespace(sample_rate=16000)
+    return voice
+
+
+def audio_chunk(*samples: int) -> SimpleNamespace:
+    """Stand-in for the ``AudioChunk`` objects ``PiperVoice.synthesize`` yields."""
+    audio = np.array(samples, dtype=np.int16)
+    return SimpleNamespace(audio_int16_array=audio, audio_int16_bytes=audio.tobytes())
+
+
 def test_whisper_stt_listen_with_vad() -> None:
     mock_model = MagicMock()
     mock_model.transcribe.return_value = (
@@ -55,16 +70,37 @@ def test_whisper_stt_listen_with_vad() -> None:
 
 
 def test_piper_tts_speak(monkeypatch) -> None:
-    voice = MagicMock()
-    voice.config.sample_rate = 16000
+    voice = piper_voice()
+
+    voice.synthesize.return_value = [audio_chunk(1, 2)]
+
+    class DummyThread:
+        def __init__(self, target, daemon=False):
+            self.target = target
 
-    def synthesize(text, wf):
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(16000)
-        wf.writeframes(b"\x00\x00")
+        def start(self):
+            pass
 
-    voice.synthesize.side_effect = synthesize
+    monkeypatch.setattr("piper.PiperVoice.load", lambda *a, **k: voice)
+
+    with (
+        patch("milo_core.voice.engines.threading.Thread", DummyThread),
+        patch("milo_core.voice.playback.sd.OutputStream") as mock_stream,
+    ):
+        tts = PiperTTS("model")
+        tts.speak(["hi"])
+        tts._queue.put(None)
+        tts._run()
+        voice.synthesize.assert_called_once_with("hi")
+        mock_stream.assert_called_once()
+        assert mock_stream.call_args.kwargs["dtype"] == "int16"
+        _, played = tts.player._queue.get_nowait()
+        assert played.dtype == np.int16
+        np.testing.assert_array_equal(played, [1, 2])
+
+
+def test_piper_tts_queues_sentences_as_they_arrive(monkeypatch) -> None:
+    voice = piper_voice()
 
     class DummyThread:
         def __init__(self, target, daemon=False):
@@ -74,12 +110,210 @@ def test_piper_tts_speak(monkeypatch) -> None:
             pass
 
     monkeypatch.setattr("piper.PiperVoice.load", lambda *a, **k: voice)
-    monkeypatch.setattr("sounddevice.play", lambda *a, **k: None)
-    monkeypatch.setattr("sounddevice.wait", lambda *a, **k: None)
 
     with patch("milo_core.voice.engines.threading.Thread", DummyThread):
         tts = PiperTTS("model")
-        tts.speak(["hi"])
+
+    queued_while_streaming: list[int] = []
+
+    def tokens():
+        yield "Hello there. "
+        yield "How"
+        queued_while_streaming.append(tts._queue.qsize())
+        yield " are you?"
+
+    tts.speak(tokens())
+    assert queued_while_streaming == [1]
+    assert tts._queue.get_nowait() == (0, "Hello there.")
+    assert tts._queue.get_nowait() == (0, "How are you?")
+
+
+def test_piper_tts_stop_drops_pending_segments(monkeypatch) -> None:
+    voice = piper_voice()
+
+    class DummyThread:
+        def __init__(self, target, daemon=False):
+            self.target = target
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr("piper.PiperVoice.load", lambda *a, **k: voice)
+
+    with patch("milo_core.voice.engines.threading.Thread", DummyThread):
+        tts = PiperTTS("model")
+
+    def tokens():
+        yield "One. Two. "
+        tts.stop()
+        yield "Three. Four."
+
+    tts.speak(tokens())
+    assert tts._queue.empty()
+
+
+def test_piper_tts_records_real_time_factor(monkeypatch) -> None:
+    voice = piper_voice()
+
+    voice.synthesize.return_value = [
+        audio_chunk(*[0] * 4000),
+        audio_chunk(*[0] * 4000),
+    ]
+
+    class DummyThread:
+        def __init__(self, target, daemon=False):
+            self.target = target
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr("piper.PiperVoice.load", lambda *a, **k: voice)
+
+    with (
+        patch("milo_core.voice.engines.threading.Thread", DummyThread),
+        patch("milo_core.voice.playback.sd.OutputStream"),
+        patch(
+            "milo_core.voice.engines.time.perf_counter",
+            side_effect=[1.0, 1.05, 2.0, 2.05, 3.0, 3.0],
+        ),
+    ):
+        tts = PiperTTS("model", lookahead=3)
+        tts._synthesize("hello", tts._generation)
+
+    assert tts.player._queue.maxsize == 3
+    assert tts.player._queue.qsize() == 2
+    stats = tts.stats[-1]
+    assert stats.chars == 5
+    assert stats.audio_seconds == 0.5
+    assert abs(stats.real_time_factor - 0.2) < 1e-9
+
+
+def test_whisper_stt_reuses_and_grows_capture_buffer() -> None:
+    mock_model = MagicMock()
+    mock_model.transcribe.return_value = ([], None)
+    chunk = (np.arange(480, dtype=np.int16)).tobytes()
+    silence = np.zeros(480, dtype=np.int16).tobytes()
+
+    stream = MagicMock()
+    stream.read.side_effect = [(chunk, None)] * 3 + [(silence, None)] * 2
+    vad_instance = MagicMock()
+    vad_instance.is_speech.side_effect = [True, True, True, False, False]
+
+    with (
+        patch("faster_whisper.WhisperModel", return_value=mock_model),
+        patch("milo_core.voice.engines.sd.RawInputStream", return_value=stream),
+        patch("milo_core.voice.engines.webrtcvad.Vad", return_value=vad_instance),
+        patch("milo_core.voice.engines.time.time", side_effect=[0.0, 1.0]),
+    ):
+        stt = WhisperSTT(max_utterance_seconds=0.04)
+        stt.listen()
+
+    audio = mock_model.transcribe.call_args[0][0]
+    assert audio.dtype == np.float32
+    assert len(audio) == 3 * 480
+    assert np.shares_memory(audio, stt._audio)
+    expected = np.tile(np.arange(480, dtype=np.float32) / 32768.0, 3)
+    np.testing.assert_allclose(audio, expected)
+
+
+def test_piper_tts_plays_cached_phrases_without_synthesis(monkeypatch) -> None:
+    voice = piper_voice()
+    voice.synthesize.side_effect = lambda text: [audio_chunk(5), audio_chunk(6)]
+
+    class DummyThread:
+        def __init__(self, target, daemon=False):
+            self.target = target
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr("piper.PiperVoice.load", lambda *a, **k: voice)
+
+    with (
+        patch("milo_core.voice.engines.threading.Thread", DummyThread),
+        patch("milo_core.voice.playback.sd.OutputStream"),
+    ):
+        tts = PiperTTS("model")
+        tts.warm_up(["Okay."])
+        assert voice.synthesize.call_count == 0
+        tts.stop()
         tts._queue.put(None)
         tts._run()
-        voice.synthesize.assert_called()
+        assert voice.synthesize.call_count == 1
+        tts._synthesize("Okay.", tts._generation)
+        tts._synthesize("Okay.", tts._generation)
+
+    assert voice.synthesize.call_count == 1
+    assert tts.cache.hits == 2
+    np.testing.assert_array_equal(tts.player._queue.get_nowait()[1], [5, 6])
+
+
+def test_whisper_stt_only_transcribes_after_wake_word() -> None:
+    mock_model = MagicMock()
+    mock_model.transcribe.return_value = (
+        [type("Seg", (object,), {"text": "what time is it"})()],
+        None,
+    )
+    frame = np.ones(480, dtype=np.int16).tobytes()
+
+    # TV chatter (2 frames) then silence, then "Milo" followed by the request.
+    vad_pattern = [True, True, False, False, True, True, True, False, False]
+    stream = MagicMock()
+    stream.read.side_effect = [(frame, None)] * len(vad_pattern)
+    vad_instance = MagicMock()
+    vad_instance.is_speech.side_effect = vad_pattern
+
+    detector = MagicMock()
+    detector.detect.side_effect = [False, False, True]
+
+    with (
+        patch("faster_whisper.WhisperModel", return_value=mock_model),
+        patch("milo_core.voice.engines.sd.RawInputStream", return_value=stream),
+        patch("milo_core.voice.engines.webrtcvad.Vad", return_value=vad_instance),
+        patch(
+            "milo_core.voice.engines.time.time",
+            side_effect=[0.0, 1.0, 2.0, 3.0, 4.0],
+        ),
+    ):
+        stt = WhisperSTT()
+        stt.wake_word = detector
+        text = stt.listen()
+
+    assert text == "what time is it"
+    assert len(mock_model.transcribe.call_args[0][0]) == 2 * 480
+    assert stt.wake_stats.accepted == 1
+    assert stt.wake_stats.rejected == 1
+    assert stt.wake_stats.rejected_audio_seconds == 2 * 480 / 16000
+    assert stt.wake_stats.decoded_audio_seconds == 2 * 480 / 16000
+
+
+def test_whisper_stt_reports_partial_transcripts() -> None:
+    mock_model = MagicMock()
+    mock_model.transcribe.side_effect = lambda audio: (
+        [type("Seg", (object,), {"text": f"{len(audio)} samples"})()],
+        None,
+    )
+    speech_chunk = (np.ones(480, dtype=np.int16) * 1000).tobytes()
+    silence_chunk = np.zeros(480, dtype=np.int16).tobytes()
+    stream = MagicMock()
+    stream.read.side_effect = [(speech_chunk, None)] * 2 + [(silence_chunk, None)] * 2
+    vad_instance = MagicMock()
+    vad_instance.is_speech.side_effect = [True, True, False, False]
+
+    with (
+        patch("faster_whisper.WhisperModel", return_value=mock_model),
+        patch("milo_core.voice.engines.sd.RawInputStream", return_value=stream),
+        patch("milo_core.voice.engines.webrtcvad.Vad", return_value=vad_instance),
+        patch("milo_core.voice.engines.time.time", side_effect=[0.0, 1.0]),
+    ):
+        stt = WhisperSTT(partial_interval=0.03)
+        partials: list[str] = []
+        stt.on_partial = partials.append
+        text = stt.listen()
+        stt._partial.result(timeout=5)
+
+    assert text == "960 samples"
+    # One partial after the first 30 ms of speech; the endpoint partial is
+    # skipped only if that decode is still running.
+    assert partials[0] == "480 samples"
+    assert set(partials) <= {"480 samples", "960 samples"}
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from milo_core.voice.wakeword import (
+    WakeWordDetector,
+    WakeWordStats,
+    evaluate_detector,
+)
+
+
+class LoudnessDetector(WakeWordDetector):
+    """Stand-in keyword spotter that fires on a sustained loud burst."""
+
+    def __init__(self) -> None:
+        self.loud_frames = 0
+
+    def detect(self, frame: np.ndarray) -> bool:
+        loud = np.abs(frame.astype(np.int32)).mean() > 5000
+        self.loud_frames = self.loud_frames + 1 if loud else 0
+        return self.loud_frames >= 3
+
+    def reset(self) -> None:
+        self.loud_frames = 0
+
+
+def write_wav(path: Path, samples: np.ndarray) -> Path:
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+    return path
+
+
+def test_evaluate_detector_counts_false_accepts_and_rejects(tmp_path: Path) -> None:
+    loud = np.full(16000, 8000)
+    quiet = np.full(16000, 100)
+    blip = np.concatenate([np.full(960, 8000), quiet])
+    positives = [
+        write_wav(tmp_path / "p1.wav", loud),
+        write_wav(tmp_path / "p2.wav", blip),
+    ]
+    negatives = [
+        write_wav(tmp_path / "n1.wav", quiet),
+        write_wav(tmp_path / "n2.wav", loud),
+        write_wav(tmp_path / "n3.wav", quiet),
+        write_wav(tmp_path / "n4.wav", blip),
+    ]
+
+    result = evaluate_detector(LoudnessDetector(), positives, negatives)
+
+    assert result.false_rejects == 1
+    assert result.false_reject_rate == 0.5
+    assert result.false_accepts == 1
+    assert result.false_accept_rate == 0.25
+    assert result.negative_hours == (3 * 16000 + 16960) / 16000 / 3600
+    assert result.false_accepts_per_hour == 1 / result.negative_hours
+
+
+def test_avoided_decode_time_uses_measured_speed() -> None:
+    stats = WakeWordStats(
+        rejected_audio_seconds=30.0, decode_seconds=2.0, decoded_audio_seconds=10.0
+    )
+    assert stats.avoided_decode_seconds == 6.0
+    assert WakeWordStats(rejected_audio_seconds=5.0).avoided_decode_seconds == 0.0
@@ -1,15 +1,87 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from unittest.mock import patch
+from typing import Any, Dict, List
 
-from milo_core.workflows import trigger_workflow
+import pytest
+import requests
+
+from milo_core import workflows
+from milo_core.workflows import WorkflowClient, trigger_workflow
 
 
 WORKFLOW_DIR = Path(".n8n/workflows")
 
 
+class Webhooks(ThreadingHTTPServer):
+    """Local stand-in for n8n's webhook endpoints.
+
+    ``statuses`` lists the status codes to answer with, in order; once it is
+    empty every request succeeds. Requests to ``/webhook/slow`` sleep first.
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.requests: List[Dict[str, Any]] = []
+        self.statuses: List[int] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Webhooks
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(
+            {
+                "path": self.path,
+                "json": json.loads(body),
+                "port": self.client_address[1],
+            }
+        )
+        if self.path == "/webhook/slow":
+            time.sleep(1)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        reply = json.dumps({"ok": status < 400}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def webhooks():
+    server = Webhooks()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(webhooks):
+    client = WorkflowClient(webhooks.url, read_timeout=0.3, backoff=0.01)
+    yield client
+    client.close()
+
+
 def test_workflow_files_exist_and_are_valid_json() -> None:
     assert WORKFLOW_DIR.exists(), "Workflow directory should exist"
 
@@ -21,11 +93,74 @@ def test_workflow_files_exist_and_are_valid_json() -> None:
             json.load(f)
 
 
-@patch("milo_core.workflows.requests.post")
-def test_trigger_workflow_sends_post(mock_post) -> None:
-    mock_post.return_value.status_code = 200
-    response = trigger_workflow("gmail_read", {"foo": "bar"})
-    mock_post.assert_called_once_with(
-        "http://localhost:5678/webhook/gmail_read", json={"foo": "bar"}
-    )
-    assert response.status_code == 200
+def test_trigger_workflow_reuses_one_connection(webhooks) -> None:
+    workflows.configure(base_url=webhooks.url)
+    try:
+        for _ in range(3):
+            response = trigger_workflow("gmail_read", {"foo": "bar"})
+            assert response.json() == {"ok": True}
+    finally:
+        workflows.configure()
+
+    assert [r["path"] for r in webhooks.requests] == ["/webhook/gmail_read"] * 3
+    assert webhooks.requests[0]["json"] == {"foo": "bar"}
+    assert len({r["port"] for r in webhooks.requests}) == 1
+
+
+def test_server_errors_are_retried(client, webhooks) -> None:
+    webhooks.statuses = [503, 502]
+    assert client.trigger("flaky").status_code == 200
+
+    webhooks.statuses = [500, 500, 500]
+    assert client.trigger("broken").status_code == 500
+
+    flaky, broken = client.stats()["flaky"], client.stats()["broken"]
+    assert (flaky.calls, flaky.retries, flaky.errors) == (1, 2, 0)
+    assert broken.error_rate == 1.0
+    assert len(webhooks.requests) == 6
+
+
+def test_read_timeouts_are_not_retried(client, webhooks) -> None:
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.trigger("slow")
+
+    assert time.monotonic() - start < 1
+    assert len(webhooks.requests) == 1
+    assert client.stats()["slow"].errors == 1
+
+
+def test_connection_errors_are_retried_then_raised() -> None:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    client = WorkflowClient(f"http://127.0.0.1:{port}", retries=2, backoff=0.01)
+
+    with pytest.raises(requests.ConnectionError):
+        client.trigger("down")
+
+    stats = client.stats()["down"]
+    assert (stats.calls, stats.retries, stats.errors) == (1, 2, 1)
+    assert stats.percentile(50) > 0
+
+
+def test_trigger_async_does_not_block_the_loop(client, webhooks) -> None:
+    async def main() -> List[int]:
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        responses = await asyncio.gather(
+            client.trigger_async("a", {"n": 1}), client.trigger_async("b", {"n": 2})
+        )
+        ticker.cancel()
+        return [r.status_code for r in responses] + [ticks]
+
+    *statuses, ticks = asyncio.run(main())
+    assert statuses == [200, 200]
+    assert ticks >= 1